@@ -1,7 +1,15 @@
 """
 LangGraph agent initialization module.
+
+The exports are loaded on first access, so importing a light submodule such
+as agent.schema or agent.metrics doesn't pull in LangGraph and the model SDKs.
 """
 
-from .cooking_agent import create_agent, run_agent, AgentInput, AgentOutput
+import importlib
+
+__all__ = ["create_agent", "get_agent", "refresh_agent", "run_agent", "arun_agent", "run_agent_batch", "arun_agent_batch", "astream_recipe", "AgentInput", "AgentOutput"]
 
-__all__ = ["create_agent", "run_agent", "AgentInput", "AgentOutput"]
\ No newline at end of file
+def __getattr__(name):
+    if name in __all__:
+        return getattr(importlib.import_module(".cooking_agent", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
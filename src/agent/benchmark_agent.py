@@ -0,0 +1,269 @@
+"""
+Offline benchmark suite for the cooking agent graph.
+
+Runs run_agent (or arun_agent) end to end against a deterministic fake chat
+model at several concurrency levels and reports throughput, latency
+percentiles and allocations. No API calls are made, so the numbers measure
+the agent's own overhead plus the simulated model time.
+
+Save results to compare them between commits:
+
+    python src/agent/benchmark_agent.py --output bench-main.json
+    python src/agent/benchmark_agent.py --output bench-branch.json --compare bench-main.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.cache import get_response_cache, set_response_cache
+from agent.cooking_agent import STANDARD_MODE, PIPELINE_MODES, arun_agent, run_agent
+from model.claude_client import set_client_factory
+from model.fake_client import fake_client_factory
+
+# ingredient lists cycled through by the benchmark, the last item of each is
+# unknown to the local categorizer so parse_ingredients calls the model too
+WORKLOAD = [
+    ["chicken", "rice", "onion", "garlic", "jackfruit"],
+    ["pasta", "tomato", "basil", "parmesan", "olive oil", "sumac"],
+    ["tofu", "broccoli", "soy sauce", "ginger", "gochujang"],
+    ["eggs", "bread", "spinach", "cheese", "za'atar"],
+]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the value below which the given fraction of values fall."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _request_kwargs(index: int, mode: str) -> Dict[str, Any]:
+    # a unique query per request keeps results from being shared between requests
+    return {"ingredients": WORKLOAD[index % len(WORKLOAD)], "query": f"benchmark request {index}", "mode": mode}
+
+
+def _run_sync(requests: int, concurrency: int, mode: str) -> List[float]:
+    """Run requests through run_agent on a thread pool and return their latencies."""
+
+    def one_request(index: int) -> float:
+        start = time.perf_counter()
+        run_agent(**_request_kwargs(index, mode))
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(one_request, range(requests)))
+
+
+def _run_async(requests: int, concurrency: int, mode: str) -> List[float]:
+    """Run requests through arun_agent on one event loop and return their latencies."""
+
+    async def run_all() -> List[float]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one_request(index: int) -> float:
+            async with semaphore:
+                start = time.perf_counter()
+                await arun_agent(**_request_kwargs(index, mode))
+                return time.perf_counter() - start
+
+        return await asyncio.gather(*(one_request(index) for index in range(requests)))
+
+    return asyncio.run(run_all())
+
+
+def measure_allocations(requests: int, api: str, mode: str) -> Dict[str, float]:
+    """
+    Measure memory allocated per request with tracemalloc.
+
+    Runs separately from the timing passes because tracing slows Python down.
+    """
+    runner = _run_async if api == "async" else _run_sync
+    # warm up so imports and compiled graphs are not counted
+    runner(1, 1, mode)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    runner(requests, 1, mode)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "retained_kib_per_request": (after - before) / 1024 / requests,
+        "peak_kib": (peak - before) / 1024,
+    }
+
+
+def run_benchmark(
+    concurrency_levels: List[int],
+    requests: int,
+    latency: float,
+    tokens_per_second: Optional[float],
+    api: str = "sync",
+    mode: str = STANDARD_MODE,
+) -> Dict[str, Any]:
+    """
+    Benchmark the agent at each concurrency level.
+
+    Args:
+        concurrency_levels: Numbers of requests in flight to test
+        requests: Requests per concurrency level
+        latency: Seconds before the fake model's first token
+        tokens_per_second: Fake model generation speed, instant if None
+        api: "sync" for run_agent on threads, "async" for arun_agent
+        mode: Pipeline mode, "standard" or "fused"
+
+    Returns:
+        Dictionary with the benchmark settings and results per level
+    """
+    runner = _run_async if api == "async" else _run_sync
+
+    previous_cache = get_response_cache()
+    set_response_cache(None)
+    set_client_factory(fake_client_factory(latency, tokens_per_second=tokens_per_second, seed=0))
+
+    try:
+        levels = []
+        for concurrency in concurrency_levels:
+            start = time.perf_counter()
+            latencies = runner(requests, concurrency, mode)
+            wall_time = time.perf_counter() - start
+
+            levels.append({
+                "concurrency": concurrency,
+                "requests": requests,
+                "throughput_rps": requests / wall_time,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "mean_ms": statistics.mean(latencies) * 1000,
+            })
+
+        allocations = measure_allocations(min(requests, 20), api, mode)
+    finally:
+        set_client_factory(None)
+        set_response_cache(previous_cache)
+
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "api": api,
+            "mode": mode,
+            "latency": latency,
+            "tokens_per_second": tokens_per_second,
+        },
+        "levels": levels,
+        "allocations": allocations,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    """Return the current git commit, if the benchmark runs inside a checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare two benchmark results level by level.
+
+    Args:
+        current: Results of this run
+        baseline: Results to compare against
+        threshold: Relative slowdown that counts as a regression (0.1 = 10%)
+
+    Returns:
+        List of regression descriptions, empty if there are none
+    """
+    regressions = []
+    baseline_levels = {level["concurrency"]: level for level in baseline["levels"]}
+
+    for level in current["levels"]:
+        before = baseline_levels.get(level["concurrency"])
+        if before is None:
+            continue
+
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            change = level[key] / before[key] - 1
+            print(f"  concurrency {level['concurrency']:>3} {key}: {before[key]:8.1f} -> {level[key]:8.1f} ms ({change:+.1%})")
+            if change > threshold:
+                regressions.append(f"{key} at concurrency {level['concurrency']} is {change:.1%} slower")
+
+        change = level["throughput_rps"] / before["throughput_rps"] - 1
+        print(f"  concurrency {level['concurrency']:>3} throughput: {change:+.1%}")
+        if change < -threshold:
+            regressions.append(f"throughput at concurrency {level['concurrency']} is {-change:.1%} lower")
+
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the fake model's first token")
+    parser.add_argument("--tokens-per-second", type=float, default=None, help="Fake model generation speed")
+    parser.add_argument("--api", choices=("sync", "async"), default="sync", help="run_agent or arun_agent")
+    parser.add_argument("--mode", choices=PIPELINE_MODES, default=STANDARD_MODE, help="Pipeline mode")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown that fails --compare")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        [int(level) for level in args.concurrency.split(",")],
+        args.requests,
+        args.latency,
+        args.tokens_per_second,
+        args.api,
+        args.mode,
+    )
+
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for level in results["levels"]:
+        print(
+            f"{level['concurrency']:>11} {level['throughput_rps']:>8.1f} {level['p50_ms']:>8.1f} "
+            f"{level['p95_ms']:>8.1f} {level['p99_ms']:>8.1f}"
+        )
+    allocations = results["allocations"]
+    print(f"Allocations: {allocations['retained_kib_per_request']:.1f} KiB retained per request, "
+          f"{allocations['peak_kib']:.1f} KiB peak")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {baseline.get('commit') or args.compare}:")
+        regressions = compare_results(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
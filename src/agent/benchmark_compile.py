@@ -0,0 +1,92 @@
+"""
+Micro-benchmark for compiling the cooking agent graph.
+
+Compares rebuilding the graph on every request (the old run_agent behaviour)
+with fetching the shared compiled graph. No API calls are made.
+
+Run this inside the API container (e.g. `copilot svc exec`) to get real
+numbers for the Fargate task, or locally with --cpu-share to get an estimate:
+
+    python src/agent/benchmark_compile.py --iterations 200 --cpu-share 0.25
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.cooking_agent import create_agent, get_agent, refresh_agent
+
+
+def _time_calls(func, iterations: int) -> list:
+    """Return the wall time in milliseconds of each call to func."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_benchmark(iterations: int = 200, cpu_share: float = 1.0) -> dict:
+    """
+    Measure per-request graph setup cost with and without the shared graph.
+
+    Args:
+        iterations: Number of simulated requests for each strategy
+        cpu_share: Fraction of a vCPU available to the task (256 CPU units = 0.25)
+
+    Returns:
+        Dictionary with median timings in milliseconds
+    """
+    # warm up imports and the shared graph so only steady-state cost is measured
+    refresh_agent()
+    create_agent()
+
+    compile_timings = _time_calls(create_agent, iterations)
+    cached_timings = _time_calls(get_agent, iterations)
+
+    compile_ms = statistics.median(compile_timings)
+    cached_ms = statistics.median(cached_timings)
+
+    return {
+        "iterations": iterations,
+        "compile_per_request_ms": compile_ms,
+        "shared_graph_per_request_ms": cached_ms,
+        "saved_per_request_ms": compile_ms - cached_ms,
+        # graph compilation is CPU bound, so it stretches with the CPU share
+        "estimated_saved_per_request_ms_at_cpu_share": (compile_ms - cached_ms) / cpu_share,
+        "cpu_share": cpu_share,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200, help="Simulated requests per strategy")
+    parser.add_argument(
+        "--cpu-share",
+        type=float,
+        default=1.0,
+        help="vCPU fraction to extrapolate to (Fargate cpu: 256 -> 0.25)",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmark(args.iterations, args.cpu_share)
+
+    print(f"Iterations:                 {results['iterations']}")
+    print(f"create_agent() per request: {results['compile_per_request_ms']:.3f} ms")
+    print(f"get_agent() per request:    {results['shared_graph_per_request_ms']:.4f} ms")
+    print(f"Saved per request:          {results['saved_per_request_ms']:.3f} ms")
+    if args.cpu_share != 1.0:
+        print(
+            f"Estimated saving at {args.cpu_share:g} vCPU: "
+            f"{results['estimated_saved_per_request_ms_at_cpu_share']:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
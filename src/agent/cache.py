@@ -0,0 +1,253 @@
+"""
+Response cache for the deterministic steps of the cooking agent.
+
+parse_ingredients and generate_recipe_idea are cached on a normalized view of
+the AgentInput, so the same ingredient list (in any order or letter case)
+skips those LLM calls. Raw model responses are cached rather than parsed
+objects, so each request still builds its own state from them.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from model.config import ModelConfig
+from .schema import AgentInput
+
+# load environment variables
+load_dotenv()
+
+def _normalize_list(values: Optional[Iterable[str]]) -> List[str]:
+    """Lowercase, strip, de-duplicate and sort a list of strings."""
+    return sorted({value.strip().lower() for value in values or [] if value.strip()})
+
+def normalize_input(input_data: AgentInput) -> Dict[str, Any]:
+    """
+    Build an order- and case-insensitive view of an agent input.
+
+    Args:
+        input_data: The agent input to normalize
+
+    Returns:
+        Dictionary with normalized ingredients, restrictions, preferences and query
+    """
+    preferences = {
+        str(key).strip().lower(): str(value).strip().lower()
+        for key, value in (input_data.preferences or {}).items()
+    }
+    return {
+        "ingredients": _normalize_list(input_data.ingredients),
+        "dietary_restrictions": _normalize_list(input_data.dietary_restrictions),
+        "preferences": dict(sorted(preferences.items())),
+        "query": (input_data.query or "").strip().lower(),
+    }
+
+def make_cache_key(
+    node: str,
+    input_data: AgentInput,
+    config: ModelConfig,
+    fields: Iterable[str],
+    options: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Build the cache key for one node run.
+
+    Args:
+        node: Name of the graph node
+        input_data: The agent input
+        config: The model configuration used for the call
+        fields: The normalized input fields the node's prompt depends on
+        options: Other values the prompt depends on, such as a recipe count
+
+    Returns:
+        str: A stable cache key
+    """
+    normalized = normalize_input(input_data)
+    payload = {
+        "node": node,
+        "input": {field: normalized[field] for field in fields},
+        "model": config.cache_key(),
+    }
+    if options:
+        payload["options"] = options
+    return json.dumps(payload, sort_keys=True)
+
+
+class MemoryCache:
+    """In-memory LRU cache with a per-entry time to live."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """On-disk cache tier backed by a SQLite file."""
+
+    def __init__(self, path: str, ttl: float = 86400):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < time.time():
+                self._connection.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._connection.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl),
+            )
+            self._connection.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM response_cache")
+            self._connection.commit()
+
+
+class ResponseCache:
+    """
+    Two-tier response cache with hit and miss counters per node.
+
+    Lookups try the memory tier first and then the optional disk tier,
+    promoting disk hits into memory. Writes go to every tier.
+    """
+
+    def __init__(self, memory: Optional[MemoryCache] = None, disk: Optional[Any] = None):
+        self.memory = memory if memory is not None else MemoryCache()
+        self.disk = disk
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, node: str, outcome: str) -> None:
+        with self._stats_lock:
+            counters = self._stats.setdefault(node, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get(self, node: str, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+
+        self._count(node, "hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return a copy of the hit and miss counters per node."""
+        with self._stats_lock:
+            return {node: dict(counters) for node, counters in self._stats.items()}
+
+    def clear(self) -> None:
+        """Drop every cached entry and reset the counters."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        with self._stats_lock:
+            self._stats.clear()
+
+
+def _create_response_cache() -> Optional[ResponseCache]:
+    """Build the response cache from environment variables."""
+    if os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() != "true":
+        return None
+
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    memory = MemoryCache(max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")), ttl=ttl)
+
+    disk = None
+    path = os.getenv("RESPONSE_CACHE_PATH")
+    if path:
+        disk = SQLiteCache(path, ttl=float(os.getenv("RESPONSE_CACHE_DISK_TTL", "86400")))
+
+    return ResponseCache(memory=memory, disk=disk)
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_loaded = False
+_response_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Get the process-wide response cache, creating it on first use.
+
+    Returns:
+        ResponseCache, or None when caching is disabled
+    """
+    global _response_cache, _response_cache_loaded
+
+    if not _response_cache_loaded:
+        with _response_cache_lock:
+            if not _response_cache_loaded:
+                _response_cache = _create_response_cache()
+                _response_cache_loaded = True
+
+    return _response_cache
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """
+    Replace the process-wide response cache.
+
+    Args:
+        cache: The cache to use, or None to disable caching
+    """
+    global _response_cache, _response_cache_loaded
+
+    with _response_cache_lock:
+        _response_cache = cache
+        _response_cache_loaded = True
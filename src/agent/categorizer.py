@@ -0,0 +1,248 @@
+"""
+Local, rule-based ingredient categorizer.
+
+Sorts common ingredients into the ParsedIngredients categories without an
+LLM call, using a precomputed index of normalized names, plurals and
+synonyms built from the UI's ingredient catalogue.
+"""
+
+import difflib
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ui.utils import INGREDIENT_CATEGORIES
+
+# ParsedIngredients field for each UI ingredient category
+CATEGORY_FIELDS = {
+    "Proteins": "proteins",
+    "Vegetables": "vegetables",
+    "Grains": "grains",
+    "Dairy": "proteins",
+    "Herbs & Spices": "seasonings",
+    "Condiments": "seasonings",
+}
+
+# ingredients that are not in the UI catalogue, or that the agent
+# categorizes differently from the UI (potatoes count as starches)
+EXTRA_INGREDIENTS = {
+    "proteins": [
+        "chicken breast", "chicken thigh", "ground beef", "steak", "bacon", "ham",
+        "sausage", "turkey", "lamb", "salmon", "tuna", "cod", "shrimp", "prawn",
+        "black bean", "kidney bean", "pinto bean", "egg", "parmesan", "mozzarella",
+        "cheddar", "feta", "paneer", "edamame", "peanut", "almond", "red lentil",
+        "white bean",
+    ],
+    "vegetables": [
+        "lemon", "lime", "apple", "banana", "orange", "avocado", "cucumber",
+        "zucchini", "eggplant", "cabbage", "kale", "lettuce", "cauliflower",
+        "celery", "pea", "green bean", "scallion", "green onion", "shallot",
+        "leek", "pumpkin", "squash", "asparagus", "chili", "jalapeno", "berry",
+        "red pepper", "green pepper", "yellow pepper", "red bell pepper",
+        "green bell pepper", "yellow bell pepper", "red onion", "white onion",
+        "yellow onion", "red cabbage", "yellow squash", "red chili", "green chili",
+    ],
+    "grains": [
+        "potato", "sweet potato", "tortilla", "spaghetti", "penne", "barley",
+        "bulgur", "breadcrumb", "cornmeal", "polenta", "white rice", "brown rice",
+    ],
+    "seasonings": [
+        "ginger", "parsley", "dill", "mint", "chili flake", "turmeric", "curry powder",
+        "nutmeg", "bay leaf", "sesame oil", "vegetable oil", "oil", "sugar",
+        "brown sugar", "fish sauce", "sriracha", "salsa", "black pepper", "butter",
+        "white pepper", "sea salt", "kosher salt", "red pepper flake",
+    ],
+}
+
+# alternative names mapped to the canonical name in the index
+SYNONYMS = {
+    "garbanzo": "chickpea",
+    "garbanzo bean": "chickpea",
+    "aubergine": "eggplant",
+    "courgette": "zucchini",
+    "capsicum": "bell pepper",
+    "coriander": "cilantro",
+    "spring onion": "green onion",
+    "beancurd": "tofu",
+    "minced beef": "ground beef",
+    "evoo": "olive oil",
+    "extra virgin olive oil": "olive oil",
+    "mince": "ground beef",
+    "yoghurt": "yogurt",
+}
+
+# words that describe how an ingredient is prepared or sold, not what it is;
+# any other word of a name has to be part of the matched index entry. Colours
+# are not descriptors, since they tell "red pepper" apart from "pepper", so
+# coloured names are listed in EXTRA_INGREDIENTS instead
+DESCRIPTORS = {
+    "boneless", "skinless", "fresh", "frozen", "dried", "canned", "raw", "cooked",
+    "leftover", "ripe", "organic", "whole", "large", "medium", "small", "baby",
+    "chopped", "diced", "sliced", "minced", "grated", "shredded", "crushed",
+}
+
+# staples assumed to be in any kitchen when not given as ingredients
+KITCHEN_ESSENTIALS = ["salt", "pepper", "oil"]
+
+FUZZY_CUTOFF = 0.85
+
+_IRREGULAR_PLURALS = {
+    "leaves": "leaf",
+    "tomatoes": "tomato",
+    "potatoes": "potato",
+    "mangoes": "mango",
+    "chilies": "chili",
+    "chillies": "chili",
+    "radishes": "radish",
+}
+
+def _singularize(word: str) -> str:
+    """Turn a simple English plural into its singular form."""
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ches", "shes", "sses")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+def normalize_ingredient(name: str) -> str:
+    """
+    Normalize an ingredient name for lookup.
+
+    Args:
+        name: Ingredient name as typed by the user
+
+    Returns:
+        str: Lowercase, singular name without punctuation
+    """
+    words = re.sub(r"[^a-z ]+", " ", name.lower()).split()
+    return " ".join(_singularize(word) for word in words)
+
+
+class IngredientCategorizer:
+    """Categorizes ingredients using a precomputed name index."""
+
+    def __init__(self, index: Dict[str, str], fuzzy_cutoff: float = FUZZY_CUTOFF):
+        self.index = index
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._names = list(index)
+
+    def lookup(self, name: str) -> Optional[str]:
+        """
+        Find the ParsedIngredients field for one ingredient.
+
+        Tries the whole name, then the name without descriptor words
+        ("boneless chicken thighs" -> "chicken thigh"), then a fuzzy match
+        to catch typos. A name that only partly matches a known one, like
+        "chicken stock" or "coconut milk", is unknown and left to the model.
+
+        Args:
+            name: Ingredient name as typed by the user
+
+        Returns:
+            The category field name, or None if the ingredient is unknown
+        """
+        normalized = normalize_ingredient(name)
+        if not normalized:
+            return None
+        if normalized in self.index:
+            return self.index[normalized]
+
+        normalized = " ".join(word for word in normalized.split() if word not in DESCRIPTORS) or normalized
+        if normalized in self.index:
+            return self.index[normalized]
+
+        if len(normalized) >= 4:
+            matches = difflib.get_close_matches(normalized, self._names, n=1, cutoff=self.fuzzy_cutoff)
+            if matches:
+                return self.index[matches[0]]
+
+        return None
+
+    def categorize(self, ingredients: Iterable[str]) -> Tuple[Dict[str, List[str]], List[str]]:
+        """
+        Sort ingredients into categories.
+
+        Args:
+            ingredients: Ingredient names as typed by the user
+
+        Returns:
+            Tuple of the categorized ingredients keyed by ParsedIngredients
+            field, and the ingredients that could not be categorized
+        """
+        categories: Dict[str, List[str]] = {field: [] for field in dict.fromkeys(CATEGORY_FIELDS.values())}
+        unknown = []
+
+        for ingredient in ingredients:
+            field = self.lookup(ingredient)
+            if field is None:
+                unknown.append(ingredient)
+            else:
+                categories[field].append(ingredient)
+
+        return categories, unknown
+
+    def missing_essentials(self, ingredients: Iterable[str]) -> List[str]:
+        """
+        List the kitchen staples that are not among the ingredients.
+
+        Args:
+            ingredients: Ingredient names as typed by the user
+
+        Returns:
+            List of assumed kitchen essentials
+        """
+        present = set()
+        for ingredient in ingredients:
+            normalized = normalize_ingredient(ingredient)
+            for essential in KITCHEN_ESSENTIALS:
+                # "olive oil" covers oil, but "bell pepper" does not cover pepper
+                if normalized == essential or (
+                    normalized.endswith(" " + essential) and self.lookup(ingredient) == "seasonings"
+                ):
+                    present.add(essential)
+        return [essential for essential in KITCHEN_ESSENTIALS if essential not in present]
+
+
+def build_index() -> Dict[str, str]:
+    """
+    Build the normalized ingredient name to category index.
+
+    Returns:
+        Dictionary mapping normalized names to ParsedIngredients fields
+    """
+    index = {}
+    for category, ingredients in INGREDIENT_CATEGORIES.items():
+        for ingredient in ingredients:
+            index[normalize_ingredient(ingredient)] = CATEGORY_FIELDS[category]
+
+    for field, ingredients in EXTRA_INGREDIENTS.items():
+        for ingredient in ingredients:
+            index[normalize_ingredient(ingredient)] = field
+
+    for synonym, canonical in SYNONYMS.items():
+        index[normalize_ingredient(synonym)] = index[normalize_ingredient(canonical)]
+
+    return index
+
+_categorizer: Optional[IngredientCategorizer] = None
+_categorizer_lock = threading.Lock()
+
+def get_categorizer() -> IngredientCategorizer:
+    """
+    Get the shared ingredient categorizer, building its index on first use.
+
+    Returns:
+        IngredientCategorizer: The shared categorizer
+    """
+    global _categorizer
+
+    if _categorizer is None:
+        with _categorizer_lock:
+            if _categorizer is None:
+                _categorizer = IngredientCategorizer(build_index())
+
+    return _categorizer
@@ -2,48 +2,468 @@
 Main agent implementation using LangGraph.
 """
 
-from typing import Dict, List, Any, Optional, Annotated
+from typing import AsyncIterator, Dict, List, Any, Optional, Annotated, Sequence, Tuple
+import asyncio
+import functools
+import inspect
+import json
 import os
+import threading
+import time
 
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
+from langgraph.types import Send
 
-from .schema import AgentState, AgentInput, AgentOutput
-from .nodes import parse_ingredients, generate_recipe_idea, create_full_recipe, prepare_output
+from memory.session_store import SessionStore, get_session_store
+from model.claude_client import get_claude_client
+from model.config import get_model_config
+from model.scheduler import get_scheduler, is_provider_outage
 
-def create_agent() -> StateGraph:
+from .cache import get_response_cache, normalize_input
+from .categorizer import get_categorizer
+from .corpus import get_recipe_corpus
+from .degradation import get_degradation_ladder
+from .json_stream import JSONStreamParser, validate_partial
+from .llm_metrics import get_metrics_handler
+from .metrics import instrument_node, register_collector, trace_request
+from .singleflight import get_single_flight
+from .schema import MAX_ALTERNATIVES, AgentState, AgentInput, AgentOutput, AgentBatchResult, ParsedIngredients, RecipeIdea
+from .nodes import (
+    parse_ingredients,
+    aparse_ingredients,
+    generate_recipe_idea,
+    agenerate_recipe_idea,
+    generate_recipe_ideas,
+    agenerate_recipe_ideas,
+    analyze_ingredients,
+    aanalyze_ingredients,
+    create_full_recipe,
+    acreate_full_recipe,
+    create_recipe_variant,
+    acreate_recipe_variant,
+    match_corpus,
+    amatch_corpus,
+    prepare_output,
+    aprepare_output,
+    NODE_INPUT_FIELDS,
+    NODE_OUTPUT_FIELDS,
+)
+
+# pipeline modes that create_agent can build
+STANDARD_MODE = "standard"
+FUSED_MODE = "fused"
+PIPELINE_MODES = (STANDARD_MODE, FUSED_MODE)
+
+# graph that writes several alternative recipes in parallel, see run_agent_alternatives
+MULTI_MODE = "multi"
+
+# default number of graph runs a batch executes at the same time
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# compiled graphs shared by every request in this process, one per mode
+_compiled_agents: Dict[str, Any] = {}
+_compiled_agent_lock = threading.Lock()
+
+# graphs compiled with the checkpointer of a session store, one per mode
+_session_agents: Dict[str, Tuple[SessionStore, Any]] = {}
+
+# state types the checkpointer may deserialize
+CHECKPOINT_TYPES = [("agent.schema", model.__name__) for model in (AgentInput, AgentOutput, ParsedIngredients, RecipeIdea)]
+
+# model-backed steps of each pipeline mode, in order
+PIPELINE_STEPS = {
+    STANDARD_MODE: ("parse_ingredients", "generate_recipe_idea", "create_full_recipe"),
+    FUSED_MODE: ("analyze_ingredients", "create_full_recipe"),
+    MULTI_MODE: ("parse_ingredients", "generate_recipe_ideas", "create_full_recipe"),
+}
+
+# steps skipped because a session's saved output was still valid, per node
+_reused_steps: Dict[str, int] = {}
+_reused_steps_lock = threading.Lock()
+
+def _changed_fields(before: Dict[str, Any], state: AgentState) -> Dict[str, Any]:
+    """Pick the state fields a node replaced, so only those channels are written."""
+    return {name: value for name, value in state if value is not before[name]}
+
+def _updates_only(func: Any) -> Any:
+    """Wrap a node that returns the whole state to return only the fields it replaced."""
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(state: AgentState) -> Dict[str, Any]:
+            before = dict(state)
+            return _changed_fields(before, await func(state))
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(state: AgentState) -> Dict[str, Any]:
+        before = dict(state)
+        return _changed_fields(before, func(state))
+
+    return wrapper
+
+def _add_node(workflow: StateGraph, name: str, func: Any, afunc: Any) -> None:
+    """Add an instrumented node with sync and async implementations to the graph."""
+    workflow.add_node(name, RunnableLambda(
+        instrument_node(name, _updates_only(func)), afunc=instrument_node(name, _updates_only(afunc))
+    ))
+
+def _run_config(**config: Any) -> Dict[str, Any]:
+    """Build the config for a graph run, with the metrics callback attached."""
+    return {"callbacks": [get_metrics_handler()], **config}
+
+def _route_after_match(state: AgentState) -> str:
+    """Finish early when the recipe corpus answered the request."""
+    return "matched" if state.output is not None else "generate"
+
+def _fan_out_recipes(state: AgentState) -> List[Send]:
+    """Start one recipe branch per idea, each on its own copy of the state."""
+    return [
+        Send("create_recipe_variant", state.model_copy(update={"recipe_idea": idea, "recipe_ideas": None}))
+        for idea in state.recipe_ideas
+    ]
+
+def _create_multi_agent(checkpointer: Optional[Any] = None) -> StateGraph:
+    """Create the graph that parses once and writes a recipe per idea in parallel."""
+    workflow = StateGraph(AgentState)
+
+    _add_node(workflow, "parse_ingredients", parse_ingredients, aparse_ingredients)
+    _add_node(workflow, "generate_recipe_ideas", generate_recipe_ideas, agenerate_recipe_ideas)
+    # the branches only append to outputs, so they are not wrapped in _updates_only
+    workflow.add_node("create_recipe_variant", RunnableLambda(
+        instrument_node("create_recipe_variant", create_recipe_variant),
+        afunc=instrument_node("create_recipe_variant", acreate_recipe_variant)
+    ))
+
+    workflow.add_edge("parse_ingredients", "generate_recipe_ideas")
+    workflow.add_conditional_edges("generate_recipe_ideas", _fan_out_recipes, ["create_recipe_variant"])
+    workflow.add_edge("create_recipe_variant", END)
+
+    workflow.set_entry_point("parse_ingredients")
+
+    return workflow.compile(checkpointer=checkpointer)
+
+def create_agent(mode: str = STANDARD_MODE, checkpointer: Optional[Any] = None) -> StateGraph:
     """
     Create the cooking agent workflow graph.
 
+    Args:
+        mode: "standard" parses the ingredients and generates the recipe idea
+            in two model calls; "fused" gets both from a single
+            structured-output call; "multi" parses the ingredients, asks
+            for recipe_count ideas and writes the recipes concurrently
+        checkpointer: Optional LangGraph checkpointer saving the state of each run
+
     Returns:
         StateGraph: The LangGraph workflow for the cooking agent.
     """
+    if mode == MULTI_MODE:
+        return _create_multi_agent(checkpointer)
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode: {mode}")
+
     # create a new graph
     workflow = StateGraph(AgentState)
 
-    # add nodes to the graph
-    workflow.add_node("parse_ingredients", parse_ingredients)
-    workflow.add_node("generate_recipe_idea", generate_recipe_idea)
-    workflow.add_node("create_full_recipe", create_full_recipe)
-    workflow.add_node("prepare_output", prepare_output)
+    # add nodes to the graph, with native async versions of the LLM nodes
+    # so that ainvoke never blocks the event loop
+    _add_node(workflow, "match_corpus", match_corpus, amatch_corpus)
+    if mode == FUSED_MODE:
+        _add_node(workflow, "analyze_ingredients", analyze_ingredients, aanalyze_ingredients)
+    else:
+        _add_node(workflow, "parse_ingredients", parse_ingredients, aparse_ingredients)
+        _add_node(workflow, "generate_recipe_idea", generate_recipe_idea, agenerate_recipe_idea)
+    _add_node(workflow, "create_full_recipe", create_full_recipe, acreate_full_recipe)
+    _add_node(workflow, "prepare_output", prepare_output, aprepare_output)
 
-    # define the edges in the graph
-    workflow.add_edge("parse_ingredients", "generate_recipe_idea")
-    workflow.add_edge("generate_recipe_idea", "create_full_recipe")
+    # define the edges in the graph, a corpus match skips every model call
+    first_step = "analyze_ingredients" if mode == FUSED_MODE else "parse_ingredients"
+    workflow.add_conditional_edges("match_corpus", _route_after_match, {"matched": END, "generate": first_step})
+    if mode == FUSED_MODE:
+        workflow.add_edge("analyze_ingredients", "create_full_recipe")
+    else:
+        workflow.add_edge("parse_ingredients", "generate_recipe_idea")
+        workflow.add_edge("generate_recipe_idea", "create_full_recipe")
     workflow.add_edge("create_full_recipe", "prepare_output")
     workflow.add_edge("prepare_output", END)
 
     # set the entry point
-    workflow.set_entry_point("parse_ingredients")
+    workflow.set_entry_point("match_corpus")
 
     # compile the graph
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
-def run_agent(
+def get_agent(mode: str = STANDARD_MODE) -> StateGraph:
+    """
+    Get the compiled cooking agent graph, compiling it on first use.
+
+    The graph structure never changes between requests, so each mode is
+    compiled once per process and reused by every call to run_agent.
+
+    Args:
+        mode: The pipeline mode of the graph
+
+    Returns:
+        StateGraph: The compiled LangGraph workflow for the cooking agent.
+    """
+    agent = _compiled_agents.get(mode)
+
+    if agent is None:
+        with _compiled_agent_lock:
+            agent = _compiled_agents.get(mode)
+            if agent is None:
+                agent = create_agent(mode)
+                _compiled_agents[mode] = agent
+
+    return agent
+
+def refresh_agent(mode: str = STANDARD_MODE) -> StateGraph:
+    """
+    Rebuild and recompile the cooking agent graphs.
+
+    Call this after changing the nodes or edges at runtime (for example
+    in tests that patch a node) so that later requests pick up the change.
+    Graphs of the other modes are dropped and rebuilt on their next use.
+
+    Args:
+        mode: The pipeline mode of the graph to return
+
+    Returns:
+        StateGraph: The newly compiled LangGraph workflow.
+    """
+    with _compiled_agent_lock:
+        _compiled_agents.clear()
+        _session_agents.clear()
+        agent = create_agent(mode)
+        _compiled_agents[mode] = agent
+
+    return agent
+
+def warm_up(modes: Sequence[str] = (*PIPELINE_MODES, MULTI_MODE)) -> Dict[str, float]:
+    """
+    Build everything the first request would otherwise build on its way.
+
+    Compiles the graphs of the given modes, creates the model clients of
+    their steps and loads the categorizer index, caches, recipe corpus and
+    session store. The API runs this at startup before it reports ready.
+
+    Args:
+        modes: Pipeline modes to prepare
+
+    Returns:
+        Dict[str, float]: Seconds spent in each phase
+    """
+    timings = {}
+
+    def phase(name: str, func: Any) -> None:
+        start = time.perf_counter()
+        func()
+        timings[name] = time.perf_counter() - start
+
+    phase("graphs", lambda: [get_agent(mode) for mode in modes])
+    phase("clients", lambda: [
+        get_claude_client(get_model_config(node))
+        for mode in modes for node in PIPELINE_STEPS[mode]
+    ])
+    phase("categorizer", get_categorizer)
+    phase("stores", lambda: (get_response_cache(), get_recipe_corpus(), get_session_store(), get_scheduler()))
+    return timings
+
+def _get_session_agent(mode: str, store: SessionStore) -> StateGraph:
+    """Get the graph of a mode compiled with the checkpointer of the session store."""
+    entry = _session_agents.get(mode)
+
+    if entry is None or entry[0] is not store:
+        with _compiled_agent_lock:
+            entry = _session_agents.get(mode)
+            if entry is None or entry[0] is not store:
+                checkpointer = store.checkpointer.with_allowlist(CHECKPOINT_TYPES)
+                entry = (store, create_agent(mode, checkpointer=checkpointer))
+                _session_agents[mode] = entry
+
+    return entry[1]
+
+def _render_session_metrics() -> List[str]:
+    # only report a store that sessions actually ran on, never create one here
+    entry = next(iter(_session_agents.values()), None)
+    return entry[0].render_metrics() if entry is not None else []
+
+register_collector(_render_session_metrics)
+
+def _plan_session_run(values: Dict[str, Any], input_data: AgentInput, mode: str) -> Tuple[AgentInput, Optional[str]]:
+    """
+    Complete a session request and find the first step its changes invalidate.
+
+    Fields a follow-up request leaves empty are taken from the previous
+    request. A step is stale when an input field it reads changed, or when
+    the saved state lacks its output; every step after a stale one re-runs
+    too, since it reads the stale step's output.
+
+    Returns:
+        The completed input, and the step to re-run from, or None when the
+        saved output still answers the request
+    """
+    steps = PIPELINE_STEPS[mode]
+    previous = values.get("input")
+    if previous is None:
+        return input_data, steps[0]
+
+    input_data = input_data.model_copy(update={
+        "ingredients": input_data.ingredients or previous.ingredients,
+        "dietary_restrictions": input_data.dietary_restrictions or previous.dietary_restrictions,
+        "preferences": input_data.preferences or previous.preferences,
+    })
+    current, saved = normalize_input(input_data), normalize_input(previous)
+    changed = {field for field in current if current[field] != saved[field]}
+
+    for step in steps:
+        missing = any(values.get(field) is None for field in NODE_OUTPUT_FIELDS[step])
+        if missing or changed.intersection(NODE_INPUT_FIELDS[step]):
+            return input_data, step
+
+    # a run that failed after its last model call has no output to reuse
+    return input_data, None if values.get("output") is not None else steps[-1]
+
+def _resume_update(input_data: AgentInput, steps: Tuple[str, ...]) -> Dict[str, Any]:
+    """State update that clears what the re-run steps produce and sets the new input."""
+    update = {"input": input_data, "output": None}
+    for step in steps:
+        update.update(dict.fromkeys(NODE_OUTPUT_FIELDS[step]))
+    return update
+
+def _count_reused_steps(mode: str, rerun_from: Optional[str]) -> None:
+    steps = PIPELINE_STEPS[mode]
+    reused = steps[:steps.index(rerun_from)] if rerun_from is not None else steps
+    with _reused_steps_lock:
+        for step in reused:
+            _reused_steps[step] = _reused_steps.get(step, 0) + 1
+
+def _render_reuse_metrics() -> List[str]:
+    lines = [
+        "# HELP cooking_agent_session_steps_reused_total Model steps skipped because a session's saved output was still valid.",
+        "# TYPE cooking_agent_session_steps_reused_total counter",
+    ]
+    for step, count in sorted(_reused_steps.items()):
+        lines.append(f'cooking_agent_session_steps_reused_total{{node="{step}"}} {count}')
+    return lines
+
+register_collector(_render_reuse_metrics)
+
+def _reuse_output(values: Dict[str, Any], input_data: AgentInput) -> AgentOutput:
+    """The saved output of a session, reported with the new ingredient spelling."""
+    return values["output"].model_copy(update={"ingredients_used": input_data.ingredients})
+
+def _run_session(store: SessionStore, session_id: str, input_data: AgentInput, mode: str) -> AgentOutput:
+    """
+    Run the agent on the saved state of a session, re-running only stale steps, and record the turn.
+
+    Turns of one session are serialized, so each one plans from the state
+    the previous turn saved.
+    """
+    with store.turn(session_id):
+        agent = _get_session_agent(mode, store)
+        config = _run_config(configurable={"thread_id": session_id})
+        steps = PIPELINE_STEPS[mode]
+
+        values = agent.get_state(config).values if store.is_active(session_id) else {}
+        input_data, rerun_from = _plan_session_run(values, input_data, mode)
+        _count_reused_steps(mode, rerun_from)
+
+        with trace_request(mode=mode, entry="run_agent", rerun_from=rerun_from):
+            if rerun_from is None:
+                output = _reuse_output(values, input_data)
+            elif rerun_from == steps[0]:
+                store.checkpointer.delete_thread(session_id)
+                output = agent.invoke(AgentState(input=input_data), config=config)["output"]
+            else:
+                position = steps.index(rerun_from)
+                agent.update_state(config, _resume_update(input_data, steps[position:]), as_node=steps[position - 1])
+                output = agent.invoke(None, config=config)["output"]
+
+        store.add_turn(session_id, input_data.model_dump(), output.model_dump())
+    return output
+
+async def _arun_session(store: SessionStore, session_id: str, input_data: AgentInput, mode: str) -> AgentOutput:
+    """Async version of _run_session."""
+    async with store.aturn(session_id):
+        agent = _get_session_agent(mode, store)
+        config = _run_config(configurable={"thread_id": session_id})
+        steps = PIPELINE_STEPS[mode]
+
+        # the store's SQLite calls run on worker threads, off the event loop
+        active = await asyncio.to_thread(store.is_active, session_id)
+        values = (await agent.aget_state(config)).values if active else {}
+        input_data, rerun_from = _plan_session_run(values, input_data, mode)
+        _count_reused_steps(mode, rerun_from)
+
+        with trace_request(mode=mode, entry="arun_agent", rerun_from=rerun_from):
+            if rerun_from is None:
+                output = _reuse_output(values, input_data)
+            elif rerun_from == steps[0]:
+                await asyncio.to_thread(store.checkpointer.delete_thread, session_id)
+                output = (await agent.ainvoke(AgentState(input=input_data), config=config))["output"]
+            else:
+                position = steps.index(rerun_from)
+                await agent.aupdate_state(config, _resume_update(input_data, steps[position:]), as_node=steps[position - 1])
+                output = (await agent.ainvoke(None, config=config))["output"]
+
+        await asyncio.to_thread(store.add_turn, session_id, input_data.model_dump(), output.model_dump())
+    return output
+
+def _create_input_state(
     ingredients: List[str],
     dietary_restrictions: Optional[List[str]] = None,
     preferences: Optional[Dict[str, Any]] = None,
     query: Optional[str] = None
+) -> AgentState:
+    """Build the initial graph state from the agent inputs."""
+    input_data = AgentInput(
+        ingredients=ingredients,
+        dietary_restrictions=dietary_restrictions,
+        preferences=preferences,
+        query=query
+    )
+    
+    return AgentState(input=input_data)
+
+def _invoke_or_degrade(agent: Any, state: AgentState) -> AgentOutput:
+    """Run the graph, answering from the degradation ladder if the provider is unavailable."""
+    ladder = get_degradation_ladder()
+    try:
+        output = agent.invoke(state, config=_run_config())["output"]
+    except Exception as e:
+        if ladder is None or not is_provider_outage(e):
+            raise
+        return ladder.serve(state.input, lambda: agent.invoke(AgentState(input=state.input), config=_run_config())["output"])
+    if ladder is not None:
+        ladder.remember(state.input, output)
+    return output
+
+async def _ainvoke_or_degrade(agent: Any, state: AgentState) -> AgentOutput:
+    """Async version of _invoke_or_degrade."""
+    ladder = get_degradation_ladder()
+    try:
+        output = (await agent.ainvoke(state, config=_run_config()))["output"]
+    except Exception as e:
+        if ladder is None or not is_provider_outage(e):
+            raise
+
+        async def rerun() -> AgentOutput:
+            return (await agent.ainvoke(AgentState(input=state.input), config=_run_config()))["output"]
+
+        return await ladder.aserve(state.input, rerun)
+    if ladder is not None:
+        ladder.remember(state.input, output)
+    return output
+
+def run_agent(
+    ingredients: List[str],
+    dietary_restrictions: Optional[List[str]] = None,
+    preferences: Optional[Dict[str, Any]] = None,
+    query: Optional[str] = None,
+    mode: str = STANDARD_MODE,
+    session_id: Optional[str] = None
 ) -> AgentOutput:
     """
     Run the cooking agent with the given inputs.
@@ -53,25 +473,303 @@ def run_agent(
         dietary_restrictions: Optional dietary restrictions
         preferences: Optional user preferences
         query: Optional additional query or instructions
+        mode: Pipeline mode, "standard" or "fused"
+        session_id: Optional conversation session; fields left empty are
+            taken from its previous request, and only the steps that read
+            a changed field (and the steps after them) run again
+        
+    Returns:
+        AgentOutput: The generated recipe and related information; while
+        the provider is unavailable, a fallback answer whose served_by
+        names the tier of the degradation ladder that produced it
+    """
+    state = _create_input_state(ingredients, dietary_restrictions, preferences, query)
+    
+    store = get_session_store() if session_id else None
+    if store is not None:
+        return _run_session(store, session_id, state.input, mode)
+    
+    # Get the shared, already compiled agent graph
+    agent = get_agent(mode)
+    
+    # Run the agent
+    with trace_request(mode=mode, entry="run_agent"):
+        return _invoke_or_degrade(agent, state)
+
+async def arun_agent(
+    ingredients: List[str],
+    dietary_restrictions: Optional[List[str]] = None,
+    preferences: Optional[Dict[str, Any]] = None,
+    query: Optional[str] = None,
+    mode: str = STANDARD_MODE,
+    session_id: Optional[str] = None
+) -> AgentOutput:
+    """
+    Run the cooking agent asynchronously with the given inputs.
+    
+    Concurrent calls with equivalent inputs are coalesced into one graph run,
+    except for calls in a session, which run on the session's own state.
+    
+    Args:
+        ingredients: List of available ingredients
+        dietary_restrictions: Optional dietary restrictions
+        preferences: Optional user preferences
+        query: Optional additional query or instructions
+        mode: Pipeline mode, "standard" or "fused"
+        session_id: Optional conversation session, see run_agent
         
     Returns:
         AgentOutput: The generated recipe and related information
     """
-    # Create the agent graph
-    agent = create_agent()
+    state = _create_input_state(ingredients, dietary_restrictions, preferences, query)
     
-    # Create the input state
-    input_data = AgentInput(
-        ingredients=ingredients,
-        dietary_restrictions=dietary_restrictions,
-        preferences=preferences,
-        query=query
+    store = get_session_store() if session_id else None
+    if store is not None:
+        return await _arun_session(store, session_id, state.input, mode)
+    
+    agent = get_agent(mode)
+    
+    async def run() -> AgentOutput:
+        with trace_request(mode=mode, entry="arun_agent"):
+            return await _ainvoke_or_degrade(agent, state)
+    
+    single_flight = get_single_flight()
+    if single_flight is None:
+        return await run()
+    
+    # identical requests already in progress share their run with this one
+    key = json.dumps({"mode": mode, **normalize_input(state.input)}, sort_keys=True)
+    output = await single_flight.do(key, run)
+    return output.model_copy(update={"ingredients_used": state.input.ingredients})
+
+def _alternatives_state(
+    ingredients: List[str],
+    dietary_restrictions: Optional[List[str]],
+    preferences: Optional[Dict[str, Any]],
+    query: Optional[str],
+    count: int
+) -> AgentState:
+    """Build the initial state of a multi-recipe run."""
+    if not 1 <= count <= MAX_ALTERNATIVES:
+        raise ValueError(f"count must be between 1 and {MAX_ALTERNATIVES}")
+    
+    state = _create_input_state(ingredients, dietary_restrictions, preferences, query)
+    state.recipe_count = count
+    return state
+
+def run_agent_alternatives(
+    ingredients: List[str],
+    dietary_restrictions: Optional[List[str]] = None,
+    preferences: Optional[Dict[str, Any]] = None,
+    query: Optional[str] = None,
+    count: int = 3
+) -> List[AgentOutput]:
+    """
+    Generate several alternative recipes for the same inputs.
+    
+    The ingredients are parsed once and one model call proposes `count`
+    distinct recipe ideas; the full recipes are then written in parallel
+    branches of the graph, so this takes about as long as a single recipe.
+    
+    Args:
+        ingredients: List of available ingredients
+        dietary_restrictions: Optional dietary restrictions
+        preferences: Optional user preferences
+        query: Optional additional query or instructions
+        count: Number of alternatives, at most MAX_ALTERNATIVES
+        
+    Returns:
+        List[AgentOutput]: One recipe per distinct idea, in the order they
+        were proposed; fewer than count if the model repeated itself
+    """
+    state = _alternatives_state(ingredients, dietary_restrictions, preferences, query, count)
+    agent = get_agent(MULTI_MODE)
+    
+    with trace_request(mode=MULTI_MODE, entry="run_agent_alternatives"):
+        result = agent.invoke(state, config=_run_config())
+    
+    return result["outputs"]
+
+async def arun_agent_alternatives(
+    ingredients: List[str],
+    dietary_restrictions: Optional[List[str]] = None,
+    preferences: Optional[Dict[str, Any]] = None,
+    query: Optional[str] = None,
+    count: int = 3
+) -> List[AgentOutput]:
+    """
+    Generate several alternative recipes asynchronously, see run_agent_alternatives.
+    
+    Args:
+        ingredients: List of available ingredients
+        dietary_restrictions: Optional dietary restrictions
+        preferences: Optional user preferences
+        query: Optional additional query or instructions
+        count: Number of alternatives, at most MAX_ALTERNATIVES
+        
+    Returns:
+        List[AgentOutput]: One recipe per distinct idea, in the order they were proposed
+    """
+    state = _alternatives_state(ingredients, dietary_restrictions, preferences, query, count)
+    agent = get_agent(MULTI_MODE)
+    
+    with trace_request(mode=MULTI_MODE, entry="arun_agent_alternatives"):
+        result = await agent.ainvoke(state, config=_run_config())
+    
+    return result["outputs"]
+
+def _deduplicate_inputs(inputs: List[AgentInput]) -> Tuple[List[AgentInput], List[int]]:
+    """
+    Collapse equivalent inputs so each distinct request runs once.
+    
+    Returns:
+        The distinct inputs, and for every original input the position of
+        its distinct input
+    """
+    positions: Dict[str, int] = {}
+    unique_inputs = []
+    mapping = []
+    
+    for input_data in inputs:
+        key = json.dumps(normalize_input(input_data), sort_keys=True)
+        if key not in positions:
+            positions[key] = len(unique_inputs)
+            unique_inputs.append(input_data)
+        mapping.append(positions[key])
+    
+    return unique_inputs, mapping
+
+def _collect_batch_results(
+    inputs: List[AgentInput],
+    mapping: List[int],
+    results: List[Any]
+) -> List[AgentBatchResult]:
+    """Turn graph batch results into per-input results in the original order."""
+    batch_results = []
+    
+    for input_data, position in zip(inputs, mapping):
+        result = results[position]
+        if isinstance(result, Exception):
+            batch_results.append(AgentBatchResult(error=f"{type(result).__name__}: {result}"))
+        else:
+            # duplicates share a run, but report their own ingredient spelling
+            output = result["output"].model_copy(update={"ingredients_used": input_data.ingredients})
+            batch_results.append(AgentBatchResult(output=output))
+    
+    return batch_results
+
+def run_agent_batch(
+    inputs: List[AgentInput],
+    max_concurrency: Optional[int] = None,
+    mode: str = STANDARD_MODE
+) -> List[AgentBatchResult]:
+    """
+    Run the cooking agent for many inputs.
+    
+    Equivalent inputs are run only once. A failing input does not fail the
+    batch; its result carries the error instead.
+    
+    Args:
+        inputs: The agent inputs to run
+        max_concurrency: Maximum number of graph runs at the same time
+        mode: Pipeline mode, "standard" or "fused"
+        
+    Returns:
+        List[AgentBatchResult]: One result per input, in input order
+    """
+    agent = get_agent(mode)
+    
+    unique_inputs, mapping = _deduplicate_inputs(inputs)
+    states = [AgentState(input=input_data) for input_data in unique_inputs]
+    
+    results = agent.batch(
+        states,
+        config=_run_config(max_concurrency=max_concurrency or DEFAULT_BATCH_CONCURRENCY),
+        return_exceptions=True
     )
     
-    state = AgentState(input=input_data)
+    return _collect_batch_results(inputs, mapping, results)
+
+async def arun_agent_batch(
+    inputs: List[AgentInput],
+    max_concurrency: Optional[int] = None,
+    mode: str = STANDARD_MODE
+) -> List[AgentBatchResult]:
+    """
+    Run the cooking agent asynchronously for many inputs.
     
-    # Run the agent
-    result = agent.invoke(state)
+    Args:
+        inputs: The agent inputs to run
+        max_concurrency: Maximum number of graph runs at the same time
+        mode: Pipeline mode, "standard" or "fused"
+        
+    Returns:
+        List[AgentBatchResult]: One result per input, in input order
+    """
+    agent = get_agent(mode)
+    
+    unique_inputs, mapping = _deduplicate_inputs(inputs)
+    states = [AgentState(input=input_data) for input_data in unique_inputs]
+    
+    results = await agent.abatch(
+        states,
+        config=_run_config(max_concurrency=max_concurrency or DEFAULT_BATCH_CONCURRENCY),
+        return_exceptions=True
+    )
+    
+    return _collect_batch_results(inputs, mapping, results)
+
+async def astream_recipe(
+    ingredients: List[str],
+    dietary_restrictions: Optional[List[str]] = None,
+    preferences: Optional[Dict[str, Any]] = None,
+    query: Optional[str] = None,
+    mode: str = STANDARD_MODE
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Run the cooking agent and stream its progress as it happens.
+    
+    While the model writes the recipe idea, yields ("recipe_idea_partial",
+    PartialRecipeIdea) each time another of its fields is complete. Then
+    yields ("recipe_idea", RecipeIdea) as soon as the idea is generated,
+    ("token", str) for every piece of recipe_content produced by the model,
+    and finally ("output", AgentOutput) once the run is complete. A request
+    answered from the recipe corpus only yields the output.
+    
+    Args:
+        ingredients: List of available ingredients
+        dietary_restrictions: Optional dietary restrictions
+        preferences: Optional user preferences
+        query: Optional additional query or instructions
+        mode: Pipeline mode, "standard" or "fused"
+        
+    Yields:
+        Tuples of event name and event payload
+    """
+    agent = get_agent(mode)
+    
+    state = _create_input_state(ingredients, dietary_restrictions, preferences, query)
+    
+    idea_parser = JSONStreamParser()
     
-    # Return the output
-    return result
\ No newline at end of file
+    with trace_request(mode=mode, entry="astream_recipe"):
+        async for stream_mode, chunk in agent.astream(
+            state, config=_run_config(), stream_mode=["updates", "messages"]
+        ):
+            if stream_mode == "messages":
+                message, metadata = chunk
+                node_name = metadata.get("langgraph_node")
+                if not isinstance(message.content, str) or not message.content:
+                    continue
+                if node_name == "create_full_recipe":
+                    yield "token", message.content
+                elif node_name == "generate_recipe_idea" and idea_parser.feed(message.content):
+                    # the idea's JSON is decoded field by field as it streams
+                    yield "recipe_idea_partial", validate_partial(RecipeIdea, idea_parser.fields)
+                continue
+            
+            for node_name, update in chunk.items():
+                if node_name in ("generate_recipe_idea", "analyze_ingredients"):
+                    yield "recipe_idea", update["recipe_idea"]
+                elif node_name == "prepare_output" or (node_name == "match_corpus" and update and update.get("output")):
+                    yield "output", update["output"]
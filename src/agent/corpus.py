@@ -0,0 +1,316 @@
+"""
+Local corpus of generated recipes, for answering requests without the model.
+
+Every AgentOutput can be added to the corpus together with the input it was
+generated for. An inverted index maps each normalized ingredient to the
+recipes that use it, so scoring a request only touches recipes sharing at
+least one ingredient with it. Candidates are scored with NumPy: coverage is
+the share of a recipe's ingredients the user has, and dietary restrictions
+are checked as bitmasks, so a search takes well under a millisecond even for
+large corpora.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .cache import normalize_input
+from .categorizer import KITCHEN_ESSENTIALS, normalize_ingredient
+from .metrics import register_collector
+from .schema import AgentInput, AgentOutput
+
+# load environment variables
+load_dotenv()
+
+# dietary restrictions are stored as bits of one unsigned 64-bit mask per recipe
+MAX_RESTRICTIONS = 64
+
+
+def _recipe_ingredients(ingredients: Iterable[str]) -> Dict[str, str]:
+    """Map normalized ingredient names to their spelling, ignoring kitchen essentials."""
+    names = {}
+    for name in ingredients:
+        normalized = normalize_ingredient(name)
+        if normalized and normalized not in KITCHEN_ESSENTIALS:
+            names.setdefault(normalized, name)
+    return names
+
+
+class RecipeCorpus:
+    """
+    Generated recipes indexed by ingredient.
+
+    Recipes are kept in memory and, when a path is given, in a SQLite file
+    that is loaded back on startup.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.8):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._outputs: List[AgentOutput] = []
+        self._ingredients: List[Dict[str, str]] = []
+        self._preferences: List[Dict[str, str]] = []
+        self._keys: Set[str] = set()
+        self._postings: Dict[str, List[int]] = {}
+        self._posting_arrays: Dict[str, np.ndarray] = {}
+        self._restriction_bits: Dict[str, int] = {}
+        self._sizes = np.zeros(64, dtype=np.int32)
+        self._restriction_masks = np.zeros(64, dtype=np.uint64)
+        self.hits = 0
+        self.misses = 0
+
+        self._connection = None
+        if path:
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS recipe_corpus "
+                "(id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, input TEXT NOT NULL, output TEXT NOT NULL)"
+            )
+            self._connection.commit()
+            for input_json, output_json in self._connection.execute(
+                "SELECT input, output FROM recipe_corpus ORDER BY id"
+            ):
+                self._index(AgentInput.model_validate_json(input_json), AgentOutput.model_validate_json(output_json))
+
+    def __len__(self) -> int:
+        return len(self._outputs)
+
+    def _restriction_mask(self, restrictions: Iterable[str], assign: bool) -> Optional[int]:
+        """
+        Turn restrictions into a bitmask.
+
+        With assign, unseen restrictions get the next free bit. Without it,
+        None is returned for an unseen restriction, since no recipe has it.
+        """
+        mask = 0
+        for restriction in restrictions:
+            bit = self._restriction_bits.get(restriction)
+            if bit is None and assign and len(self._restriction_bits) < MAX_RESTRICTIONS:
+                bit = self._restriction_bits[restriction] = len(self._restriction_bits)
+            if bit is None:
+                if not assign:
+                    return None
+                continue
+            mask |= 1 << bit
+        return mask
+
+    def _index(self, input_data: AgentInput, output: AgentOutput) -> Optional[str]:
+        """Add a recipe to the in-memory index, returning its key, or None if it was already there."""
+        normalized = normalize_input(input_data)
+        key = json.dumps({field: normalized[field] for field in ("ingredients", "dietary_restrictions", "preferences")})
+        ingredients = _recipe_ingredients(input_data.ingredients)
+        if key in self._keys or not ingredients:
+            return None
+
+        recipe_id = len(self._outputs)
+        if recipe_id == len(self._sizes):
+            # grow the score arrays geometrically so adding stays amortized O(1)
+            self._sizes = np.concatenate([self._sizes, np.zeros_like(self._sizes)])
+            self._restriction_masks = np.concatenate([self._restriction_masks, np.zeros_like(self._restriction_masks)])
+
+        self._keys.add(key)
+        self._outputs.append(output)
+        self._ingredients.append(ingredients)
+        self._preferences.append(normalized["preferences"])
+        self._sizes[recipe_id] = len(ingredients)
+        self._restriction_masks[recipe_id] = self._restriction_mask(normalized["dietary_restrictions"], assign=True)
+        for ingredient in ingredients:
+            self._postings.setdefault(ingredient, []).append(recipe_id)
+            self._posting_arrays.pop(ingredient, None)
+        return key
+
+    def add(self, input_data: AgentInput, output: AgentOutput) -> None:
+        """
+        Add a generated recipe to the corpus.
+
+        Recipes for an input that is already in the corpus are ignored, and
+        so are recipes written for a free-text query, which the corpus key
+        does not include, and degraded answers not written by the main model.
+
+        Args:
+            input_data: The input the recipe was generated for
+            output: The generated recipe
+        """
+        if output.served_by != "model" or (input_data.query and input_data.query.strip()):
+            return
+
+        with self._lock:
+            key = self._index(input_data, output)
+            if key is None or self._connection is None:
+                return
+            self._connection.execute(
+                "INSERT OR IGNORE INTO recipe_corpus (key, input, output) VALUES (?, ?, ?)",
+                (key, input_data.model_dump_json(), output.model_dump_json()),
+            )
+            self._connection.commit()
+
+    def _posting_array(self, ingredient: str) -> Optional[np.ndarray]:
+        array = self._posting_arrays.get(ingredient)
+        if array is None and ingredient in self._postings:
+            array = np.array(self._postings[ingredient], dtype=np.int64)
+            self._posting_arrays[ingredient] = array
+        return array
+
+    def search(
+        self,
+        ingredients: List[str],
+        dietary_restrictions: Optional[List[str]] = None,
+        limit: int = 5,
+    ) -> List[Tuple[int, float, int]]:
+        """
+        Find the recipes best covered by a set of ingredients.
+
+        Only recipes generated for at least the given dietary restrictions
+        are considered.
+
+        Args:
+            ingredients: The ingredients the user has
+            dietary_restrictions: Restrictions the recipe must respect
+            limit: Maximum number of results
+
+        Returns:
+            List of (recipe id, coverage, number of missing ingredients),
+            best coverage first, fewest missing ingredients on ties
+        """
+        restrictions = {restriction.strip().lower() for restriction in dietary_restrictions or [] if restriction.strip()}
+        with self._lock:
+            required = self._restriction_mask(restrictions, assign=False)
+            count = len(self._outputs)
+            if required is None or count == 0:
+                return []
+
+            matched = np.zeros(count, dtype=np.int32)
+            for ingredient in _recipe_ingredients(ingredients):
+                postings = self._posting_array(ingredient)
+                if postings is not None:
+                    matched[postings] += 1
+
+            candidates = np.flatnonzero(matched)
+            required_mask = np.uint64(required)
+            candidates = candidates[(self._restriction_masks[candidates] & required_mask) == required_mask]
+            sizes = self._sizes[candidates]
+            coverage = matched[candidates] / sizes
+            missing = sizes - matched[candidates]
+
+        order = np.lexsort((missing, -coverage))[:limit]
+        return [(int(candidates[i]), float(coverage[i]), int(missing[i])) for i in order]
+
+    def match(
+        self,
+        input_data: AgentInput,
+        threshold: Optional[float] = None,
+        ignore_query: bool = False,
+    ) -> Optional[AgentOutput]:
+        """
+        Return a stored recipe for the input if one is covered well enough.
+
+        Inputs with a free-text query are never matched, since the stored
+        recipes were not written for it. Preferences given in the input must
+        be the same as the ones the recipe was generated with.
+
+        Args:
+            input_data: The agent input
+            threshold: Minimum coverage, the corpus threshold if omitted
+            ignore_query: Match inputs with a free-text query too, for
+                answering while the model is unavailable
+
+        Returns:
+            The matching recipe adapted to the input, or None
+        """
+        threshold = self.threshold if threshold is None else threshold
+        preferences = normalize_input(input_data)["preferences"]
+        have = set(_recipe_ingredients(input_data.ingredients))
+        free_text = bool(input_data.query and input_data.query.strip()) and not ignore_query
+        results = [] if free_text else self.search(input_data.ingredients, input_data.dietary_restrictions)
+
+        for recipe_id, coverage, _ in results:
+            if coverage < threshold:
+                break
+            stored_preferences = self._preferences[recipe_id]
+            if any(stored_preferences.get(key) != value for key, value in preferences.items()):
+                continue
+
+            output = self._outputs[recipe_id]
+            lacking = [name for ingredient, name in self._ingredients[recipe_id].items() if ingredient not in have]
+            with self._lock:
+                self.hits += 1
+            return output.model_copy(update={
+                "ingredients_used": input_data.ingredients,
+                "missing_ingredients": lacking + [
+                    item for item in output.missing_ingredients if item not in lacking
+                ],
+                "served_by": "corpus",
+            })
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def render_metrics(self) -> List[str]:
+        """Render the corpus counters in the Prometheus text format."""
+        return [
+            "# HELP cooking_agent_corpus_recipes Recipes in the local corpus.",
+            "# TYPE cooking_agent_corpus_recipes gauge",
+            f"cooking_agent_corpus_recipes {len(self)}",
+            "# HELP cooking_agent_corpus_matches_total Requests answered from the local corpus.",
+            "# TYPE cooking_agent_corpus_matches_total counter",
+            f'cooking_agent_corpus_matches_total{{result="hit"}} {self.hits}',
+            f'cooking_agent_corpus_matches_total{{result="miss"}} {self.misses}',
+        ]
+
+
+def _create_recipe_corpus() -> Optional[RecipeCorpus]:
+    """Build the recipe corpus from environment variables."""
+    if os.getenv("RECIPE_CORPUS_ENABLED", "false").lower() != "true":
+        return None
+
+    return RecipeCorpus(
+        path=os.getenv("RECIPE_CORPUS_PATH") or None,
+        threshold=float(os.getenv("RECIPE_MATCH_THRESHOLD", "0.8")),
+    )
+
+_recipe_corpus: Optional[RecipeCorpus] = None
+_recipe_corpus_loaded = False
+_recipe_corpus_lock = threading.Lock()
+
+def _render_corpus_metrics() -> List[str]:
+    return _recipe_corpus.render_metrics() if _recipe_corpus is not None else []
+
+register_collector(_render_corpus_metrics)
+
+def get_recipe_corpus() -> Optional[RecipeCorpus]:
+    """
+    Get the process-wide recipe corpus, creating it on first use.
+
+    Returns:
+        RecipeCorpus, or None when the corpus is disabled
+    """
+    global _recipe_corpus, _recipe_corpus_loaded
+
+    if not _recipe_corpus_loaded:
+        with _recipe_corpus_lock:
+            if not _recipe_corpus_loaded:
+                _recipe_corpus = _create_recipe_corpus()
+                _recipe_corpus_loaded = True
+
+    return _recipe_corpus
+
+def set_recipe_corpus(corpus: Optional[RecipeCorpus]) -> None:
+    """
+    Replace the process-wide recipe corpus.
+
+    Args:
+        corpus: The corpus to use, or None to disable it
+    """
+    global _recipe_corpus, _recipe_corpus_loaded
+
+    with _recipe_corpus_lock:
+        _recipe_corpus = corpus
+        _recipe_corpus_loaded = True
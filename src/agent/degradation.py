@@ -0,0 +1,217 @@
+"""
+Degradation ladder for answering requests while the model provider is failing.
+
+When a run fails because the provider is down, too slow to answer within a
+node's deadline, or behind an open circuit, the request is answered by the
+first of these tiers that can:
+
+1. cache: the last answer the model gave for an equivalent request
+2. corpus: a stored recipe, matched with a relaxed coverage threshold
+3. fast_model: the same run again with every node on the fast model
+4. template: a plain recipe outline built from the categorized ingredients
+
+The first two never call the provider, and the fast model is skipped while
+its own circuit is open, so degraded requests finish quickly instead of
+holding their connection until a timeout. The tier is reported in
+AgentOutput.served_by.
+"""
+
+import json
+import os
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from model.config import fast_model_only, get_fast_model_name
+from model.scheduler import get_scheduler
+from .cache import MemoryCache, normalize_input
+from .categorizer import get_categorizer
+from .corpus import get_recipe_corpus
+from .metrics import register_collector
+from .schema import AgentInput, AgentOutput
+
+# load environment variables
+load_dotenv()
+
+# tiers in the order they are tried
+TIERS = ("cache", "corpus", "fast_model", "template")
+
+
+def template_output(input_data: AgentInput) -> AgentOutput:
+    """
+    Build a basic recipe outline from the ingredients without any model call.
+
+    Args:
+        input_data: The agent input
+
+    Returns:
+        AgentOutput: A one-pan recipe outline served by the template tier
+    """
+    categorizer = get_categorizer()
+    categories, unknown = categorizer.categorize(input_data.ingredients)
+    missing = categorizer.missing_essentials(input_data.ingredients)
+    proteins, vegetables, grains = categories["proteins"], categories["vegetables"], categories["grains"]
+
+    main = (proteins + vegetables + grains + unknown + ["vegetable"])[0]
+    dish = "Bowl" if grains else "Skillet"
+
+    steps = ["Wash and chop the ingredients into bite-sized pieces."]
+    if grains:
+        steps.append(f"Cook the {', '.join(grains)} according to the package directions.")
+    if proteins:
+        steps.append(f"Heat a little oil in a large pan and cook the {', '.join(proteins)} until cooked through.")
+    if vegetables or unknown:
+        steps.append(f"Add the {', '.join(vegetables + unknown)} and cook until tender.")
+    steps.append("Season to taste" + (f" with the {', '.join(categories['seasonings'])}" if categories["seasonings"] else "") + ".")
+    steps.append("Combine everything" + (" over the grains" if grains else "") + " and serve hot.")
+
+    ingredient_lines = "\n".join(f"- {ingredient}" for ingredient in input_data.ingredients + missing)
+    step_lines = "\n".join(f"{number}. {step}" for number, step in enumerate(steps, 1))
+    tips = "This is a basic outline; ask again later for a detailed recipe."
+    if input_data.dietary_restrictions:
+        tips += f" Check that every ingredient fits your restrictions: {', '.join(input_data.dietary_restrictions)}."
+
+    return AgentOutput(
+        recipe_name=f"Simple {main.title()} {dish}",
+        ingredients_used=input_data.ingredients,
+        recipe_content=f"## Ingredients\n{ingredient_lines}\n\n## Instructions\n{step_lines}\n\n## Cooking Tips\n{tips}\n",
+        cooking_time="30 minutes",
+        difficulty="easy",
+        missing_ingredients=missing,
+        served_by="template",
+    )
+
+
+class DegradationLadder:
+    """Last good answers per request, and the fallback tiers that use them."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 86400, corpus_threshold: float = 0.5):
+        self.corpus_threshold = corpus_threshold
+        self._answers = MemoryCache(max_size=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self.served: Dict[str, int] = {}
+
+    @staticmethod
+    def _key(input_data: AgentInput) -> str:
+        return json.dumps(normalize_input(input_data), sort_keys=True)
+
+    def remember(self, input_data: AgentInput, output: AgentOutput) -> None:
+        """
+        Keep an answer the model gave, for the cache tier.
+
+        Args:
+            input_data: The agent input
+            output: The output of a successful run; degraded outputs are not kept
+        """
+        if output.served_by == "model":
+            self._answers.set(self._key(input_data), output.model_dump_json())
+
+    def _local(self, input_data: AgentInput) -> Optional[AgentOutput]:
+        """Try the tiers that answer without the provider."""
+        cached = self._answers.get(self._key(input_data))
+        if cached is not None:
+            return AgentOutput.model_validate_json(cached).model_copy(update={"served_by": "cache"})
+
+        corpus = get_recipe_corpus()
+        if corpus is not None:
+            return corpus.match(input_data, threshold=self.corpus_threshold, ignore_query=True)
+        return None
+
+    def _finish(self, input_data: AgentInput, output: AgentOutput) -> AgentOutput:
+        with self._lock:
+            self.served[output.served_by] = self.served.get(output.served_by, 0) + 1
+        return output.model_copy(update={"ingredients_used": input_data.ingredients})
+
+    def serve(self, input_data: AgentInput, run: Callable[[], AgentOutput]) -> AgentOutput:
+        """
+        Answer a request whose run failed because the provider is unavailable.
+
+        Args:
+            input_data: The agent input
+            run: Runs the agent again, used on the fast model tier
+
+        Returns:
+            AgentOutput: The answer of the first tier that had one
+        """
+        output = self._local(input_data)
+        if output is None and not get_scheduler().circuit_open(get_fast_model_name()):
+            try:
+                with fast_model_only():
+                    output = run().model_copy(update={"served_by": "fast_model"})
+            except Exception:
+                # the template is the last resort, whatever went wrong
+                output = None
+        return self._finish(input_data, output or template_output(input_data))
+
+    async def aserve(self, input_data: AgentInput, run: Callable[[], Awaitable[AgentOutput]]) -> AgentOutput:
+        """Async version of serve."""
+        output = self._local(input_data)
+        if output is None and not get_scheduler().circuit_open(get_fast_model_name()):
+            try:
+                with fast_model_only():
+                    output = (await run()).model_copy(update={"served_by": "fast_model"})
+            except Exception:
+                output = None
+        return self._finish(input_data, output or template_output(input_data))
+
+    def render_metrics(self) -> List[str]:
+        """Render the degraded answer counters in the Prometheus text format."""
+        lines = [
+            "# HELP cooking_agent_degraded_responses_total Requests answered by a fallback tier while the provider was unavailable.",
+            "# TYPE cooking_agent_degraded_responses_total counter",
+        ]
+        for tier in TIERS:
+            lines.append(f'cooking_agent_degraded_responses_total{{tier="{tier}"}} {self.served.get(tier, 0)}')
+        return lines
+
+
+def _create_degradation_ladder() -> Optional[DegradationLadder]:
+    """Build the degradation ladder from environment variables."""
+    if os.getenv("DEGRADATION_ENABLED", "true").lower() != "true":
+        return None
+
+    return DegradationLadder(
+        max_size=int(os.getenv("DEGRADED_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("DEGRADED_CACHE_TTL", "86400")),
+        corpus_threshold=float(os.getenv("DEGRADED_MATCH_THRESHOLD", "0.5")),
+    )
+
+_degradation_ladder: Optional[DegradationLadder] = None
+_degradation_ladder_loaded = False
+_degradation_ladder_lock = threading.Lock()
+
+def _render_degradation_metrics() -> List[str]:
+    return _degradation_ladder.render_metrics() if _degradation_ladder is not None else []
+
+register_collector(_render_degradation_metrics)
+
+def get_degradation_ladder() -> Optional[DegradationLadder]:
+    """
+    Get the process-wide degradation ladder, creating it on first use.
+
+    Returns:
+        DegradationLadder, or None when DEGRADATION_ENABLED is false
+    """
+    global _degradation_ladder, _degradation_ladder_loaded
+
+    if not _degradation_ladder_loaded:
+        with _degradation_ladder_lock:
+            if not _degradation_ladder_loaded:
+                _degradation_ladder = _create_degradation_ladder()
+                _degradation_ladder_loaded = True
+
+    return _degradation_ladder
+
+def set_degradation_ladder(ladder: Optional[DegradationLadder]) -> None:
+    """
+    Replace the process-wide degradation ladder.
+
+    Args:
+        ladder: The ladder to use, or None to let provider failures propagate
+    """
+    global _degradation_ladder, _degradation_ladder_loaded
+
+    with _degradation_ladder_lock:
+        _degradation_ladder = ladder
+        _degradation_ladder_loaded = True
@@ -0,0 +1,171 @@
+"""
+Incremental extraction of the JSON object in a streamed model response.
+
+The model may wrap its JSON in a markdown code fence or surround it with
+prose. JSONStreamParser skips everything before the first "{" and, as
+tokens arrive, decodes each top-level field of the object as soon as its
+value is complete, so callers can act on the fields they need without
+waiting for the rest of the response. Every character is scanned once, no
+matter how the response is split into chunks.
+"""
+
+import json
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError, create_model
+
+# partial versions of the schemas, built on first use
+_partial_models: Dict[Type[BaseModel], Type[BaseModel]] = {}
+
+
+class JSONStreamParser:
+    """Decode the top-level fields of a streamed JSON object as they complete."""
+
+    def __init__(self):
+        self.text = ""
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """
+        Consume the next piece of the response.
+
+        Args:
+            chunk: Text following everything fed so far
+
+        Returns:
+            The top-level fields completed by this chunk, in order
+        """
+        self.text += chunk
+        completed: Dict[str, Any] = {}
+        text = self.text
+
+        while self._position < len(text) and not self.complete:
+            i = self._position
+            char = text[i]
+            self._position += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._key_start is not None:
+                        try:
+                            self._key = json.loads(text[self._key_start:i + 1])
+                        except ValueError:
+                            # a key with an invalid escape leaves its field out
+                            self._key = None
+                        self._key_start = None
+                continue
+
+            if self._depth == 0:
+                # prose or a code fence before the object
+                if char == "{":
+                    self._depth = 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._value_start is None:
+                    self._key_start = i
+            elif char in "{[":
+                self._depth += 1
+            elif char in "]}" and self._depth > 1:
+                self._depth -= 1
+            elif self._depth == 1:
+                if char == ":":
+                    self._value_start = i + 1
+                elif char in ",}":
+                    self._finish_value(text[self._value_start:i] if self._value_start is not None else "", completed)
+                    if char == "}":
+                        self._depth = 0
+                        self.complete = True
+
+        return completed
+
+    def _finish_value(self, raw: str, completed: Dict[str, Any]) -> None:
+        if self._key is not None and raw.strip():
+            try:
+                value = json.loads(raw)
+            except ValueError:
+                pass
+            else:
+                self.fields[self._key] = value
+                completed[self._key] = value
+        self._key = None
+        self._value_start = None
+
+
+def partial_model(schema: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    Get a version of a schema whose fields are all optional.
+
+    Args:
+        schema: The complete schema, e.g. RecipeIdea
+
+    Returns:
+        A model class named Partial<schema> with every field defaulting to None
+    """
+    model = _partial_models.get(schema)
+    if model is None:
+        fields = {
+            name: (Optional[field.annotation], None)
+            for name, field in schema.model_fields.items()
+        }
+        model = create_model(f"Partial{schema.__name__}", __doc__=schema.__doc__, **fields)
+        _partial_models[schema] = model
+    return model
+
+
+def validate_partial(schema: Type[BaseModel], fields: Dict[str, Any]) -> BaseModel:
+    """
+    Validate the fields received so far against a schema.
+
+    Fields with an invalid value are dropped rather than failing the rest.
+
+    Args:
+        schema: The complete schema
+        fields: Decoded top-level fields
+
+    Returns:
+        An instance of partial_model(schema)
+    """
+    model = partial_model(schema)
+    valid = {}
+    for name, value in fields.items():
+        if name not in model.model_fields:
+            continue
+        try:
+            model.model_validate({name: value})
+        except ValidationError:
+            continue
+        valid[name] = value
+    return model.model_validate(valid)
+
+
+def extract_json_fields(content: str) -> Dict[str, Any]:
+    """
+    Get the fields of the JSON object in a complete model response.
+
+    A response cut short, e.g. by max_tokens, still yields the fields that
+    were complete.
+
+    Args:
+        content: The model response
+
+    Returns:
+        The decoded top-level fields, empty when there is no JSON object
+    """
+    parser = JSONStreamParser()
+    parser.feed(content)
+    return parser.fields
@@ -0,0 +1,105 @@
+"""
+Callback handler recording the timing and token usage of LLM calls.
+
+Kept apart from agent.metrics because it depends on LangChain, which the
+API module must not load before its warm-up; only the agent imports it.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .metrics import _add_span, get_metrics
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """Callback handler that records the timing and token usage of LLM calls."""
+
+    # run in the calling thread instead of an executor to keep overhead low
+    run_inline = True
+
+    def __init__(self):
+        self._runs: Dict[UUID, List[Any]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node", "unknown")
+        model = (metadata or {}).get("ls_model_name") or "unknown"
+        # node, start time, time to first token, model
+        self._runs[run_id] = [node, time.perf_counter(), None, model]
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.get(run_id)
+        if run is not None and run[2] is None:
+            run[2] = time.perf_counter() - run[1]
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        node, start, time_to_first_token, model = run
+        duration = time.perf_counter() - start
+        if time_to_first_token is None:
+            # not streamed, so the first token arrived with the whole response
+            time_to_first_token = duration
+
+        input_tokens, output_tokens, cache_read, cache_write = _token_usage(response)
+        get_metrics().record_llm_call(
+            node, duration, time_to_first_token, input_tokens, output_tokens, model, cache_read, cache_write
+        )
+        _add_span({
+            "node": node,
+            "model": model,
+            "llm_duration_ms": round(duration * 1000, 2),
+            "time_to_first_token_ms": round(time_to_first_token * 1000, 2),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_read_tokens": cache_read,
+            "cache_write_tokens": cache_write,
+        })
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        # a cancelled call, such as the losing half of a hedged call, didn't fail
+        if run is not None and not isinstance(error, asyncio.CancelledError):
+            get_metrics().record_llm_error(run[0])
+
+
+def _token_usage(response: LLMResult) -> Tuple[int, int, int, int]:
+    """
+    Read the token counts from an LLM result.
+
+    Returns:
+        Input, output, prompt cache read and prompt cache write tokens; the
+        input tokens include the cached ones
+    """
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                details = usage.get("input_token_details") or {}
+                return (
+                    usage.get("input_tokens", 0),
+                    usage.get("output_tokens", 0),
+                    details.get("cache_read") or 0,
+                    details.get("cache_creation") or 0,
+                )
+
+    usage = (response.llm_output or {}).get("usage") or {}
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_write = usage.get("cache_creation_input_tokens") or 0
+    return usage.get("input_tokens", 0) + cache_read + cache_write, usage.get("output_tokens", 0), cache_read, cache_write
+
+_handler = LLMMetricsHandler()
+
+def get_metrics_handler() -> LLMMetricsHandler:
+    """
+    Get the shared callback handler to attach to graph runs.
+
+    Returns:
+        LLMMetricsHandler: The shared handler
+    """
+    return _handler
@@ -0,0 +1,397 @@
+"""
+Latency, token and cache instrumentation for the cooking agent graph.
+
+Node wall times are recorded by wrapping the graph nodes, and LLM call
+timings and token counts by the callback handler in agent.llm_metrics.
+Everything is kept in plain in-process counters and rendered in the
+Prometheus text format on demand, so recording costs a few dictionary
+updates per node.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .cache import get_response_cache
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# event loop lag is normally well below the node latencies, so it gets finer buckets
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# one JSON trace record per line on stderr, independent of the app's logging setup
+trace_logger = logging.getLogger("cooking_agent.trace")
+if not trace_logger.handlers:
+    _trace_handler = logging.StreamHandler()
+    _trace_handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_logger.addHandler(_trace_handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+# spans of the request currently being traced, if any
+_current_trace: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar(
+    "cooking_agent_trace", default=None
+)
+
+# provider retries of the node execution currently running, for its span
+_node_retries: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar(
+    "cooking_agent_node_retries", default=None
+)
+
+
+def bucket_quantile(bounds: Sequence[float], cumulative: Sequence[float], total: float, fraction: float) -> float:
+    """
+    Estimate a quantile from cumulative histogram bucket counts.
+
+    Args:
+        bounds: Upper bounds of the buckets, without +Inf
+        cumulative: Observations at or below each bound
+        total: All observations, including those above the last bound
+        fraction: The quantile, between 0 and 1
+
+    Returns:
+        float: The estimate, or the last bound if it falls above it
+    """
+    if not total:
+        return 0.0
+    rank = fraction * total
+    lower, below = 0.0, 0.0
+    for bound, count in zip(bounds, cumulative):
+        if count >= rank:
+            width = count - below
+            return lower + (bound - lower) * ((rank - below) / width if width else 1.0)
+        lower, below = bound, count
+    return bounds[-1]
+
+
+class Histogram:
+    """Cumulative latency histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket, like Prometheus' histogram_quantile."""
+        return bucket_quantile(self.buckets, list(itertools.accumulate(self.counts)), self.count, fraction)
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class AgentMetrics:
+    """Process-wide per-node counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.node_duration: Dict[str, Histogram] = {}
+        self.node_errors: Dict[str, int] = {}
+        self.llm_duration: Dict[str, Histogram] = {}
+        self.llm_profile_duration: Dict[Tuple[str, str], Histogram] = {}
+        self.llm_time_to_first_token: Dict[str, Histogram] = {}
+        self.llm_calls: Dict[str, int] = {}
+        self.llm_errors: Dict[str, int] = {}
+        self.input_tokens: Dict[str, int] = {}
+        self.output_tokens: Dict[str, int] = {}
+        self.cache_read_tokens: Dict[str, int] = {}
+        self.cache_write_tokens: Dict[str, int] = {}
+        self.event_loop_lag = Histogram(LAG_BUCKETS)
+        self.event_loop_lag_max = 0.0
+
+    def record_node(self, node: str, duration: float, error: bool = False) -> None:
+        with self._lock:
+            self.node_duration.setdefault(node, Histogram()).observe(duration)
+            if error:
+                self.node_errors[node] = self.node_errors.get(node, 0) + 1
+
+    def record_llm_call(
+        self,
+        node: str,
+        duration: float,
+        time_to_first_token: float,
+        input_tokens: int,
+        output_tokens: int,
+        model: str = "unknown",
+        cache_read_tokens: int = 0,
+        cache_write_tokens: int = 0,
+    ) -> None:
+        with self._lock:
+            self.llm_calls[node] = self.llm_calls.get(node, 0) + 1
+            self.llm_duration.setdefault(node, Histogram()).observe(duration)
+            self.llm_profile_duration.setdefault((node, model), Histogram()).observe(duration)
+            self.llm_time_to_first_token.setdefault(node, Histogram()).observe(time_to_first_token)
+            self.input_tokens[node] = self.input_tokens.get(node, 0) + input_tokens
+            self.output_tokens[node] = self.output_tokens.get(node, 0) + output_tokens
+            self.cache_read_tokens[node] = self.cache_read_tokens.get(node, 0) + cache_read_tokens
+            self.cache_write_tokens[node] = self.cache_write_tokens.get(node, 0) + cache_write_tokens
+
+    def record_llm_error(self, node: str) -> None:
+        with self._lock:
+            self.llm_errors[node] = self.llm_errors.get(node, 0) + 1
+
+    def record_event_loop_lag(self, lag: float) -> None:
+        with self._lock:
+            self.event_loop_lag.observe(lag)
+            self.event_loop_lag_max = max(self.event_loop_lag_max, lag)
+
+    def reset(self) -> None:
+        """Clear every counter, for tests."""
+        self.__init__()
+
+    def profile_report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize LLM call latency per model profile.
+
+        Returns:
+            Calls, mean and estimated p50/p95 seconds, keyed by "node (model)"
+        """
+        with self._lock:
+            return {
+                f"{node} ({model})": {
+                    "calls": hist.count,
+                    "mean_s": hist.total / hist.count if hist.count else 0.0,
+                    "p50_s": hist.quantile(0.50),
+                    "p95_s": hist.quantile(0.95),
+                }
+                for (node, model), hist in sorted(self.llm_profile_duration.items())
+            }
+
+    def render(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, values: Dict[str, int]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for node, value in sorted(values.items()):
+                lines.append(f'{name}{{node="{node}"}} {value}')
+
+        def histogram(name: str, help_text: str, values: Dict[str, Histogram]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for node, hist in sorted(values.items()):
+                lines.extend(hist.render(name, f'node="{node}"'))
+
+        with self._lock:
+            histogram("cooking_agent_node_duration_seconds", "Wall time of each graph node execution.", self.node_duration)
+            counter("cooking_agent_node_errors_total", "Graph node executions that raised.", self.node_errors)
+            histogram("cooking_agent_llm_duration_seconds", "Wall time of each LLM call.", self.llm_duration)
+            lines.append("# HELP cooking_agent_llm_profile_duration_seconds Wall time of LLM calls per node and model.")
+            lines.append("# TYPE cooking_agent_llm_profile_duration_seconds histogram")
+            for (node, model), hist in sorted(self.llm_profile_duration.items()):
+                lines.extend(hist.render("cooking_agent_llm_profile_duration_seconds", f'node="{node}",model="{model}"'))
+            histogram(
+                "cooking_agent_llm_time_to_first_token_seconds",
+                "Time until the first token of each LLM call arrived.",
+                self.llm_time_to_first_token,
+            )
+            counter("cooking_agent_llm_calls_total", "Completed LLM calls.", self.llm_calls)
+            counter("cooking_agent_llm_errors_total", "Failed LLM calls.", self.llm_errors)
+            counter("cooking_agent_llm_input_tokens_total", "Input tokens sent to the model.", self.input_tokens)
+            counter("cooking_agent_llm_output_tokens_total", "Output tokens produced by the model.", self.output_tokens)
+            counter(
+                "cooking_agent_llm_cache_read_tokens_total",
+                "Input tokens read from the provider's prompt cache.",
+                self.cache_read_tokens,
+            )
+            counter(
+                "cooking_agent_llm_cache_write_tokens_total",
+                "Input tokens written to the provider's prompt cache.",
+                self.cache_write_tokens,
+            )
+
+            if self.event_loop_lag.count:
+                lines.append("# HELP cooking_agent_event_loop_lag_seconds How late the event loop woke up a sleeping task.")
+                lines.append("# TYPE cooking_agent_event_loop_lag_seconds histogram")
+                lines.extend(self.event_loop_lag.render("cooking_agent_event_loop_lag_seconds", 'loop="main"'))
+                lines.append("# HELP cooking_agent_event_loop_lag_max_seconds Largest event loop lag seen.")
+                lines.append("# TYPE cooking_agent_event_loop_lag_max_seconds gauge")
+                lines.append(f"cooking_agent_event_loop_lag_max_seconds {self.event_loop_lag_max}")
+
+        lines.append("# HELP process_cpu_seconds_total Total user and system CPU time spent in seconds.")
+        lines.append("# TYPE process_cpu_seconds_total counter")
+        lines.append(f"process_cpu_seconds_total {time.process_time()}")
+
+        cache = get_response_cache()
+        if cache is not None:
+            stats = cache.stats()
+            counter(
+                "cooking_agent_cache_hits_total",
+                "Response cache hits.",
+                {node: counters["hits"] for node, counters in stats.items()},
+            )
+            counter(
+                "cooking_agent_cache_misses_total",
+                "Response cache misses.",
+                {node: counters["misses"] for node, counters in stats.items()},
+            )
+
+        for collector in _collectors:
+            lines.extend(collector())
+
+        return "\n".join(lines) + "\n"
+
+
+_metrics = AgentMetrics()
+
+# extra metric sources rendered after the agent metrics
+_collectors: List[Callable[[], List[str]]] = []
+
+def get_metrics() -> AgentMetrics:
+    """
+    Get the process-wide agent metrics.
+
+    Returns:
+        AgentMetrics: The shared metrics
+    """
+    return _metrics
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    """
+    Add a function that renders extra Prometheus lines for /metrics.
+
+    Args:
+        collector: Callable returning lines in the Prometheus text format
+    """
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+async def monitor_event_loop_lag(interval: float = 0.1) -> None:
+    """
+    Record how late the running event loop wakes up a task, until cancelled.
+
+    Blocking calls on the loop show up as lag, so this is the signal to
+    watch when sizing the service or hunting for sync work in async code.
+
+    Args:
+        interval: Seconds between samples
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        _metrics.record_event_loop_lag(max(0.0, loop.time() - expected))
+
+def _add_span(span: Dict[str, Any]) -> None:
+    """Add a span to the trace of the current request, if it is being traced."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.append(span)
+
+
+def record_retry(node: str) -> None:
+    """Count a retried provider call towards the span of the node execution running it."""
+    retries = _node_retries.get()
+    if retries is not None:
+        retries[0] += 1
+
+
+def instrument_node(node: str, func: Callable) -> Callable:
+    """
+    Wrap a graph node function so that its wall time is recorded.
+
+    Args:
+        node: Name of the node in the graph
+        func: The sync or async node function
+
+    Returns:
+        The wrapped function
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(state):
+            start = time.perf_counter()
+            error = True
+            retries = [0]
+            token = _node_retries.set(retries)
+            try:
+                result = await func(state)
+                error = False
+                return result
+            finally:
+                _node_retries.reset(token)
+                duration = time.perf_counter() - start
+                _metrics.record_node(node, duration, error)
+                _add_span({"node": node, "duration_ms": round(duration * 1000, 2), "error": error, "retries": retries[0]})
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(state):
+        start = time.perf_counter()
+        error = True
+        retries = [0]
+        token = _node_retries.set(retries)
+        try:
+            result = func(state)
+            error = False
+            return result
+        finally:
+            _node_retries.reset(token)
+            duration = time.perf_counter() - start
+            _metrics.record_node(node, duration, error)
+            _add_span({"node": node, "duration_ms": round(duration * 1000, 2), "error": error, "retries": retries[0]})
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def trace_request(**attributes: Any) -> Iterator[Optional[List[Dict[str, Any]]]]:
+    """
+    Collect per-node spans for one request and log them as one JSON line.
+
+    Does nothing unless TRACE_LOG_ENABLED is true.
+
+    Args:
+        attributes: Extra fields to include in the trace record
+
+    Yields:
+        The list the spans are collected in, or None when tracing is off
+    """
+    if os.getenv("TRACE_LOG_ENABLED", "false").lower() != "true":
+        yield None
+        return
+
+    spans: List[Dict[str, Any]] = []
+    token = _current_trace.set(spans)
+    start = time.perf_counter()
+    try:
+        yield spans
+    finally:
+        _current_trace.reset(token)
+        record = {
+            "trace_id": uuid.uuid4().hex,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            **attributes,
+            "spans": spans,
+        }
+        trace_logger.info(json.dumps(record, default=str))
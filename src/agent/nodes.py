@@ -2,26 +2,158 @@
 Node definitions for the cooking agent's workflow.
 """
 
+import asyncio
 import os
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Awaitable, Callable, Dict, List, Tuple, Any, Optional, Type
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage
+from pydantic import BaseModel
 
-from model.claude_client import get_claude_client
-from .schema import AgentState, ParsedIngredients, RecipeIdea, AgentOutput
+from model.claude_client import cached_system_prompt, get_claude_client
+from model.config import get_model_config, is_fast_model_only
+from model.hedging import get_hedging_policy
+from model.scheduler import get_scheduler, register_retry_listener
+from .cache import get_response_cache, make_cache_key
+from .categorizer import KITCHEN_ESSENTIALS, get_categorizer, normalize_ingredient
+from .corpus import get_recipe_corpus
+from .json_stream import extract_json_fields
+from .metrics import record_retry, register_collector
+from .schema import AgentState, ParsedIngredients, RecipeIdea, RecipePlan, AgentOutput
 
-def parse_ingredients(state: AgentState) -> AgentState:
-    """
-    Parse and categorized ingredients from user input.
+# input fields that the prompts of the cached nodes depend on
+PARSE_INGREDIENTS_FIELDS = ("ingredients", "dietary_restrictions")
+RECIPE_IDEA_FIELDS = ("ingredients", "dietary_restrictions", "preferences")
+FULL_RECIPE_FIELDS = ("ingredients", "dietary_restrictions", "query")
 
-    Args:
-        state: current agent state
+# input fields each model-backed node reads directly; what a node reads from
+# an earlier node's output is covered by re-running that node first
+NODE_INPUT_FIELDS = {
+    "parse_ingredients": PARSE_INGREDIENTS_FIELDS,
+    "generate_recipe_idea": RECIPE_IDEA_FIELDS,
+    "generate_recipe_ideas": RECIPE_IDEA_FIELDS,
+    "analyze_ingredients": RECIPE_IDEA_FIELDS,
+    "create_full_recipe": FULL_RECIPE_FIELDS,
+}
 
-    Returns:
-        Updated agent state with parsed ingredients
+# state fields each model-backed node produces
+NODE_OUTPUT_FIELDS = {
+    "parse_ingredients": ("parsed_ingredients",),
+    "generate_recipe_idea": ("recipe_idea",),
+    "generate_recipe_ideas": ("recipe_ideas",),
+    "analyze_ingredients": ("parsed_ingredients", "recipe_idea"),
+    "create_full_recipe": ("recipe_content",),
+}
+
+def _scheduled_call(node: str, messages: List[BaseMessage], func: Callable[[], Any]) -> Any:
+    """Make a call through the provider scheduler, hedged if hedging is enabled."""
+    scheduler = get_scheduler()
+    hedging = get_hedging_policy()
+    if hedging is None:
+        return scheduler.call(node, messages, func)
+    # each attempt waits for its own rate limit capacity
+    return hedging.call(node, lambda: scheduler.call(node, messages, func))
+
+async def _ascheduled_call(node: str, messages: List[BaseMessage], func: Callable[[], Awaitable[Any]]) -> Any:
+    """Async version of _scheduled_call."""
+    scheduler = get_scheduler()
+    hedging = get_hedging_policy()
+    if hedging is None:
+        return await scheduler.acall(node, messages, func)
+    return await hedging.acall(node, lambda: scheduler.acall(node, messages, func))
+
+def _invoke_model(node: str, messages: List[BaseMessage], schema: Optional[Type[BaseModel]] = None) -> str:
     """
-    claude = get_claude_client()
+    Call the model through the provider scheduler, returning its text or
+    the JSON of its structured output.
+    """
+    claude = get_claude_client(get_model_config(node))
+    if schema is None:
+        return _scheduled_call(node, messages, lambda: claude.invoke(messages)).content
+
+    structured = claude.with_structured_output(schema, include_raw=True)
+    result = _scheduled_call(node, messages, lambda: structured.invoke(messages))
+    return result["parsed"].model_dump_json() if result["parsed"] is not None else ""
+
+async def _ainvoke_model(node: str, messages: List[BaseMessage], schema: Optional[Type[BaseModel]] = None) -> str:
+    """Async version of _invoke_model."""
+    claude = get_claude_client(get_model_config(node))
+    if schema is None:
+        return (await _ascheduled_call(node, messages, lambda: claude.ainvoke(messages))).content
+
+    structured = claude.with_structured_output(schema, include_raw=True)
+    result = await _ascheduled_call(node, messages, lambda: structured.ainvoke(messages))
+    return result["parsed"].model_dump_json() if result["parsed"] is not None else ""
+
+def _render_scheduler_metrics() -> List[str]:
+    return get_scheduler().render_metrics()
+
+def _render_hedging_metrics() -> List[str]:
+    hedging = get_hedging_policy()
+    return hedging.render_metrics() if hedging is not None else []
+
+register_collector(_render_scheduler_metrics)
+register_collector(_render_hedging_metrics)
+register_retry_listener(record_retry)
+
+def _cacheable(content: str, schema: Optional[Type[BaseModel]]) -> bool:
+    """Tell whether a response may be cached: not empty and, for structured output, valid for its schema."""
+    if not content:
+        return False
+    if schema is None:
+        return True
+    try:
+        schema.model_validate_json(content)
+    except ValueError:
+        return False
+    return True
+
+def _cached_invoke(
+    node: str,
+    fields: Tuple[str, ...],
+    state: AgentState,
+    messages: List[BaseMessage],
+    schema: Optional[Type[BaseModel]] = None,
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """Return the model response for a node, using the response cache if enabled."""
+    cache = get_response_cache()
+    if cache is None:
+        return _invoke_model(node, messages, schema)
 
+    key = make_cache_key(node, state.input, get_model_config(node), fields, options)
+    content = cache.get(node, key)
+    if content is None:
+        content = _invoke_model(node, messages, schema)
+        # a failed parse must not stand in for the model until the entry expires
+        if _cacheable(content, schema):
+            cache.set(key, content)
+
+    return content
+
+async def _acached_invoke(
+    node: str,
+    fields: Tuple[str, ...],
+    state: AgentState,
+    messages: List[BaseMessage],
+    schema: Optional[Type[BaseModel]] = None,
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """Async version of _cached_invoke."""
+    cache = get_response_cache()
+    if cache is None:
+        return await _ainvoke_model(node, messages, schema)
+
+    key = make_cache_key(node, state.input, get_model_config(node), fields, options)
+    content = cache.get(node, key)
+    if content is None:
+        content = await _ainvoke_model(node, messages, schema)
+        if _cacheable(content, schema):
+            cache.set(key, content)
+
+    return content
+
+def _parse_ingredients_messages(state: AgentState) -> List[BaseMessage]:
+    """Build the prompt for categorizing the ingredients."""
     ingredients_text = ", ".join(state.input.ingredients)
 
     system_prompt = """You are an expert chef analyzing a list of ingredients. 
@@ -34,32 +166,23 @@ def parse_ingredients(state: AgentState) -> AgentState:
     Also identify any common essentials that might be missing but are typically assumed to be in a kitchen (salt, pepper, common spices).
     Format your response as JSON matching the ParsedIngredients schema.
     """
-    
+
     user_prompt = f"Here are my ingredients: {ingredients_text}"
     if state.input.dietary_restrictions:
         restrictions = ", ".join(state.input.dietary_restrictions)
         user_prompt += f"\nI have these dietary restrictions: {restrictions}"
-    
-    messages = [
-        SystemMessage(content=system_prompt),
+
+    return [
+        cached_system_prompt(system_prompt),
         HumanMessage(content=user_prompt)
     ]
-    
-    response = claude.invoke(messages)
-    
-    # Parse the JSON response
+
+def _apply_parsed_ingredients(state: AgentState, content: str) -> AgentState:
+    """Store the categorized ingredients from the model response on the state."""
+    # Parse the JSON response, which may be wrapped in a code fence or cut short
     try:
-        import json
-        # Extract JSON from response
-        json_content = response.content
-        # If JSON is embedded in markdown, extract it
-        if "```json" in json_content:
-            json_content = json_content.split("```json")[1].split("```")[0].strip()
-        elif "```" in json_content:
-            json_content = json_content.split("```")[1].split("```")[0].strip()
-        
-        parsed_data = json.loads(json_content)
-        
+        parsed_data = extract_json_fields(content)
+
         # Create ParsedIngredients from the parsed data
         parsed_ingredients = ParsedIngredients(
             main_ingredients=state.input.ingredients,
@@ -69,11 +192,11 @@ def parse_ingredients(state: AgentState) -> AgentState:
             seasonings=parsed_data.get("seasonings", []),
             missing_essentials=parsed_data.get("missing_essentials", [])
         )
-        
+
         # Update state
         state.parsed_ingredients = parsed_ingredients
-        
-    except Exception as e:
+
+    except Exception:
         # Fallback if JSON parsing fails
         state.parsed_ingredients = ParsedIngredients(
             main_ingredients=state.input.ingredients,
@@ -83,89 +206,304 @@ def parse_ingredients(state: AgentState) -> AgentState:
             seasonings=[],
             missing_essentials=[]
         )
-    
-    return state  
 
-def generate_recipe_idea(state: AgentState) -> AgentState:
+    return state
+
+def _categorize_locally(state: AgentState) -> Tuple[Dict[str, List[str]], List[str]]:
+    """Categorize the known ingredients locally, returning the unknown ones."""
+    if os.getenv("LOCAL_CATEGORIZER_ENABLED", "true").lower() != "true":
+        return {}, list(state.input.ingredients)
+    return get_categorizer().categorize(state.input.ingredients)
+
+def _subset_state(state: AgentState, ingredients: List[str]) -> AgentState:
+    """Build a state that only contains some of the input ingredients."""
+    return AgentState(input=state.input.model_copy(update={"ingredients": ingredients}))
+
+def _merge_parsed_ingredients(
+    state: AgentState,
+    categories: Dict[str, List[str]],
+    model_parsed: Optional[ParsedIngredients]
+) -> AgentState:
+    """Combine locally categorized ingredients with the model's categorization."""
+    parsed = {field: list(categories.get(field, [])) for field in ("proteins", "vegetables", "grains", "seasonings")}
+
+    missing_essentials = get_categorizer().missing_essentials(state.input.ingredients)
+    if model_parsed is not None:
+        for field, values in parsed.items():
+            values.extend(getattr(model_parsed, field))
+        # the model only saw the unknown ingredients, so drop what the full list already has
+        have = {normalize_ingredient(name) for name in state.input.ingredients}
+        have.update(essential for essential in KITCHEN_ESSENTIALS if essential not in missing_essentials)
+        missing_essentials = [
+            item for item in model_parsed.missing_essentials if normalize_ingredient(item) not in have
+        ]
+
+    state.parsed_ingredients = ParsedIngredients(
+        main_ingredients=state.input.ingredients,
+        missing_essentials=missing_essentials,
+        **parsed
+    )
+
+    return state
+
+def parse_ingredients(state: AgentState) -> AgentState:
     """
-    Generate recipe ideas based on parsed ingredients.
-    
+    Parse and categorized ingredients from user input.
+
     Args:
-        state: Current agent state with parsed ingredients
-        
+        state: current agent state
+
     Returns:
-        Updated agent state with recipe idea
+        Updated agent state with parsed ingredients
     """
-    claude = get_claude_client()
-    
-    if not state.parsed_ingredients:
-        # Fallback if ingredients haven't been parsed
-        state = parse_ingredients(state)
-    
+    categories, unknown = _categorize_locally(state)
+    if not unknown:
+        return _merge_parsed_ingredients(state, categories, None)
+
+    # only ask the model about the ingredients the local index doesn't know
+    unknown_state = _subset_state(state, unknown)
+    content = _cached_invoke(
+        "parse_ingredients", PARSE_INGREDIENTS_FIELDS, unknown_state, _parse_ingredients_messages(unknown_state)
+    )
+    unknown_state = _apply_parsed_ingredients(unknown_state, content)
+    return _merge_parsed_ingredients(state, categories, unknown_state.parsed_ingredients)
+
+async def aparse_ingredients(state: AgentState) -> AgentState:
+    """
+    Async version of parse_ingredients.
+
+    Args:
+        state: current agent state
+
+    Returns:
+        Updated agent state with parsed ingredients
+    """
+    categories, unknown = _categorize_locally(state)
+    if not unknown:
+        return _merge_parsed_ingredients(state, categories, None)
+
+    # only ask the model about the ingredients the local index doesn't know
+    unknown_state = _subset_state(state, unknown)
+    content = await _acached_invoke(
+        "parse_ingredients", PARSE_INGREDIENTS_FIELDS, unknown_state, _parse_ingredients_messages(unknown_state)
+    )
+    unknown_state = _apply_parsed_ingredients(unknown_state, content)
+    return _merge_parsed_ingredients(state, categories, unknown_state.parsed_ingredients)
+
+def _ingredients_prompt(state: AgentState) -> str:
+    """Describe the categorized ingredients, dietary restrictions and preferences for the idea prompts."""
     # Create formatted ingredient lists
     all_ingredients = state.input.ingredients
     proteins = state.parsed_ingredients.proteins
     vegetables = state.parsed_ingredients.vegetables
     grains = state.parsed_ingredients.grains
-    
-    system_prompt = """You are a creative chef who specializes in creating recipe ideas from available ingredients.
-    Based on the ingredients provided, suggest a suitable recipe concept.
-    Consider dietary restrictions and preferences if provided.
-    Format your response as JSON that matches the RecipeIdea schema.
-    """
-    
+
     user_prompt = f"Available ingredients: {', '.join(all_ingredients)}\n"
-    
+
     if proteins:
         user_prompt += f"Proteins: {', '.join(proteins)}\n"
     if vegetables:
         user_prompt += f"Vegetables: {', '.join(vegetables)}\n"
     if grains:
         user_prompt += f"Grains/Starches: {', '.join(grains)}\n"
-    
+
     if state.input.dietary_restrictions:
         user_prompt += f"Dietary restrictions: {', '.join(state.input.dietary_restrictions)}\n"
-    
+
     if state.input.preferences:
         preferences_text = ", ".join([f"{k}: {v}" for k, v in state.input.preferences.items()])
         user_prompt += f"Preferences: {preferences_text}\n"
-    
+
+    return user_prompt
+
+def _recipe_idea_messages(state: AgentState) -> List[BaseMessage]:
+    """Build the prompt for proposing a recipe idea."""
+    system_prompt = """You are a creative chef who specializes in creating recipe ideas from available ingredients.
+    Based on the ingredients provided, suggest a suitable recipe concept.
+    Consider dietary restrictions and preferences if provided.
+    Format your response as JSON that matches the RecipeIdea schema.
+    """
+
+    user_prompt = _ingredients_prompt(state)
     user_prompt += "\nSuggest a creative recipe idea that uses these ingredients efficiently."
-    
-    messages = [
-        SystemMessage(content=system_prompt),
+
+    return [
+        cached_system_prompt(system_prompt),
         HumanMessage(content=user_prompt)
     ]
-    
-    response = claude.invoke(messages)
-    
-    # Parse the JSON response
+
+def _recipe_idea_from(parsed_data: Dict[str, Any]) -> RecipeIdea:
+    """Build a RecipeIdea from decoded JSON, filling in defaults for missing fields."""
+    return RecipeIdea(
+        name=parsed_data.get("name", "Custom Recipe"),
+        cuisine_type=parsed_data.get("cuisine_type", "Fusion"),
+        difficulty=parsed_data.get("difficulty", "medium"),
+        cooking_time=parsed_data.get("cooking_time", "30 minutes"),
+        suitable_for_restrictions=parsed_data.get("suitable_for_restrictions", True)
+    )
+
+def _apply_recipe_idea(state: AgentState, content: str) -> AgentState:
+    """Store the recipe idea from the model response on the state."""
+    # Parse the JSON response, which may be wrapped in a code fence or cut short
     try:
-        import json
-        # Extract JSON from response
-        json_content = response.content
-        # If JSON is embedded in markdown, extract it
-        if "```json" in json_content:
-            json_content = json_content.split("```json")[1].split("```")[0].strip()
-        elif "```" in json_content:
-            json_content = json_content.split("```")[1].split("```")[0].strip()
-        
-        parsed_data = json.loads(json_content)
-        
-        # Create RecipeIdea from the parsed data
-        recipe_idea = RecipeIdea(
-            name=parsed_data.get("name", "Custom Recipe"),
-            cuisine_type=parsed_data.get("cuisine_type", "Fusion"),
-            difficulty=parsed_data.get("difficulty", "medium"),
-            cooking_time=parsed_data.get("cooking_time", "30 minutes"),
-            suitable_for_restrictions=parsed_data.get("suitable_for_restrictions", True)
-        )
-        
+        parsed_data = extract_json_fields(content)
+
         # Update state
-        state.recipe_idea = recipe_idea
-        
-    except Exception as e:
+        state.recipe_idea = _recipe_idea_from(parsed_data)
+
+    except Exception:
         # Fallback if JSON parsing fails
+        state.recipe_idea = _recipe_idea_from({})
+
+    return state
+
+def generate_recipe_idea(state: AgentState) -> AgentState:
+    """
+    Generate recipe ideas based on parsed ingredients.
+
+    Args:
+        state: Current agent state with parsed ingredients
+
+    Returns:
+        Updated agent state with recipe idea
+    """
+    if not state.parsed_ingredients:
+        # Fallback if ingredients haven't been parsed
+        state = parse_ingredients(state)
+
+    content = _cached_invoke(
+        "generate_recipe_idea", RECIPE_IDEA_FIELDS, state, _recipe_idea_messages(state)
+    )
+    return _apply_recipe_idea(state, content)
+
+async def agenerate_recipe_idea(state: AgentState) -> AgentState:
+    """
+    Async version of generate_recipe_idea.
+
+    Args:
+        state: Current agent state with parsed ingredients
+
+    Returns:
+        Updated agent state with recipe idea
+    """
+    if not state.parsed_ingredients:
+        # Fallback if ingredients haven't been parsed
+        state = await aparse_ingredients(state)
+
+    content = await _acached_invoke(
+        "generate_recipe_idea", RECIPE_IDEA_FIELDS, state, _recipe_idea_messages(state)
+    )
+    return _apply_recipe_idea(state, content)
+
+
+def _recipe_ideas_messages(state: AgentState) -> List[BaseMessage]:
+    """Build the prompt for proposing several distinct recipe ideas."""
+    # the count goes in the user prompt so the system prompt stays cacheable
+    system_prompt = """You are a creative chef who specializes in creating recipe ideas from available ingredients.
+    Based on the ingredients provided, suggest the requested number of distinct recipe ideas that differ in
+    dish type, cuisine or cooking method, so the user has real alternatives to choose from.
+    Consider dietary restrictions and preferences if provided.
+    Format your response as a JSON object with an "ideas" list of objects matching the RecipeIdea schema.
+    """
+
+    user_prompt = _ingredients_prompt(state)
+    user_prompt += f"\nSuggest {state.recipe_count} distinct recipe ideas that use these ingredients efficiently."
+
+    return [cached_system_prompt(system_prompt), HumanMessage(content=user_prompt)]
+
+def _apply_recipe_ideas(state: AgentState, content: str) -> AgentState:
+    """Store up to recipe_count distinct recipe ideas from the model response on the state."""
+    ideas: List[RecipeIdea] = []
+    names = set()
+
+    candidates = extract_json_fields(content).get("ideas")
+    for parsed_data in candidates if isinstance(candidates, list) else []:
+        try:
+            idea = _recipe_idea_from(parsed_data)
+        except Exception:
+            continue
+        # two ideas with the same name would give the same recipe twice
+        if idea.name.strip().lower() not in names:
+            names.add(idea.name.strip().lower())
+            ideas.append(idea)
+
+    state.recipe_ideas = ideas[:state.recipe_count] or [_recipe_idea_from({})]
+
+    return state
+
+def generate_recipe_ideas(state: AgentState) -> AgentState:
+    """
+    Generate recipe_count distinct recipe ideas based on parsed ingredients.
+
+    Used by the "multi" pipeline mode in place of generate_recipe_idea.
+
+    Args:
+        state: Current agent state with parsed ingredients
+
+    Returns:
+        Updated agent state with recipe ideas
+    """
+    content = _cached_invoke(
+        "generate_recipe_ideas", RECIPE_IDEA_FIELDS, state, _recipe_ideas_messages(state),
+        options={"count": state.recipe_count}
+    )
+    return _apply_recipe_ideas(state, content)
+
+async def agenerate_recipe_ideas(state: AgentState) -> AgentState:
+    """
+    Async version of generate_recipe_ideas.
+
+    Args:
+        state: Current agent state with parsed ingredients
+
+    Returns:
+        Updated agent state with recipe ideas
+    """
+    content = await _acached_invoke(
+        "generate_recipe_ideas", RECIPE_IDEA_FIELDS, state, _recipe_ideas_messages(state),
+        options={"count": state.recipe_count}
+    )
+    return _apply_recipe_ideas(state, content)
+
+
+def _recipe_plan_messages(state: AgentState) -> List[BaseMessage]:
+    """Build the prompt for categorizing the ingredients and proposing a recipe idea at once."""
+    system_prompt = """You are an expert chef planning a recipe from a list of ingredients.
+    First categorize the ingredients into proteins, vegetables and fruits, grains and starches,
+    and seasonings, and identify common kitchen essentials that might be missing (salt, pepper, common spices).
+    Then suggest a creative recipe concept that uses these ingredients efficiently.
+    Consider dietary restrictions and preferences if provided.
+    Return both as a single recipe plan.
+    """
+
+    user_prompt = f"Available ingredients: {', '.join(state.input.ingredients)}\n"
+
+    if state.input.dietary_restrictions:
+        user_prompt += f"Dietary restrictions: {', '.join(state.input.dietary_restrictions)}\n"
+
+    if state.input.preferences:
+        preferences_text = ", ".join([f"{k}: {v}" for k, v in state.input.preferences.items()])
+        user_prompt += f"Preferences: {preferences_text}\n"
+
+    return [
+        cached_system_prompt(system_prompt),
+        HumanMessage(content=user_prompt)
+    ]
+
+def _apply_recipe_plan(state: AgentState, content: str) -> AgentState:
+    """Store the ingredient analysis and recipe idea from a recipe plan on the state."""
+    try:
+        plan = RecipePlan.model_validate_json(content)
+
+        state.parsed_ingredients = plan.parsed_ingredients.model_copy(
+            update={"main_ingredients": state.input.ingredients}
+        )
+        state.recipe_idea = plan.recipe_idea
+
+    except Exception:
+        # Fallback if the structured output is missing or invalid
+        categories, _ = _categorize_locally(state)
+        state = _merge_parsed_ingredients(state, categories, None)
         state.recipe_idea = RecipeIdea(
             name="Custom Recipe",
             cuisine_type="Fusion",
@@ -173,87 +511,208 @@ def generate_recipe_idea(state: AgentState) -> AgentState:
             cooking_time="30 minutes",
             suitable_for_restrictions=True
         )
-    
+
     return state
 
+def analyze_ingredients(state: AgentState) -> AgentState:
+    """
+    Categorize ingredients and generate a recipe idea in a single model call.
 
-def create_full_recipe(state: AgentState) -> AgentState:
+    Used by the "fused" pipeline mode in place of parse_ingredients and
+    generate_recipe_idea.
+
+    Args:
+        state: current agent state
+
+    Returns:
+        Updated agent state with parsed ingredients and recipe idea
     """
-    Create a detailed recipe based on the recipe idea and ingredients.
-    
+    content = _cached_invoke(
+        "analyze_ingredients", RECIPE_IDEA_FIELDS, state, _recipe_plan_messages(state), RecipePlan
+    )
+    return _apply_recipe_plan(state, content)
+
+async def aanalyze_ingredients(state: AgentState) -> AgentState:
+    """
+    Async version of analyze_ingredients.
+
     Args:
-        state: Current agent state with recipe idea
-        
+        state: current agent state
+
     Returns:
-        Updated agent state with full recipe content
+        Updated agent state with parsed ingredients and recipe idea
     """
-    claude = get_claude_client()
-    
-    if not state.recipe_idea:
-        # Generate recipe idea if not already done
-        state = generate_recipe_idea(state)
-    
+    content = await _acached_invoke(
+        "analyze_ingredients", RECIPE_IDEA_FIELDS, state, _recipe_plan_messages(state), RecipePlan
+    )
+    return _apply_recipe_plan(state, content)
+
+
+def _full_recipe_messages(state: AgentState) -> List[BaseMessage]:
+    """Build the prompt for writing out the full recipe."""
     system_prompt = """You are a professional chef creating detailed recipes.
     Create a complete recipe with ingredients list, measurements, and step-by-step instructions.
     The recipe should be practical, detailed, and easy to follow.
     Format the recipe clearly with sections for Ingredients, Instructions, and Cooking Tips.
     """
-    
+
     user_prompt = f"Recipe: {state.recipe_idea.name}\n"
     user_prompt += f"Cuisine: {state.recipe_idea.cuisine_type}\n"
     user_prompt += f"Difficulty: {state.recipe_idea.difficulty}\n"
     user_prompt += f"Available ingredients: {', '.join(state.input.ingredients)}\n"
-    
+
     if state.parsed_ingredients.missing_essentials:
         user_prompt += f"Assumed kitchen staples: {', '.join(state.parsed_ingredients.missing_essentials)}\n"
-    
+
     if state.input.dietary_restrictions:
         user_prompt += f"Dietary restrictions: {', '.join(state.input.dietary_restrictions)}\n"
-    
+
     if state.input.query:
         user_prompt += f"Additional requirements: {state.input.query}\n"
-    
+
     user_prompt += "\nPlease create a complete recipe with measurements and detailed instructions."
-    
-    messages = [
-        SystemMessage(content=system_prompt),
+
+    return [
+        cached_system_prompt(system_prompt),
         HumanMessage(content=user_prompt)
     ]
-    
-    response = claude.invoke(messages)
-    
+
+
+def create_full_recipe(state: AgentState) -> AgentState:
+    """
+    Create a detailed recipe based on the recipe idea and ingredients.
+
+    Args:
+        state: Current agent state with recipe idea
+
+    Returns:
+        Updated agent state with full recipe content
+    """
+    if not state.recipe_idea:
+        # Generate recipe idea if not already done
+        state = generate_recipe_idea(state)
+
     # Update state with the recipe content
-    state.recipe_content = response.content
-    
+    state.recipe_content = _invoke_model("create_full_recipe", _full_recipe_messages(state))
+
+    return state
+
+
+async def acreate_full_recipe(state: AgentState) -> AgentState:
+    """
+    Async version of create_full_recipe.
+
+    Args:
+        state: Current agent state with recipe idea
+
+    Returns:
+        Updated agent state with full recipe content
+    """
+    if not state.recipe_idea:
+        # Generate recipe idea if not already done
+        state = await agenerate_recipe_idea(state)
+
+    # Update state with the recipe content
+    state.recipe_content = await _ainvoke_model("create_full_recipe", _full_recipe_messages(state))
+
+    return state
+
+
+def create_recipe_variant(state: AgentState) -> Dict[str, Any]:
+    """
+    Write out one of several alternative recipes.
+
+    Runs once per recipe idea in the "multi" pipeline mode, on a state
+    holding that idea, and only adds the finished recipe to the outputs so
+    the parallel branches don't overwrite each other's state.
+
+    Args:
+        state: Agent state with parsed ingredients and one recipe idea
+
+    Returns:
+        Update appending the finished recipe to the outputs
+    """
+    state = prepare_output(create_full_recipe(state))
+    return {"outputs": [state.output]}
+
+async def acreate_recipe_variant(state: AgentState) -> Dict[str, Any]:
+    """Async version of create_recipe_variant."""
+    state = await aprepare_output(await acreate_full_recipe(state))
+    return {"outputs": [state.output]}
+
+
+def match_corpus(state: AgentState) -> AgentState:
+    """
+    Answer the request from the local recipe corpus if a stored recipe fits.
+
+    Args:
+        state: Current agent state with user input
+
+    Returns:
+        Agent state with the output set on a match, unchanged otherwise
+    """
+    corpus = get_recipe_corpus()
+    if corpus is not None:
+        state.output = corpus.match(state.input)
+
     return state
 
+async def amatch_corpus(state: AgentState) -> AgentState:
+    """Async version of match_corpus, which never blocks so it runs inline."""
+    return match_corpus(state)
 
-def prepare_output(state: AgentState) -> AgentOutput:
+def prepare_output(state: AgentState) -> AgentState:
     """
     Prepare the final output from the agent state.
-    
+
     Args:
         state: Final agent state with recipe content
-        
+
     Returns:
-        Formatted agent output
+        Updated agent state with the formatted agent output
     """
-        
+
     # Ensure we have all necessary components
     if not state.recipe_content:
         state = create_full_recipe(state)
-    
+
     if not state.recipe_idea:
         state = generate_recipe_idea(state)
-    
-    # Create the output
-    output = AgentOutput(
+
+    state.output = _build_output(state)
+
+    # keep the recipe so similar requests can be answered without the model
+    corpus = get_recipe_corpus()
+    if corpus is not None:
+        corpus.add(state.input, state.output)
+
+    return state
+
+async def aprepare_output(state: AgentState) -> AgentState:
+    """Async version of prepare_output, which writes to the corpus on a worker thread."""
+    if not state.recipe_content:
+        state = await acreate_full_recipe(state)
+
+    if not state.recipe_idea:
+        state = await agenerate_recipe_idea(state)
+
+    state.output = _build_output(state)
+
+    corpus = get_recipe_corpus()
+    if corpus is not None:
+        await asyncio.to_thread(corpus.add, state.input, state.output)
+
+    return state
+
+def _build_output(state: AgentState) -> AgentOutput:
+    """Build the agent output from a state holding the recipe idea and content."""
+    return AgentOutput(
         recipe_name=state.recipe_idea.name,
         ingredients_used=state.input.ingredients,
         recipe_content=state.recipe_content,
         cooking_time=state.recipe_idea.cooking_time,
         difficulty=state.recipe_idea.difficulty,
-        missing_ingredients=state.parsed_ingredients.missing_essentials if state.parsed_ingredients else []
+        missing_ingredients=state.parsed_ingredients.missing_essentials if state.parsed_ingredients else [],
+        # a degraded run is written by the fast model, not at full quality
+        served_by="fast_model" if is_fast_model_only() else "model",
     )
-    
-    return output
\ No newline at end of file
@@ -2,9 +2,14 @@
 Schema definitions for the cooking agent.
 """
 
-from typing import Dict, List, Optional, Any
+import operator
+import os
+from typing import Annotated, Dict, List, Optional, Any
 from pydantic import BaseModel, Field
 
+# upper bound on the number of alternatives of one multi-recipe request
+MAX_ALTERNATIVES = int(os.getenv("MAX_RECIPE_ALTERNATIVES", "5"))
+
 
 class AgentInput(BaseModel):
     """Input schema for the cooking agent."""
@@ -69,13 +74,15 @@ class RecipeIdea(BaseModel):
     )
 
 
-class AgentState(BaseModel):
-    """State maintained throughout the agent's execution."""
+class RecipePlan(BaseModel):
+    """Ingredient analysis and recipe idea produced by a single model call."""
     
-    input: AgentInput
-    parsed_ingredients: Optional[ParsedIngredients] = None
-    recipe_idea: Optional[RecipeIdea] = None
-    recipe_content: Optional[str] = None
+    parsed_ingredients: ParsedIngredients = Field(
+        description="The ingredients sorted into categories"
+    )
+    recipe_idea: RecipeIdea = Field(
+        description="A recipe concept that uses the ingredients"
+    )
 
 
 class AgentOutput(BaseModel):
@@ -89,4 +96,36 @@ class AgentOutput(BaseModel):
     missing_ingredients: List[str] = Field(
         default_factory=list,
         description="Any ingredients that would be nice to have but weren't in the input"
-    )
\ No newline at end of file
+    )
+    served_by: str = Field(
+        default="model",
+        description="What produced the answer: model, cache, corpus, fast_model or template"
+    )
+
+
+class AgentBatchResult(BaseModel):
+    """Result of one input in a batch run of the cooking agent."""
+    
+    output: Optional[AgentOutput] = Field(
+        default=None,
+        description="The generated recipe, if the run succeeded"
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Why the run failed, if it did"
+    )
+
+
+class AgentState(BaseModel):
+    """State maintained throughout the agent's execution."""
+    
+    input: AgentInput
+    parsed_ingredients: Optional[ParsedIngredients] = None
+    recipe_idea: Optional[RecipeIdea] = None
+    recipe_content: Optional[str] = None
+    output: Optional[AgentOutput] = None
+    # multi-recipe mode: how many alternatives to write, the ideas behind
+    # them, and the finished recipes gathered from the parallel branches
+    recipe_count: int = 1
+    recipe_ideas: Optional[List[RecipeIdea]] = None
+    outputs: Annotated[List[AgentOutput], operator.add] = Field(default_factory=list)
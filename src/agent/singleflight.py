@@ -0,0 +1,154 @@
+"""
+Single-flight coalescing of identical concurrent agent runs.
+
+While a graph run for a key is in progress, later callers with the same key
+wait for its result instead of starting their own run, so a burst of
+identical requests costs one set of LLM calls.
+"""
+
+import asyncio
+import os
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+from .metrics import register_collector
+
+# load environment variables
+load_dotenv()
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """A run in progress, the callers waiting for it and how many of them joined it."""
+
+    def __init__(self, task: asyncio.Task, loop: asyncio.AbstractEventLoop):
+        self.task = task
+        self.loop = loop
+        self.waiters = 0
+        self.joined = 0
+
+
+class SingleFlight:
+    """
+    Shares one in-progress run between the callers of the same key.
+
+    At most `max_waiters` callers join a run besides the one that started it;
+    further callers start a run of their own, so a slow or failing run never
+    holds up an unbounded number of requests. The run is cancelled only when
+    every caller waiting for it has been cancelled.
+    """
+
+    def __init__(self, max_waiters: int = 100):
+        self.max_waiters = max_waiters
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.coalesced = 0
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run func, or wait for the run already in progress for the key.
+
+        Args:
+            key: Identifies equivalent runs
+            func: Starts the run when no equivalent one is in progress
+
+        Returns:
+            The result of the shared run
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight(loop.create_task(func()), loop)
+                self._flights[key] = flight
+                flight.task.add_done_callback(lambda _: self._finish(key, flight))
+                self.started += 1
+            elif flight.loop is loop and flight.joined < self.max_waiters:
+                flight.joined += 1
+                self.coalesced += 1
+            else:
+                # the waiter bound is reached, or the run belongs to another event loop
+                flight = None
+                self.started += 1
+
+            if flight is not None:
+                flight.waiters += 1
+
+        if flight is None:
+            return await func()
+
+        try:
+            # shield so one caller's cancellation leaves the run to the others
+            return await asyncio.shield(flight.task)
+        finally:
+            with self._lock:
+                flight.waiters -= 1
+                if flight.waiters == 0 and not flight.task.done():
+                    flight.task.cancel()
+
+    def render_metrics(self) -> List[str]:
+        """Render the coalescing counters in the Prometheus text format."""
+        return [
+            "# HELP cooking_agent_single_flight_runs_total Agent runs started by the single-flight layer.",
+            "# TYPE cooking_agent_single_flight_runs_total counter",
+            f"cooking_agent_single_flight_runs_total {self.started}",
+            "# HELP cooking_agent_single_flight_coalesced_total Requests that waited for an identical run in progress.",
+            "# TYPE cooking_agent_single_flight_coalesced_total counter",
+            f"cooking_agent_single_flight_coalesced_total {self.coalesced}",
+        ]
+
+
+def _create_single_flight() -> Optional[SingleFlight]:
+    """Build the single-flight layer from environment variables."""
+    if os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() != "true":
+        return None
+
+    return SingleFlight(max_waiters=int(os.getenv("SINGLE_FLIGHT_MAX_WAITERS", "100")))
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_loaded = False
+_single_flight_lock = threading.Lock()
+
+def _render_single_flight_metrics() -> List[str]:
+    return _single_flight.render_metrics() if _single_flight is not None else []
+
+register_collector(_render_single_flight_metrics)
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """
+    Get the process-wide single-flight layer, creating it on first use.
+
+    Returns:
+        SingleFlight, or None when coalescing is disabled
+    """
+    global _single_flight, _single_flight_loaded
+
+    if not _single_flight_loaded:
+        with _single_flight_lock:
+            if not _single_flight_loaded:
+                _single_flight = _create_single_flight()
+                _single_flight_loaded = True
+
+    return _single_flight
+
+def set_single_flight(single_flight: Optional[SingleFlight]) -> None:
+    """
+    Replace the process-wide single-flight layer.
+
+    Args:
+        single_flight: The layer to use, or None to disable coalescing
+    """
+    global _single_flight, _single_flight_loaded
+
+    with _single_flight_lock:
+        _single_flight = single_flight
+        _single_flight_loaded = True
@@ -6,12 +6,27 @@ Run this to test if your agent is working correctly.
 
 import sys
 import os
+import time
+import asyncio
 from pprint import pprint
 
+import anthropic
+import httpx
+
 # Add the project root to the path so we can import our modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agent.cooking_agent import run_agent
+from agent.benchmark_agent import compare_results, run_benchmark
+from agent.cache import get_response_cache, set_response_cache
+from agent.cooking_agent import (
+    run_agent, arun_agent, run_agent_alternatives, run_agent_batch, astream_recipe, get_agent, refresh_agent
+)
+from agent.metrics import get_metrics, instrument_node, trace_request
+from agent.schema import AgentInput
+from model.claude_client import set_client_factory
+from model.config import RateLimitConfig
+from model.fake_client import fake_client_factory, recording_client_factory
+from model.scheduler import ProviderScheduler
 
 
 def test_cooking_agent():
@@ -84,5 +99,209 @@ def test_cooking_agent():
         return False
 
 
+def test_agent_graph_is_reused():
+    """The compiled graph is shared between calls until it is refreshed."""
+    
+    agent = get_agent()
+    assert get_agent() is agent
+    
+    refreshed = refresh_agent()
+    assert refreshed is not agent
+    assert get_agent() is refreshed
+
+
+def test_arun_agent_requests_overlap():
+    """Concurrent async runs overlap instead of waiting on each other."""
+    
+    latency = 0.1
+    requests = 10
+    set_client_factory(fake_client_factory(latency))
+    
+    async def run_many():
+        # distinct queries, so that single-flight coalescing doesn't merge the runs
+        return await asyncio.gather(
+            *(arun_agent(ingredients=["chicken", "rice"], query=f"overlap test {i}") for i in range(requests))
+        )
+    
+    try:
+        start = time.perf_counter()
+        results = asyncio.run(run_many())
+        wall_time = time.perf_counter() - start
+    finally:
+        set_client_factory(None)
+    
+    assert len(results) == requests
+    assert all(result.recipe_name == "Chicken Rice Skillet" for result in results)
+    # three LLM calls per run; serial execution would take requests times longer
+    assert wall_time < 3 * latency * 3
+
+
+def test_astream_recipe_sends_idea_before_tokens():
+    """The recipe idea is streamed first, field by field, followed by the recipe tokens and output."""
+    
+    async def collect():
+        return [event async for event in astream_recipe(ingredients=["chicken", "rice"])]
+    
+    # a cached idea arrives whole, so stream it from the model
+    previous_cache = get_response_cache()
+    set_response_cache(None)
+    set_client_factory(fake_client_factory())
+    try:
+        events = asyncio.run(collect())
+    finally:
+        set_client_factory(None)
+        set_response_cache(previous_cache)
+    
+    names = [name for name, _ in events]
+    first_idea = names.index("recipe_idea")
+    assert set(names[:first_idea]) == {"recipe_idea_partial"}
+    assert names[-1] == "output"
+    assert set(names[first_idea + 1:-1]) == {"token"}
+    
+    # each partial idea adds fields until the whole idea is known
+    partials = [payload for name, payload in events if name == "recipe_idea_partial"]
+    assert partials[0].name == "Chicken Rice Skillet" and partials[0].cooking_time is None
+    assert partials[-1].model_dump() == events[first_idea][1].model_dump()
+    
+    streamed = "".join(payload for name, payload in events if name == "token")
+    assert streamed == events[-1][1].recipe_content
+
+
+def test_fused_mode_uses_one_call_before_the_recipe():
+    """The fused pipeline gets ingredients and the recipe idea from one structured call."""
+    
+    calls = []
+    
+    set_client_factory(recording_client_factory(calls))
+    try:
+        result = run_agent(ingredients=["jackfruit", "chicken"], preferences={"spice": "hot"}, mode="fused")
+    finally:
+        set_client_factory(None)
+    
+    assert len(calls) == 2
+    assert result.recipe_name == "Chicken Rice Skillet"
+    assert result.missing_ingredients == ["salt", "pepper"]
+
+
+def test_alternatives_are_written_in_parallel():
+    """Several recipes take about as long as one, with a single parse and idea call."""
+    
+    latency = 0.2
+    calls = []
+    
+    previous_cache = get_response_cache()
+    set_response_cache(None)
+    set_client_factory(recording_client_factory(calls, latency=latency))
+    try:
+        start = time.perf_counter()
+        outputs = run_agent_alternatives(ingredients=["chicken", "rice", "jackfruit"], count=3)
+        wall_time = time.perf_counter() - start
+        first_calls = len(calls)
+        duplicated = run_agent_alternatives(ingredients=["chicken", "rice"], count=5)
+    finally:
+        set_client_factory(None)
+        set_response_cache(previous_cache)
+    
+    assert [output.recipe_name for output in outputs] == ["Chicken Rice Skillet", "Chicken Fried Rice", "Chicken Rice Soup"]
+    assert all(output.recipe_content for output in outputs)
+    # parse, ideas and three recipes, but the recipes overlap
+    assert first_calls == 5
+    assert wall_time < 4 * latency
+    # the fake model only knows three ideas, so five can't be honored
+    assert len(duplicated) == 3
+
+
+def test_run_agent_batch_deduplicates_and_isolates_errors():
+    """Identical inputs run once and a failing input doesn't fail the batch."""
+    
+    prompts = []
+    
+    def failing_factory(config):
+        model = fake_client_factory()(config)
+        responder = model.responder
+        
+        def respond(messages):
+            prompts.append(messages[-1].content)
+            if "poison" in messages[-1].content:
+                raise RuntimeError("provider error")
+            return responder(messages)
+        
+        model.responder = respond
+        return model
+    
+    inputs = [
+        AgentInput(ingredients=["Chicken", "rice"], query="batch test"),
+        AgentInput(ingredients=["poison"], query="batch test"),
+        AgentInput(ingredients=["rice", "chicken"], query="batch test"),
+    ]
+    
+    set_client_factory(failing_factory)
+    try:
+        results = run_agent_batch(inputs, max_concurrency=2)
+    finally:
+        set_client_factory(None)
+    
+    assert [result.error is None for result in results] == [True, False, True]
+    assert "provider error" in results[1].error
+    assert results[0].output.ingredients_used == ["Chicken", "rice"]
+    assert results[2].output.ingredients_used == ["rice", "chicken"]
+    # the duplicate input did not trigger its own full recipe call
+    assert sum("batch test" in prompt for prompt in prompts) == 1
+
+
+def test_node_metrics_are_recorded():
+    """Each node run and LLM call shows up in the Prometheus metrics."""
+    
+    get_metrics().reset()
+    set_client_factory(fake_client_factory())
+    try:
+        run_agent(ingredients=["chicken", "rice"], query="metrics test")
+    finally:
+        set_client_factory(None)
+    
+    rendered = get_metrics().render()
+    for node in ("parse_ingredients", "generate_recipe_idea", "create_full_recipe", "prepare_output"):
+        assert f'cooking_agent_node_duration_seconds_count{{node="{node}"}} 1' in rendered
+    assert 'cooking_agent_llm_calls_total{node="create_full_recipe"} 1' in rendered
+
+
+def test_provider_retries_are_recorded_in_the_node_span(monkeypatch):
+    """Each node span carries the provider retries made while the node ran."""
+    
+    monkeypatch.setenv("TRACE_LOG_ENABLED", "true")
+    scheduler = ProviderScheduler(RateLimitConfig(
+        requests_per_minute=0, input_tokens_per_minute=0, output_tokens_per_minute=0,
+        max_retries=3, retry_base_delay=0.0, retry_max_delay=0.0,
+    ))
+    attempts = []
+    
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise anthropic.APIConnectionError(request=httpx.Request("POST", "https://api.anthropic.com/v1/messages"))
+        return "ok"
+    
+    node = instrument_node("flaky_node", lambda state: {"result": scheduler.call("flaky_node", [], flaky)})
+    with trace_request() as spans:
+        node({})
+        node({})
+    
+    assert [span["retries"] for span in spans] == [2, 0]
+    assert scheduler.node_retries == {"flaky_node": 2}
+
+
+def test_benchmark_reports_every_level_and_flags_regressions():
+    """The offline benchmark runs each concurrency level and compares against a baseline."""
+    
+    results = run_benchmark([1, 2], requests=4, latency=0.0, tokens_per_second=None)
+    
+    assert [level["concurrency"] for level in results["levels"]] == [1, 2]
+    assert all(level["p50_ms"] <= level["p99_ms"] for level in results["levels"])
+    
+    baseline = {"levels": [dict(level, p95_ms=level["p95_ms"] / 2) for level in results["levels"]]}
+    assert compare_results(results, results, threshold=0.1) == []
+    assert len(compare_results(results, baseline, threshold=0.1)) == 2
+
+
 if __name__ == "__main__":
     test_cooking_agent()
\ No newline at end of file
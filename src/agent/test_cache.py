@@ -0,0 +1,122 @@
+"""
+Tests for the response cache of the cooking agent.
+
+These run offline against a fake chat model.
+"""
+
+import sys
+import os
+import time
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.cache import MemoryCache, ResponseCache, SQLiteCache, get_response_cache, make_cache_key, set_response_cache
+from agent.cooking_agent import run_agent
+from agent.schema import AgentInput
+from model.claude_client import set_client_factory
+from model.config import ModelConfig
+from model.fake_client import FakeChatModel, default_responder, recording_client_factory
+
+
+def test_cache_key_ignores_order_case_and_duplicates():
+    """Equivalent ingredient lists map to the same cache key."""
+
+    config = ModelConfig(model_name="claude-3-5-sonnet", temperature=0.7, max_tokens=1024)
+    fields = ("ingredients", "dietary_restrictions")
+
+    first = AgentInput(ingredients=["Rice", "chicken", "rice"], dietary_restrictions=["Dairy-Free"])
+    second = AgentInput(ingredients=[" chicken", "RICE"], dietary_restrictions=["dairy-free"])
+    other = AgentInput(ingredients=["chicken", "rice", "onion"], dietary_restrictions=["dairy-free"])
+
+    assert make_cache_key("parse_ingredients", first, config, fields) == make_cache_key("parse_ingredients", second, config, fields)
+    assert make_cache_key("parse_ingredients", first, config, fields) != make_cache_key("parse_ingredients", other, config, fields)
+    # only settings that change the answer are part of the key
+    slower = config.model_copy(update={"timeout": 120, "deadline": 180})
+    assert make_cache_key("parse_ingredients", first, slower, fields) == make_cache_key("parse_ingredients", first, config, fields)
+
+
+def test_memory_cache_evicts_least_recently_used_and_expired():
+    """The memory tier is bounded in size and honours the TTL."""
+
+    cache = MemoryCache(max_size=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+
+    expiring = MemoryCache(max_size=2, ttl=0.01)
+    expiring.set("a", "1")
+    time.sleep(0.02)
+    assert expiring.get("a") is None
+
+
+def test_disk_tier_is_promoted_into_memory(tmp_path):
+    """Entries found only on disk are served and copied into memory."""
+
+    disk = SQLiteCache(str(tmp_path / "cache.db"))
+    disk.set("key", "value")
+    cache = ResponseCache(memory=MemoryCache(), disk=disk)
+
+    assert cache.get("parse_ingredients", "key") == "value"
+    assert cache.memory.get("key") == "value"
+    assert cache.stats() == {"parse_ingredients": {"hits": 1, "misses": 0}}
+
+
+def test_repeat_requests_skip_cached_llm_calls():
+    """A repeated ingredient list only calls the model for the full recipe."""
+
+    calls = []
+
+    previous_cache = get_response_cache()
+    cache = ResponseCache()
+    set_response_cache(cache)
+    set_client_factory(recording_client_factory(calls))
+
+    try:
+        # ingredients the local categorizer doesn't know, so parsing uses the model
+        run_agent(ingredients=["Durian", "Natto"])
+        assert len(calls) == 3
+
+        run_agent(ingredients=["natto", "durian"])
+        assert len(calls) == 4
+    finally:
+        set_client_factory(None)
+        set_response_cache(previous_cache)
+
+    assert cache.stats() == {
+        "parse_ingredients": {"hits": 1, "misses": 1},
+        "generate_recipe_idea": {"hits": 1, "misses": 1},
+    }
+
+
+def test_failed_structured_output_is_not_cached():
+    """A structured call that fails to parse reaches the model again on the next request."""
+
+    plan_calls = []
+
+    def responder(messages):
+        content = default_responder(messages)
+        if "recipe plan" in str(messages[0].content):
+            plan_calls.append(1)
+            # the first plan is missing every required field
+            return '{"unexpected": true}' if len(plan_calls) == 1 else content
+        return content
+
+    previous_cache = get_response_cache()
+    set_response_cache(ResponseCache())
+    set_client_factory(lambda config: FakeChatModel(responder=responder))
+
+    try:
+        first = run_agent(ingredients=["Durian", "Natto"], mode="fused")
+        second = run_agent(ingredients=["Durian", "Natto"], mode="fused")
+    finally:
+        set_client_factory(None)
+        set_response_cache(previous_cache)
+
+    assert len(plan_calls) == 2
+    assert first.recipe_name == "Custom Recipe"
+    assert second.recipe_name == "Chicken Rice Skillet"
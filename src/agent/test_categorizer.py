@@ -0,0 +1,109 @@
+"""
+Tests for the local ingredient categorizer.
+
+These run offline against a fake chat model.
+"""
+
+import sys
+import os
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.categorizer import get_categorizer
+from agent.nodes import parse_ingredients
+from agent.schema import AgentInput, AgentState
+from model.claude_client import set_client_factory
+from model.fake_client import FakeChatModel, recording_client_factory
+from ui.utils import INGREDIENT_COMBOS
+
+
+def test_preset_combos_are_categorized_locally():
+    """Every ingredient in the UI presets is known to the local index."""
+
+    categorizer = get_categorizer()
+    for combo in INGREDIENT_COMBOS:
+        _, unknown = categorizer.categorize(combo["ingredients"])
+        assert unknown == [], combo["name"]
+
+
+def test_lookup_handles_plurals_synonyms_phrases_and_typos():
+    """Common variations of ingredient names resolve to the right category."""
+
+    categorizer = get_categorizer()
+
+    assert categorizer.lookup("Tomatoes") == "vegetables"
+    assert categorizer.lookup("garbanzo beans") == "proteins"
+    assert categorizer.lookup("boneless skinless chicken thighs") == "proteins"
+    assert categorizer.lookup("red bell peppers") == "vegetables"
+    assert categorizer.lookup("brocolli") == "vegetables"
+    assert categorizer.lookup("xanthan gum") is None
+
+
+def test_coloured_peppers_and_compound_seasonings_keep_their_category():
+    """Colours are part of the name, so bell peppers are vegetables and only real seasonings cover the staples."""
+
+    categorizer = get_categorizer()
+
+    for name in ("red pepper", "Green Peppers", "yellow bell pepper", "fresh red chilies"):
+        assert categorizer.lookup(name) == "vegetables", name
+    for name in ("sea salt", "Kosher Salt", "white pepper", "red pepper flakes"):
+        assert categorizer.lookup(name) == "seasonings", name
+    assert categorizer.lookup("red wine") is None
+
+    assert categorizer.missing_essentials(["red pepper", "green pepper", "olive oil"]) == ["salt", "pepper"]
+    assert categorizer.missing_essentials(["sea salt", "white pepper"]) == ["oil"]
+
+
+def test_partial_phrase_matches_are_left_to_the_model():
+    """Names that only contain a known ingredient are not categorized as that ingredient."""
+
+    categorizer = get_categorizer()
+
+    for name in ("pasta sauce", "coconut milk", "chicken stock", "Chicken Stock Cubes", "peanut butter"):
+        assert categorizer.lookup(name) is None, name
+    assert categorizer.categorize(["Rice", "coconut milk"]) == (
+        {"proteins": [], "vegetables": [], "grains": ["Rice"], "seasonings": []},
+        ["coconut milk"],
+    )
+
+
+def test_parse_ingredients_only_sends_unknown_items_to_the_model():
+    """The model is only asked about ingredients the local index doesn't know."""
+
+    calls = []
+
+    set_client_factory(recording_client_factory(calls))
+    try:
+        state = AgentState(input=AgentInput(ingredients=["Tomato", "Rice", "Jackfruit Seeds"]))
+        state = parse_ingredients(state)
+
+        assert len(calls) == 1
+        assert "Jackfruit" in calls[0][-1].content
+        assert "Tomato" not in calls[0][-1].content
+
+        calls.clear()
+        state = AgentState(input=AgentInput(ingredients=["Tomato", "Rice", "Olive Oil"]))
+        state = parse_ingredients(state)
+        assert calls == []
+    finally:
+        set_client_factory(None)
+
+    assert state.parsed_ingredients.vegetables == ["Tomato"]
+    assert state.parsed_ingredients.grains == ["Rice"]
+    assert state.parsed_ingredients.seasonings == ["Olive Oil"]
+    assert state.parsed_ingredients.missing_essentials == ["salt", "pepper"]
+
+
+def test_model_missing_essentials_respect_the_known_ingredients():
+    """Staples among the locally categorized ingredients are not reported missing by the model."""
+
+    set_client_factory(lambda config: FakeChatModel())
+    try:
+        state = AgentState(input=AgentInput(ingredients=["Olive Oil", "Salt", "Jackfruit"]))
+        state = parse_ingredients(state)
+    finally:
+        set_client_factory(None)
+
+    # the fake model reports salt and pepper missing for the jackfruit alone
+    assert state.parsed_ingredients.missing_essentials == ["pepper"]
@@ -0,0 +1,131 @@
+"""
+Tests for the local recipe corpus.
+
+These run offline against a fake chat model.
+"""
+
+import sys
+import os
+import asyncio
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.corpus import RecipeCorpus, get_recipe_corpus, set_recipe_corpus
+from agent.cooking_agent import arun_agent, run_agent
+from agent.schema import AgentInput, AgentOutput
+from model.claude_client import set_client_factory
+from model.config import fast_model_only
+from model.fake_client import recording_client_factory
+
+
+def _output(name: str) -> AgentOutput:
+    return AgentOutput(
+        recipe_name=name,
+        ingredients_used=[],
+        recipe_content=f"How to make {name}",
+        cooking_time="20 minutes",
+        difficulty="easy",
+    )
+
+
+def test_search_ranks_by_coverage_and_filters_restrictions():
+    """Recipes are ranked by how much of them the user has, within their restrictions."""
+
+    corpus = RecipeCorpus()
+    corpus.add(AgentInput(ingredients=["chicken", "rice", "onion"]), _output("Chicken Rice"))
+    corpus.add(AgentInput(ingredients=["chicken", "rice", "onion", "saffron"]), _output("Paella"))
+    corpus.add(AgentInput(ingredients=["tofu", "rice"], dietary_restrictions=["Vegan"]), _output("Tofu Rice"))
+    # a duplicate input is not stored twice
+    corpus.add(AgentInput(ingredients=["Rice", "Chicken", "onion"]), _output("Other"))
+    # nor is a recipe written for a free-text query
+    corpus.add(AgentInput(ingredients=["beef", "rice"], query="make it spicy"), _output("Spicy Beef Rice"))
+    assert len(corpus) == 3
+
+    results = corpus.search(["Chicken", "rice", "onions", "salt"])
+    assert [(recipe_id, coverage, missing) for recipe_id, coverage, missing in results] == [(0, 1.0, 0), (1, 0.75, 1), (2, 0.5, 1)]
+
+    assert [recipe_id for recipe_id, _, _ in corpus.search(["tofu", "rice"], ["vegan"])] == [2]
+    assert corpus.search(["tofu", "rice"], ["halal"]) == []
+
+
+def test_match_respects_threshold_query_and_preferences():
+    """Only well covered recipes match, and never for free-text queries or other preferences."""
+
+    corpus = RecipeCorpus(threshold=0.75)
+    corpus.add(
+        AgentInput(ingredients=["chicken", "rice", "onion", "saffron"], preferences={"cuisine": "Spanish"}),
+        _output("Paella"),
+    )
+
+    match = corpus.match(AgentInput(ingredients=["chicken", "rice", "onion"]))
+    assert match.recipe_name == "Paella"
+    assert match.ingredients_used == ["chicken", "rice", "onion"]
+    assert match.missing_ingredients == ["saffron"]
+
+    assert corpus.match(AgentInput(ingredients=["chicken", "rice"])) is None
+    assert corpus.match(AgentInput(ingredients=["chicken", "rice", "onion"], query="make it spicy")) is None
+    assert corpus.match(AgentInput(ingredients=["chicken", "rice", "onion"], preferences={"cuisine": "thai"})) is None
+    assert corpus.match(AgentInput(ingredients=["chicken", "rice", "onion"], preferences={"cuisine": "spanish"}))
+    assert (corpus.hits, corpus.misses) == (2, 3)
+
+
+def test_corpus_persists_to_sqlite(tmp_path):
+    """Recipes stored with a path are loaded again by a new corpus."""
+
+    path = str(tmp_path / "corpus.db")
+    RecipeCorpus(path).add(AgentInput(ingredients=["tofu", "rice"], dietary_restrictions=["vegan"]), _output("Tofu Rice"))
+
+    corpus = RecipeCorpus(path)
+    assert len(corpus) == 1
+    assert corpus.match(AgentInput(ingredients=["tofu", "rice"], dietary_restrictions=["vegan"])).recipe_name == "Tofu Rice"
+
+
+def test_agent_answers_repeat_requests_from_the_corpus():
+    """A generated recipe is stored and answers a later request without model calls."""
+
+    calls = []
+
+    previous = get_recipe_corpus()
+    set_recipe_corpus(RecipeCorpus())
+    set_client_factory(recording_client_factory(calls))
+    try:
+        first = run_agent(ingredients=["chicken", "rice", "jackfruit"])
+        generated_calls = len(calls)
+        second = run_agent(ingredients=["Jackfruit", "chicken", "rice", "lime"])
+    finally:
+        set_client_factory(None)
+        set_recipe_corpus(previous)
+
+    assert generated_calls > 0
+    assert len(calls) == generated_calls
+    assert second.recipe_content == first.recipe_content
+    assert second.ingredients_used == ["Jackfruit", "chicken", "rice", "lime"]
+
+
+def test_only_full_quality_async_runs_are_added_to_the_corpus():
+    """Async runs store their recipe too, but a degraded run on the fast model is not kept."""
+
+    calls = []
+
+    async def degraded_then_full():
+        with fast_model_only():
+            degraded = await arun_agent(ingredients=["tofu", "rice", "jackfruit"])
+        stored_after_degraded = len(get_recipe_corpus())
+        await arun_agent(ingredients=["tofu", "rice", "jackfruit"], dietary_restrictions=["vegan"])
+        return degraded, stored_after_degraded
+
+    previous = get_recipe_corpus()
+    set_recipe_corpus(RecipeCorpus())
+    set_client_factory(recording_client_factory(calls))
+    try:
+        degraded, stored_after_degraded = asyncio.run(degraded_then_full())
+        stored = len(get_recipe_corpus())
+    finally:
+        set_client_factory(None)
+        set_recipe_corpus(previous)
+
+    assert degraded.served_by == "fast_model"
+    assert stored_after_degraded == 0
+    assert stored == 1
+
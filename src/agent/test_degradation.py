@@ -0,0 +1,93 @@
+"""
+Tests for the degradation ladder used while the model provider is unavailable.
+
+These run offline without calling the API.
+"""
+
+import sys
+import os
+import asyncio
+
+import anthropic
+import httpx
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.cache import get_response_cache, set_response_cache
+from agent.cooking_agent import arun_agent, run_agent
+from agent.corpus import RecipeCorpus, get_recipe_corpus, set_recipe_corpus
+from agent.degradation import DegradationLadder, get_degradation_ladder, set_degradation_ladder, template_output
+from agent.schema import AgentInput
+from model.claude_client import set_client_factory
+from model.config import CircuitBreakerConfig, RateLimitConfig
+from model.fake_client import FakeChatModel, default_responder
+from model.scheduler import ProviderScheduler, get_scheduler, set_scheduler
+
+
+def _outage_factory(down_models):
+    """Client factory whose models in down_models fail with connection errors."""
+    def down(messages):
+        raise anthropic.APIConnectionError(request=httpx.Request("POST", "https://api.anthropic.com/v1/messages"))
+
+    return lambda config: FakeChatModel(
+        model_name=config.model_name,
+        responder=down if config.model_name in down_models else default_responder,
+    )
+
+
+def test_template_answer_uses_the_ingredients():
+    """The last tier writes an outline from the categorized ingredients."""
+
+    output = template_output(AgentInput(ingredients=["chicken", "rice", "broccoli"], dietary_restrictions=["halal"]))
+
+    assert output.served_by == "template"
+    assert output.recipe_name == "Simple Chicken Bowl"
+    assert "Cook the rice" in output.recipe_content
+    assert "halal" in output.recipe_content
+    assert output.missing_ingredients == ["salt", "pepper", "oil"]
+
+
+def test_provider_outages_are_answered_down_the_ladder(monkeypatch):
+    """Failed runs fall back to the fast model, then a remembered answer, the corpus and a template."""
+
+    monkeypatch.setenv("MODEL_NAME", "mock-model")
+    monkeypatch.setenv("FAST_MODEL_NAME", "mock-fast-model")
+    previous = (get_response_cache(), get_recipe_corpus(), get_degradation_ladder(), get_scheduler())
+    set_response_cache(None)
+    set_recipe_corpus(None)
+    set_degradation_ladder(DegradationLadder())
+    breakers = CircuitBreakerConfig(enabled=True, failure_threshold=1, recovery_time=60)
+    set_scheduler(ProviderScheduler(RateLimitConfig(max_retries=0), breakers))
+    try:
+        # the main model is down, every node is re-run on the fast model
+        set_client_factory(_outage_factory({"mock-model"}))
+        output = run_agent(ingredients=["chicken", "rice", "onion"])
+        assert output.served_by == "fast_model"
+        assert output.recipe_name == "Chicken Rice Skillet"
+
+        # a healthy run is remembered and answers the same request later
+        set_scheduler(ProviderScheduler(RateLimitConfig(max_retries=0), breakers))
+        set_client_factory(_outage_factory(set()))
+        assert run_agent(ingredients=["chicken", "rice", "onion"]).served_by == "model"
+        set_client_factory(_outage_factory({"mock-model", "mock-fast-model"}))
+        cached = asyncio.run(arun_agent(ingredients=["Onion", "chicken", "rice"]))
+        assert (cached.served_by, cached.ingredients_used) == ("cache", ["Onion", "chicken", "rice"])
+
+        # with both circuits open, the corpus and then the template answer at once
+        corpus = RecipeCorpus()
+        corpus.add(AgentInput(ingredients=["tofu", "rice", "scallion"]), output.model_copy(update={"served_by": "model"}))
+        set_recipe_corpus(corpus)
+        matched = run_agent(ingredients=["tofu", "rice", "peas"], query="make it quick")
+        assert matched.served_by == "corpus"
+        assert get_scheduler().circuit_open("mock-fast-model")
+        assert run_agent(ingredients=["lentils", "carrot"]).served_by == "template"
+
+        served = get_degradation_ladder().served
+        assert served == {"fast_model": 1, "cache": 1, "corpus": 1, "template": 1}
+    finally:
+        set_client_factory(None)
+        set_response_cache(previous[0])
+        set_recipe_corpus(previous[1])
+        set_degradation_ladder(previous[2])
+        set_scheduler(previous[3])
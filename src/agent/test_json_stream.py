@@ -0,0 +1,63 @@
+"""
+Tests for the incremental JSON extraction of model responses.
+
+These run offline without calling the API.
+"""
+
+import sys
+import os
+import json
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.json_stream import JSONStreamParser, extract_json_fields, validate_partial
+from agent.schema import RecipeIdea
+from model.fake_client import DEFAULT_RECIPE_IDEA, split_tokens
+
+
+def test_fields_are_emitted_as_soon_as_they_complete():
+    """Each top-level field is decoded once its value ends, whatever the chunking."""
+    
+    content = "Here you go:\n```json\n" + json.dumps({
+        "name": 'Stew, "hearty" {v2}',
+        "tags": ["one", {"nested": [1, 2]}],
+        "difficulty": "easy",
+        "serves": 4,
+    }) + "\n```\nEnjoy!"
+    
+    for size in (1, 3, len(content)):
+        parser = JSONStreamParser()
+        order = []
+        for start in range(0, len(content), size):
+            order.extend(parser.feed(content[start:start + size]))
+        assert order == ["name", "tags", "difficulty", "serves"]
+        assert parser.complete
+        assert parser.fields["name"] == 'Stew, "hearty" {v2}'
+        assert parser.fields["tags"] == ["one", {"nested": [1, 2]}]
+
+
+def test_truncated_responses_keep_complete_fields():
+    """A response cut off mid-value keeps the fields before it, and no JSON gives nothing."""
+    
+    assert extract_json_fields('{"name": "Soup", "cuisine_type": "Fre') == {"name": "Soup"}
+    assert extract_json_fields("I can't help with that.") == {}
+    # a key that isn't valid JSON leaves out its field, not the others
+    assert extract_json_fields('{"na\\qme": "Soup", "difficulty": "easy"}') == {"difficulty": "easy"}
+
+
+def test_partial_recipe_ideas_are_validated():
+    """Partial ideas carry only valid fields and grow into the full idea."""
+    
+    parser = JSONStreamParser()
+    partials = []
+    for token in split_tokens(json.dumps(DEFAULT_RECIPE_IDEA)):
+        if parser.feed(token):
+            partials.append(validate_partial(RecipeIdea, parser.fields))
+    
+    assert [partial.name for partial in partials] == ["Chicken Rice Skillet"] * 5
+    assert partials[0].difficulty is None
+    assert RecipeIdea.model_validate(partials[-1].model_dump()).model_dump() == DEFAULT_RECIPE_IDEA
+    
+    invalid = validate_partial(RecipeIdea, {"name": "Soup", "difficulty": ["not", "a", "string"]})
+    assert (invalid.name, invalid.difficulty) == ("Soup", None)
@@ -0,0 +1,77 @@
+"""
+Tests for single-flight coalescing of identical agent runs.
+
+These run offline against a fake chat model.
+"""
+
+import sys
+import os
+import asyncio
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.cache import get_response_cache, set_response_cache
+from agent.cooking_agent import arun_agent
+from agent.singleflight import SingleFlight, get_single_flight, set_single_flight
+from model.claude_client import set_client_factory
+from model.fake_client import recording_client_factory
+
+
+def test_identical_concurrent_requests_share_one_run():
+    """A burst of equivalent requests makes one set of LLM calls."""
+
+    calls = []
+
+    async def burst():
+        return await asyncio.gather(
+            *(arun_agent(ingredients=["Chicken", "rice", "jackfruit"]) for _ in range(5)),
+            arun_agent(ingredients=["jackfruit", "chicken", "RICE"]),
+            arun_agent(ingredients=["chicken", "rice", "durian"]),
+        )
+
+    previous_flight, previous_cache = get_single_flight(), get_response_cache()
+    set_single_flight(SingleFlight())
+    set_response_cache(None)
+    set_client_factory(recording_client_factory(calls, latency=0.05))
+    try:
+        results = asyncio.run(burst())
+        flight = get_single_flight()
+    finally:
+        set_client_factory(None)
+        set_response_cache(previous_cache)
+        set_single_flight(previous_flight)
+
+    # two distinct inputs, three LLM calls each
+    assert len(calls) == 6
+    assert (flight.started, flight.coalesced) == (2, 5)
+    # every caller sees its own ingredient spelling
+    assert results[5].ingredients_used == ["jackfruit", "chicken", "RICE"]
+    assert results[0].recipe_content == results[5].recipe_content
+
+
+def test_waiters_are_bounded_and_cancellation_is_isolated():
+    """Callers beyond the bound run on their own, and a cancelled caller leaves the run to the others."""
+
+    runs = []
+
+    async def slow_run():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        flight = SingleFlight(max_waiters=2)
+        tasks = [asyncio.create_task(flight.do("key", slow_run)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        tasks[1].cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+
+    # the leader plus two waiters share a run, the fourth caller starts its own
+    assert len(runs) == 2
+    assert (flight.started, flight.coalesced) == (2, 2)
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert [results[0], results[2], results[3]] == ["done", "done", "done"]
@@ -0,0 +1,236 @@
+"""
+Bulk runner for the cooking agent.
+
+Streams a JSONL file of AgentInput records through the agent and writes one
+JSONL result per input as soon as it finishes:
+
+    python run.py requests.jsonl recipes.jsonl --workers 8 --rate 2
+
+Each result record holds the input's line number and either the AgentOutput
+or the error. Results are written in completion order, so use the line
+number to match them to inputs.
+
+Progress is checkpointed next to the output file. Re-running the same command
+after an interruption skips every line that already has a result. A crash
+between writing a result and saving the checkpoint can repeat that line, so
+consumers should de-duplicate on the line number.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Iterator, Optional, Set, Tuple
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agent.cooking_agent import STANDARD_MODE, PIPELINE_MODES, arun_agent
+from agent.schema import AgentInput
+
+# save the checkpoint after this many results or seconds, whichever comes first
+CHECKPOINT_EVERY = 100
+CHECKPOINT_INTERVAL = 5.0
+
+
+class RateLimiter:
+    """Spaces out calls so no more than `rate` start per second."""
+
+    def __init__(self, rate: Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Checkpoint:
+    """
+    Tracks which input lines have a result.
+
+    Lines are stored as a watermark (every line up to it is done) plus the
+    few finished lines above it, so its size stays bounded by the number of
+    lines in flight rather than by the size of the input.
+    """
+
+    def __init__(self, path: str, watermark: int = 0, completed: Optional[Set[int]] = None):
+        self.path = path
+        self.watermark = watermark
+        self.completed = completed or set()
+
+    @classmethod
+    def load(cls, path: str) -> "Checkpoint":
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path) as f:
+            data = json.load(f)
+        return cls(path, data["watermark"], set(data["completed"]))
+
+    def is_done(self, line_number: int) -> bool:
+        return line_number <= self.watermark or line_number in self.completed
+
+    def mark_done(self, line_number: int) -> None:
+        self.completed.add(line_number)
+        while self.watermark + 1 in self.completed:
+            self.watermark += 1
+            self.completed.remove(self.watermark)
+
+    def save(self) -> None:
+        # write to a temporary file first so an interruption never leaves a torn checkpoint
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"watermark": self.watermark, "completed": sorted(self.completed)}, f)
+        os.replace(temp_path, self.path)
+
+
+def read_requests(path: str, checkpoint: Checkpoint) -> Iterator[Tuple[int, str]]:
+    """
+    Lazily yield the numbered lines of the input file that still need a result.
+
+    Args:
+        path: Path of the JSONL input file
+        checkpoint: Progress of earlier runs
+
+    Yields:
+        Tuples of 1-based line number and raw line
+    """
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip() and not checkpoint.is_done(line_number):
+                yield line_number, line
+
+
+async def _process_line(line_number: int, line: str, mode: str) -> dict:
+    """Run the agent for one input line and build its result record."""
+    try:
+        input_data = AgentInput.model_validate_json(line)
+        output = await arun_agent(
+            ingredients=input_data.ingredients,
+            dietary_restrictions=input_data.dietary_restrictions,
+            preferences=input_data.preferences,
+            query=input_data.query,
+            mode=mode
+        )
+        return {"line": line_number, "output": output.model_dump(), "error": None}
+    except Exception as e:
+        return {"line": line_number, "output": None, "error": f"{type(e).__name__}: {e}"}
+
+
+async def run_bulk(
+    input_path: str,
+    output_path: str,
+    workers: int = 4,
+    rate: Optional[float] = None,
+    mode: str = STANDARD_MODE,
+    checkpoint_path: Optional[str] = None,
+) -> dict:
+    """
+    Stream an input file through the agent with a bounded worker pool.
+
+    Args:
+        input_path: JSONL file of AgentInput records
+        output_path: JSONL file the results are appended to
+        workers: Number of inputs processed at the same time
+        rate: Maximum agent runs started per second, unlimited if None
+        mode: Pipeline mode, "standard" or "fused"
+        checkpoint_path: Where progress is saved, next to the output by default
+
+    Returns:
+        Dictionary with the number of processed and failed lines
+    """
+    checkpoint = Checkpoint.load(checkpoint_path or output_path + ".checkpoint")
+    resuming = os.path.exists(checkpoint.path)
+
+    limiter = RateLimiter(rate)
+    # a small queue keeps memory flat no matter how large the input file is
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    stats = {"processed": 0, "failed": 0}
+    last_saved = time.monotonic()
+
+    with open(output_path, "a" if resuming else "w") as output_file:
+
+        def record_result(record: dict) -> None:
+            nonlocal last_saved
+            output_file.write(json.dumps(record) + "\n")
+            checkpoint.mark_done(record["line"])
+            stats["processed"] += 1
+            if record["error"]:
+                stats["failed"] += 1
+
+            if stats["processed"] % CHECKPOINT_EVERY == 0 or time.monotonic() - last_saved > CHECKPOINT_INTERVAL:
+                # results must be on disk before the checkpoint claims them
+                output_file.flush()
+                os.fsync(output_file.fileno())
+                checkpoint.save()
+                last_saved = time.monotonic()
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                line_number, line = item
+                await limiter.wait()
+                record_result(await _process_line(line_number, line, mode))
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+
+        try:
+            for item in read_requests(input_path, checkpoint):
+                await queue.put(item)
+            for _ in tasks:
+                await queue.put(None)
+
+            await asyncio.gather(*tasks)
+        finally:
+            # keep the progress made so far, even when interrupted
+            for task in tasks:
+                task.cancel()
+            output_file.flush()
+            os.fsync(output_file.fileno())
+            checkpoint.save()
+
+    return stats
+
+
+def main(argv: Optional[list] = None) -> int:
+    """
+    Command line entry point for the bulk runner.
+
+    Args:
+        argv: Command line arguments, sys.argv[1:] if omitted
+
+    Returns:
+        int: Process exit code
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of AgentInput records")
+    parser.add_argument("output", help="JSONL file to write results to")
+    parser.add_argument("--workers", type=int, default=4, help="Inputs processed at the same time")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum agent runs started per second")
+    parser.add_argument("--mode", choices=PIPELINE_MODES, default=STANDARD_MODE, help="Pipeline mode")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <output>.checkpoint)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = asyncio.run(
+        run_bulk(args.input, args.output, args.workers, args.rate, args.mode, args.checkpoint)
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"Processed {stats['processed']} lines ({stats['failed']} failed) in {elapsed:.1f} s")
+    return 0 if stats["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
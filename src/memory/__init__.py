@@ -0,0 +1,8 @@
+"""
+Conversation memory for the cooking agent.
+"""
+
+from .checkpointer import SQLiteCheckpointer
+from .session_store import SessionStore, get_session_store, set_session_store
+
+__all__ = ["SQLiteCheckpointer", "SessionStore", "get_session_store", "set_session_store"]
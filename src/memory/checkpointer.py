@@ -0,0 +1,344 @@
+"""
+LangGraph checkpointer backed by a SQLite file in WAL mode.
+
+Each channel of the graph state is stored as its own blob, keyed by channel
+version, and a checkpoint row only records which versions it is made of.
+A graph step therefore writes just the channels its node changed instead of
+re-serializing the whole AgentState.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+    "parent_checkpoint_id TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))",
+    "CREATE TABLE IF NOT EXISTS checkpoint_blobs ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL, "
+    "type TEXT NOT NULL, blob BLOB, "
+    "PRIMARY KEY (thread_id, checkpoint_ns, channel, version))",
+    "CREATE TABLE IF NOT EXISTS checkpoint_writes ("
+    "thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL, "
+    "task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT, blob BLOB, "
+    "task_path TEXT NOT NULL DEFAULT '', "
+    "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))",
+)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Open a SQLite connection in WAL mode that can be shared between threads.
+
+    Args:
+        path: The database file
+
+    Returns:
+        sqlite3.Connection: The open connection
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # WAL keeps commits durable enough at NORMAL without an fsync per write
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """
+    Checkpoint saver storing graph state in SQLite.
+
+    The async methods run the same statements in a worker thread, so a
+    checkpoint waiting on the lock or the disk never stalls the event loop.
+
+    Only the types LangGraph deems safe are deserialized from the file by
+    default; the graph's own state types are added with with_allowlist.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        connection: Optional[sqlite3.Connection] = None,
+        lock: Optional[threading.Lock] = None,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde or JsonPlusSerializer(allowed_msgpack_modules=None))
+        self._connection = connection if connection is not None else connect(path)
+        self._lock = lock if lock is not None else threading.Lock()
+        with self._lock:
+            for statement in _SCHEMA:
+                self._connection.execute(statement)
+            self._connection.commit()
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        values = {}
+        for channel, version in versions.items():
+            row = self._connection.execute(
+                "SELECT type, blob FROM checkpoint_blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if row is not None and row[0] != "empty":
+                values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return values
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        rows = self._connection.execute(
+            "SELECT task_id, channel, type, blob FROM checkpoint_writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((type_, blob))) for task_id, channel, type_, blob in rows]
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: Tuple) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint_blob, metadata_type, metadata_blob = row
+        checkpoint = self.serde.loads_typed((type_, checkpoint_blob))
+        checkpoint["channel_values"] = self._load_blobs(thread_id, checkpoint_ns, checkpoint["channel_versions"])
+        parent_config = None
+        if parent_checkpoint_id:
+            parent_config = {"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_checkpoint_id,
+            }}
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=checkpoint,
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=parent_config,
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Get the checkpoint named in the config, or the latest one of its thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id:
+                row = self._connection.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._connection.execute(
+                    f"SELECT {columns} FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._to_tuple(thread_id, checkpoint_ns, row) if row is not None else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List checkpoints, newest first, optionally filtered by thread, metadata and position."""
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                 "metadata_type, metadata FROM checkpoints")
+        conditions, parameters = [], []
+        if config is not None:
+            conditions.append("thread_id = ?")
+            parameters.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                conditions.append("checkpoint_ns = ?")
+                parameters.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                parameters.append(get_checkpoint_id(config))
+        if before is not None and get_checkpoint_id(before):
+            conditions.append("checkpoint_id < ?")
+            parameters.append(get_checkpoint_id(before))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+            tuples = []
+            for thread_id, checkpoint_ns, *row in rows:
+                if limit is not None and len(tuples) >= limit:
+                    break
+                checkpoint_tuple = self._to_tuple(thread_id, checkpoint_ns, tuple(row))
+                if filter and any(checkpoint_tuple.metadata.get(key) != value for key, value in filter.items()):
+                    continue
+                tuples.append(checkpoint_tuple)
+        yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, writing blobs only for the channels that changed."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values = stored.pop("channel_values")
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version),
+             *(self.serde.dumps_typed(values[channel]) if channel in values else ("empty", None)))
+            for channel, version in new_versions.items()
+        ]
+        type_, checkpoint_blob = self.serde.dumps_typed(stored)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO checkpoint_blobs (thread_id, checkpoint_ns, channel, version, type, blob) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                blobs,
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                "type, checkpoint, metadata_type, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, checkpoint_blob, metadata_type, metadata_blob),
+            )
+            self._connection.commit()
+
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Save the pending writes of a task."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, index), channel,
+             *self.serde.dumps_typed(value), task_path)
+            for index, (channel, value) in enumerate(writes)
+        ]
+        # special writes (errors, interrupts) replace earlier ones, regular writes are kept once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._lock:
+            self._connection.executemany(
+                f"{verb} INTO checkpoint_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                "type, blob, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._connection.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint, blob and write of a thread."""
+        with self._lock:
+            self._delete_threads([thread_id])
+            self._connection.commit()
+
+    def _delete_threads(self, thread_ids: Sequence[str]) -> None:
+        for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+            self._connection.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in thread_ids])
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """
+        Drop old checkpoints of the given threads.
+
+        Args:
+            thread_ids: The threads to prune
+            strategy: "keep_latest" keeps the newest checkpoint of each
+                namespace and the blobs it refers to, "delete" drops everything
+        """
+        with self._lock:
+            if strategy == "delete":
+                self._delete_threads(thread_ids)
+                self._connection.commit()
+                return
+            if strategy != "keep_latest":
+                raise ValueError(f"Unknown prune strategy: {strategy}")
+
+            for thread_id in thread_ids:
+                latest = self._connection.execute(
+                    "SELECT checkpoint_ns, MAX(checkpoint_id), type, checkpoint FROM checkpoints "
+                    "WHERE thread_id = ? GROUP BY checkpoint_ns",
+                    (thread_id,),
+                ).fetchall()
+                for checkpoint_ns, checkpoint_id, type_, checkpoint_blob in latest:
+                    versions = self.serde.loads_typed((type_, checkpoint_blob))["channel_versions"]
+                    for table in ("checkpoints", "checkpoint_writes"):
+                        self._connection.execute(
+                            f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                            (thread_id, checkpoint_ns, checkpoint_id),
+                        )
+                    rows = self._connection.execute(
+                        "SELECT channel, version FROM checkpoint_blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                        (thread_id, checkpoint_ns),
+                    ).fetchall()
+                    self._connection.executemany(
+                        "DELETE FROM checkpoint_blobs "
+                        "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                        [(thread_id, checkpoint_ns, channel, version) for channel, version in rows
+                         if str(versions.get(channel)) != version],
+                    )
+            self._connection.commit()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoint_tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoint_tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
@@ -0,0 +1,273 @@
+"""
+Persistent conversation sessions for the cooking agent.
+
+A session keeps the last `max_turns` requests and answers of a user and the
+LangGraph checkpoint of its latest run, all in one SQLite file in WAL mode.
+Follow-up requests in the same session resume from that checkpoint. Sessions
+idle for longer than `ttl` seconds are evicted together with their
+checkpoints. Turns of one session run one at a time, so a turn always
+resumes from the checkpoint of the turn before it.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+from .checkpointer import SQLiteCheckpointer, connect
+
+# load environment variables
+load_dotenv()
+
+# kept out of the working tree unless SESSION_STORE_PATH says otherwise
+DEFAULT_SESSION_STORE_PATH = os.path.join(tempfile.gettempdir(), "cooking_agent_sessions.db")
+
+
+class SessionStore:
+    """Bounded per-session history plus a checkpointer sharing its database."""
+
+    def __init__(self, path: str = ":memory:", max_turns: int = 20, ttl: float = 86400, sweep_interval: float = 60):
+        self.path = path
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._connection = connect(path)
+        self.checkpointer = SQLiteCheckpointer(connection=self._connection, lock=self._lock)
+        with self._lock:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(session_id TEXT PRIMARY KEY, created_at REAL NOT NULL, last_active REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS session_turns "
+                "(session_id TEXT NOT NULL, turn INTEGER NOT NULL, input TEXT NOT NULL, output TEXT NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (session_id, turn))"
+            )
+            self._connection.commit()
+        self._last_sweep = time.time()
+        self.evicted = 0
+        # per-session turn locks with their holder counts, dropped once unused
+        self._turn_locks: Dict[str, List[Any]] = {}
+        self._aturn_locks: Dict[str, List[Any]] = {}
+        self._turn_locks_lock = threading.Lock()
+
+    def _hold_turn_lock(self, locks: Dict[str, List[Any]], session_id: str, factory: Any) -> Any:
+        with self._turn_locks_lock:
+            entry = locks.setdefault(session_id, [factory(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def _drop_turn_lock(self, locks: Dict[str, List[Any]], session_id: str) -> None:
+        with self._turn_locks_lock:
+            entry = locks[session_id]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del locks[session_id]
+
+    @contextlib.contextmanager
+    def turn(self, session_id: str) -> Iterator[None]:
+        """
+        Run a turn of a session, waiting for any other turn of it to finish.
+
+        Args:
+            session_id: The session the turn belongs to
+        """
+        lock = self._hold_turn_lock(self._turn_locks, session_id, threading.Lock)
+        try:
+            with lock:
+                yield
+        finally:
+            self._drop_turn_lock(self._turn_locks, session_id)
+
+    @contextlib.asynccontextmanager
+    async def aturn(self, session_id: str) -> AsyncIterator[None]:
+        """Async version of turn, which waits without blocking the event loop."""
+        lock = self._hold_turn_lock(self._aturn_locks, session_id, asyncio.Lock)
+        try:
+            async with lock:
+                yield
+        finally:
+            self._drop_turn_lock(self._aturn_locks, session_id)
+
+    def is_active(self, session_id: str) -> bool:
+        """
+        Tell whether a session exists and has not been idle past the TTL.
+
+        An expired session is evicted on the spot.
+
+        Args:
+            session_id: The session to check
+
+        Returns:
+            bool: True if the session can be resumed
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT last_active FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return False
+        if row[0] < time.time() - self.ttl:
+            self.delete(session_id)
+            self.evicted += 1
+            return False
+        return True
+
+    def history(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the stored turns of a session, oldest first.
+
+        Args:
+            session_id: The session to read
+
+        Returns:
+            List of {"input": ..., "output": ...} dictionaries, empty for unknown or expired sessions
+        """
+        if not self.is_active(session_id):
+            return []
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT input, output FROM session_turns WHERE session_id = ? ORDER BY turn", (session_id,)
+            ).fetchall()
+        return [{"input": json.loads(input_), "output": json.loads(output)} for input_, output in rows]
+
+    def add_turn(self, session_id: str, input_data: Dict[str, Any], output: Dict[str, Any]) -> None:
+        """
+        Record a finished request of a session.
+
+        Only the last max_turns turns and the latest checkpoint are kept.
+
+        Args:
+            session_id: The session the request belongs to
+            input_data: The agent input, as a dictionary
+            output: The agent output, as a dictionary
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO sessions (session_id, created_at, last_active) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_active = excluded.last_active",
+                (session_id, now, now),
+            )
+            row = self._connection.execute(
+                "SELECT COALESCE(MAX(turn), 0) FROM session_turns WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            turn = row[0] + 1
+            self._connection.execute(
+                "INSERT INTO session_turns (session_id, turn, input, output, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, turn, json.dumps(input_data), json.dumps(output), now),
+            )
+            self._connection.execute(
+                "DELETE FROM session_turns WHERE session_id = ? AND turn <= ?", (session_id, turn - self.max_turns)
+            )
+            self._connection.commit()
+
+        # earlier checkpoints are never resumed from, only the latest one is
+        self.checkpointer.prune([session_id])
+
+        if now - self._last_sweep >= self.sweep_interval:
+            self.evict_idle(now)
+
+    def delete(self, session_id: str) -> None:
+        """
+        Forget a session, its history and its checkpoints.
+
+        Args:
+            session_id: The session to delete
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM session_turns WHERE session_id = ?", (session_id,))
+            self._connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._connection.commit()
+        self.checkpointer.delete_thread(session_id)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """
+        Evict every session idle for longer than the TTL.
+
+        Args:
+            now: The current time, defaults to time.time()
+
+        Returns:
+            int: The number of sessions evicted
+        """
+        now = now if now is not None else time.time()
+        self._last_sweep = now
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT session_id FROM sessions WHERE last_active < ?", (now - self.ttl,)
+            ).fetchall()
+            expired = [row[0] for row in rows]
+            self._connection.executemany("DELETE FROM session_turns WHERE session_id = ?", rows)
+            self._connection.executemany("DELETE FROM sessions WHERE session_id = ?", rows)
+            self._connection.commit()
+        if expired:
+            self.checkpointer.prune(expired, strategy="delete")
+        self.evicted += len(expired)
+        return len(expired)
+
+    def render_metrics(self) -> List[str]:
+        """Render the session gauges and counters in the Prometheus text format."""
+        with self._lock:
+            active = self._connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return [
+            "# HELP cooking_agent_sessions Stored conversation sessions.",
+            "# TYPE cooking_agent_sessions gauge",
+            f"cooking_agent_sessions {active}",
+            "# HELP cooking_agent_sessions_evicted_total Sessions evicted after being idle past the TTL.",
+            "# TYPE cooking_agent_sessions_evicted_total counter",
+            f"cooking_agent_sessions_evicted_total {self.evicted}",
+        ]
+
+
+def _create_session_store() -> Optional[SessionStore]:
+    """Build the session store from environment variables."""
+    if os.getenv("SESSION_STORE_ENABLED", "true").lower() != "true":
+        return None
+
+    return SessionStore(
+        path=os.getenv("SESSION_STORE_PATH") or DEFAULT_SESSION_STORE_PATH,
+        max_turns=int(os.getenv("SESSION_MAX_TURNS", "20")),
+        ttl=float(os.getenv("SESSION_TTL", "86400")),
+    )
+
+_session_store: Optional[SessionStore] = None
+_session_store_loaded = False
+_session_store_lock = threading.Lock()
+
+def get_session_store() -> Optional[SessionStore]:
+    """
+    Get the process-wide session store, creating it on first use.
+
+    Returns:
+        SessionStore, or None when sessions are disabled
+    """
+    global _session_store, _session_store_loaded
+
+    if not _session_store_loaded:
+        with _session_store_lock:
+            if not _session_store_loaded:
+                _session_store = _create_session_store()
+                _session_store_loaded = True
+
+    return _session_store
+
+def set_session_store(store: Optional[SessionStore]) -> None:
+    """
+    Replace the process-wide session store.
+
+    Args:
+        store: The store to use, or None to disable sessions
+    """
+    global _session_store, _session_store_loaded
+
+    with _session_store_lock:
+        _session_store = store
+        _session_store_loaded = True
@@ -0,0 +1,150 @@
+"""
+Tests for the session store and the SQLite checkpointer.
+
+These run offline against a fake chat model.
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.cache import get_response_cache, set_response_cache
+from agent.cooking_agent import arun_agent, run_agent
+from memory.session_store import SessionStore, set_session_store
+from model.claude_client import set_client_factory
+from model.fake_client import recording_client_factory
+from ui.app import app
+
+
+def _with_sessions(store, calls, scenario):
+    previous_cache = get_response_cache()
+    set_session_store(store)
+    set_response_cache(None)
+    set_client_factory(recording_client_factory(calls))
+    try:
+        return scenario()
+    finally:
+        set_client_factory(None)
+        set_response_cache(previous_cache)
+        set_session_store(None)
+
+
+def test_follow_up_resumes_from_the_saved_recipe_idea():
+    """A follow-up that only adds a query re-runs just the final recipe step."""
+
+    store = SessionStore(max_turns=2)
+    calls = []
+
+    def scenario():
+        first = run_agent(ingredients=["chicken", "rice", "jackfruit"], session_id="s1")
+        first_calls = len(calls)
+        follow_up = asyncio.run(arun_agent(ingredients=[], query="make it spicier", session_id="s1"))
+        return first, first_calls, follow_up
+
+    first, first_calls, follow_up = _with_sessions(store, calls, scenario)
+
+    assert first_calls == 3
+    assert len(calls) == 4
+    assert "make it spicier" in calls[-1][-1].content
+    assert follow_up.recipe_name == first.recipe_name
+    assert follow_up.ingredients_used == ["chicken", "rice", "jackfruit"]
+
+    history = store.history("s1")
+    assert [turn["input"]["query"] for turn in history] == [None, "make it spicier"]
+    # only the checkpoint of the latest run is kept
+    rows = store._connection.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = 's1'").fetchone()
+    assert rows[0] == 1
+
+
+def test_only_steps_reading_a_changed_field_run_again():
+    """Preferences re-run the recipe idea onward, an unchanged request reuses the saved output."""
+
+    store = SessionStore()
+    calls = []
+
+    def calls_for(**request):
+        before = len(calls)
+        output = run_agent(session_id="s3", **request)
+        return len(calls) - before, output
+
+    def scenario():
+        return [
+            calls_for(ingredients=["chicken", "rice", "jackfruit"]),
+            calls_for(ingredients=[], preferences={"cuisine": "Thai"}),
+            calls_for(ingredients=["Jackfruit", "chicken", "rice"]),
+            calls_for(ingredients=["chicken", "rice", "durian"]),
+        ]
+
+    runs = _with_sessions(store, calls, scenario)
+
+    assert [count for count, _ in runs] == [3, 2, 0, 3]
+    assert "cuisine: Thai" in calls[3][-1].content
+    # a reused answer still reports the ingredients as they were sent
+    assert runs[2][1].ingredients_used == ["Jackfruit", "chicken", "rice"]
+
+
+def test_history_is_bounded_and_idle_sessions_are_evicted():
+    """Old turns are dropped past max_turns, and idle sessions lose their history and checkpoints."""
+
+    store = SessionStore(max_turns=2, ttl=60)
+    calls = []
+
+    def scenario():
+        for query in ("one", "two", "three"):
+            run_agent(ingredients=["tofu", "noodles", "jackfruit"], query=query, session_id="s2")
+
+    _with_sessions(store, calls, scenario)
+
+    assert [turn["input"]["query"] for turn in store.history("s2")] == ["two", "three"]
+    assert store.evict_idle(now=time.time() + 120) == 1
+    assert store.history("s2") == []
+    for table in ("checkpoints", "checkpoint_blobs", "session_turns"):
+        assert store._connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+
+
+def test_concurrent_turns_of_a_session_run_one_at_a_time():
+    """A turn sent while another is running waits for it, then reuses its saved output."""
+
+    store = SessionStore()
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(*(
+            arun_agent(ingredients=["chicken", "rice", "jackfruit"], session_id="s4") for _ in range(2)
+        ))
+
+    outputs = _with_sessions(store, calls, lambda: asyncio.run(scenario()))
+
+    assert len(calls) == 3
+    assert outputs[0].recipe_name == outputs[1].recipe_name
+    assert len(store.history("s4")) == 2
+    assert store._aturn_locks == {}
+
+
+def test_session_endpoints_read_history_and_refuse_streamed_sessions():
+    """Stored turns are served by the sessions endpoint, and the stream endpoint rejects a session_id."""
+
+    store = SessionStore()
+    calls = []
+
+    def scenario():
+        run_agent(ingredients=["chicken", "rice"], session_id="s5")
+        client = TestClient(app)
+        return (
+            client.get("/api/sessions/s5"),
+            client.get("/api/sessions/unknown"),
+            client.post("/api/recipe/stream", json={"ingredients": ["rice"], "session_id": "s5"}),
+        )
+
+    history, unknown, stream = _with_sessions(store, calls, scenario)
+
+    assert [turn["input"]["ingredients"] for turn in history.json()["turns"]] == [["chicken", "rice"]]
+    assert unknown.status_code == 404
+    assert stream.status_code == 400
+
@@ -1,7 +1,15 @@
 """
 Model integration module for the cooking agent assistant.
+
+The exports are loaded on first access, so importing model.config doesn't
+pull in the Anthropic SDK.
 """
 
-from .claude_client import get_claude_client, generate_response
+import importlib
+
+__all__=["get_claude_client", "generate_response", "reset_client_registry", "set_client_factory"]
 
-__all__=["get_claude_client", "generate_response"]
\ No newline at end of file
+def __getattr__(name):
+    if name in __all__:
+        return getattr(importlib.import_module(".claude_client", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
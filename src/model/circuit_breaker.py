@@ -0,0 +1,98 @@
+"""
+Circuit breaker for calls to the model provider.
+
+After `failure_threshold` provider failures in a row on one model, its
+circuit opens and calls fail right away with CircuitOpenError instead of
+waiting for timeouts and retries. After `recovery_time` seconds one probe
+call is let through (half-open); its success closes the circuit, its
+failure opens it again. A cancelled probe lets another call probe right
+away, and a probe that never reports back lets one probe after
+`recovery_time`.
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider call is given up without getting an answer."""
+
+
+class CircuitOpenError(ProviderUnavailable):
+    """Raised instead of calling a model whose circuit is open."""
+
+
+class DeadlineExceeded(ProviderUnavailable, TimeoutError):
+    """Raised when a call can't finish within its node's deadline."""
+
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+# gauge values of the states
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Tell whether a call may go to the provider now.
+
+        Returns:
+            bool: False while the circuit is open, or while the half-open probe is in flight
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.recovery_time:
+                self.state = HALF_OPEN
+                self._probe_started = None
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and (
+                self._probe_started is None or now - self._probe_started >= self.recovery_time
+            ):
+                self._probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a call got an answer."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        """Count a provider failure, opening the circuit at the threshold or on a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened += 1
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+    def record_cancelled(self) -> None:
+        """Give up the half-open probe of a call cancelled before it got an answer."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_started = None
+
+    def is_open(self) -> bool:
+        """Tell whether calls are being refused, without taking the half-open probe."""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_at < self.recovery_time
@@ -3,41 +3,209 @@ Anthropic Claude Client implementation for the cooking assistant.
 """
 
 import os 
-from typing import Dict, List, Optional, Any
+import threading
+from functools import cached_property
+from typing import Callable, Dict, List, Optional, Any, Tuple
 
+import anthropic
 from anthropic import Anthropic
 from dotenv import load_dotenv
 from langchain_anthropic import ChatAnthropic
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from .config import ModelConfig, get_model_config, get_pool_config, get_request_timeout
+from .scheduler import get_scheduler
+
 # load environment variables
 load_dotenv()
 
-def get_claude_client() -> BaseChatModel:
+# process-wide clients, keyed by model configuration
+_client_registry: Dict[Tuple, BaseChatModel] = {}
+_registry_lock = threading.Lock()
+
+# HTTP connection pools shared by every client in the process
+_http_client = None
+_async_http_client = None
+_http_client_lock = threading.Lock()
+
+def _connection_limits():
+    """Build the connection pool limits from the pool configuration."""
+    pool_config = get_pool_config()
+    # use the Limits class of the HTTP library the installed SDK was built on
+    limits_class = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+    return limits_class(
+        max_connections=pool_config.max_connections,
+        max_keepalive_connections=pool_config.max_keepalive_connections,
+        keepalive_expiry=pool_config.keepalive_expiry,
+    )
+
+def _get_http_client():
+    """Get the shared keep-alive HTTP client, creating it on first use."""
+    global _http_client
+
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = anthropic.DefaultHttpxClient(limits=_connection_limits())
+
+    return _http_client
+
+def _get_async_http_client():
+    """Get the shared keep-alive async HTTP client, creating it on first use."""
+    global _async_http_client
+
+    if _async_http_client is None:
+        with _http_client_lock:
+            if _async_http_client is None:
+                _async_http_client = anthropic.DefaultAsyncHttpxClient(limits=_connection_limits())
+
+    return _async_http_client
+
+class _PooledChatAnthropic(ChatAnthropic):
+    """ChatAnthropic that sends requests through the shared connection pools."""
+
+    @cached_property
+    def _client(self) -> anthropic.Client:
+        return anthropic.Client(**self._client_params, http_client=_get_http_client())
+
+    @cached_property
+    def _async_client(self) -> anthropic.AsyncClient:
+        return anthropic.AsyncClient(**self._client_params, http_client=_get_async_http_client())
+
+    def _create(self, payload: dict) -> Any:
+        return super()._create(_with_request_timeout(payload))
+
+    async def _acreate(self, payload: dict) -> Any:
+        return await super()._acreate(_with_request_timeout(payload))
+
+def _with_request_timeout(payload: dict) -> dict:
+    """Add the timeout of the calling node, if one is set, to a request."""
+    timeout = get_request_timeout()
+    return payload if timeout is None else {**payload, "timeout": timeout}
+
+def cached_system_prompt(text: str) -> SystemMessage:
     """
-    Initialize and return the Claude language model client.
+    Build a system message that the provider may cache between calls.
+
+    The system prompt is the static prefix of every request a node sends,
+    so it is marked with an ephemeral cache breakpoint: later calls within
+    the cache lifetime read it from the provider's prompt cache instead of
+    paying for it as fresh input tokens. Anything that varies per request
+    belongs in the human message after it. Set PROMPT_CACHE_ENABLED=false
+    to send plain system prompts.
+
+    The provider only caches prefixes of at least 1024 tokens (2048 on
+    Haiku models), and the agent's system prompts are still well below
+    that, so for now the marker is preparatory: it is ignored and costs
+    nothing until the static instructions and schema guidance grow past
+    the minimum.
+
+    Args:
+        text: The static system prompt
 
     Returns:
-        BaseChatModel: The configured Claude language model.
+        SystemMessage: The system message, with a cache_control marker if enabled
     """
+    if os.getenv("PROMPT_CACHE_ENABLED", "true").lower() != "true":
+        return SystemMessage(content=text)
+    return SystemMessage(content=[{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}])
+
+def _get_api_key() -> str:
+    """Read the Anthropic API key from the environment."""
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
         raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+    return api_key
 
-    model_name = os.getenv("MODEL_NAME", "claude-3-5-sonnet")
-    temperature = float(os.getenv("TEMPERATURE", "0.7"))
-    max_tokens = int(os.getenv("MAX_TOKENS", "1024"))
+def _build_claude_client(config: ModelConfig) -> BaseChatModel:
+    """
+    Build a new Claude language model client for the given configuration.
+
+    Args:
+        config: The model configuration
 
+    Returns:
+        BaseChatModel: The configured Claude language model.
+    """
     # initialize the Anthropic client with LangChain
-    claude = ChatAnthropic(
-        model_name=model_name,
-        anthropic_api_key=api_key,
-        temperature=temperature,
-        max_tokens_to_sample=max_tokens,
+    return _PooledChatAnthropic(
+        model_name=config.model_name,
+        anthropic_api_key=_get_api_key(),
+        temperature=config.temperature,
+        max_tokens_to_sample=config.max_tokens,
+        default_request_timeout=config.timeout,
+        # the provider scheduler retries with backoff shared by every caller
+        max_retries=0,
     )
 
-    return claude
+_client_factory: Callable[[ModelConfig], BaseChatModel] = _build_claude_client
+
+def _config_key(config: ModelConfig) -> Tuple:
+    """Turn a model configuration into a hashable registry key."""
+    return tuple(sorted(config.cache_key().items()))
+
+def get_claude_client(config: Optional[ModelConfig] = None) -> BaseChatModel:
+    """
+    Return the shared Claude language model client for a configuration.
+
+    Clients are created once per configuration and reused for the lifetime
+    of the process, so their HTTP connections stay alive between calls.
+
+    Args:
+        config: Optional model configuration, read from the environment if omitted
+
+    Returns:
+        BaseChatModel: The configured Claude language model.
+    """
+    if config is None:
+        config = get_model_config()
+
+    key = _config_key(config)
+    client = _client_registry.get(key)
+
+    if client is None:
+        with _registry_lock:
+            client = _client_registry.get(key)
+            if client is None:
+                client = _client_factory(config)
+                _client_registry[key] = client
+
+    return client
+
+def set_client_factory(factory: Optional[Callable[[ModelConfig], BaseChatModel]] = None) -> None:
+    """
+    Replace the function used to build new clients and clear the registry.
+
+    Tests and benchmarks use this to inject fake chat models. Passing None
+    restores the default Claude client factory.
+
+    Args:
+        factory: Callable that builds a chat model from a ModelConfig
+    """
+    global _client_factory
+
+    with _registry_lock:
+        _client_factory = factory or _build_claude_client
+        _client_registry.clear()
+
+def reset_client_registry() -> None:
+    """
+    Drop every cached client and close the shared connection pools.
+
+    Intended for tests and for picking up changed environment settings.
+    """
+    global _http_client, _async_http_client
+
+    with _registry_lock:
+        _client_registry.clear()
+
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+        # the async pool is bound to an event loop, so let it be garbage collected
+        _http_client = None
+        _async_http_client = None
 
 def get_direct_client() -> Anthropic:
     """
@@ -46,11 +214,7 @@ def get_direct_client() -> Anthropic:
     Returns:
         Anthropic: The Anthropic client.
     """
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-
-    return Anthropic(api_key=api_key)
+    return Anthropic(api_key=_get_api_key(), http_client=_get_http_client())
 
 def generate_response(
     ingredients: List[str], 
@@ -95,11 +259,11 @@ def generate_response(
     
     # Generate response using the LangChain interface
     messages = [
-        SystemMessage(content=system_prompt),
+        cached_system_prompt(system_prompt),
         HumanMessage(content=user_prompt)
     ]
     
-    response = claude.invoke(messages)
+    response = get_scheduler().call("generate_response", messages, lambda: claude.invoke(messages))
     return response.content
 
 def _create_system_prompt() -> str:
@@ -2,8 +2,10 @@
 Configuration settings for model integration.
 """
 
+import contextlib
+import contextvars
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
@@ -22,16 +24,260 @@ class ModelConfig(BaseModel):
     max_tokens: int = Field(
         default_factory=lambda: int(os.getenv("MAX_TOKENS", "1024"))
     )
+    timeout: float = Field(
+        default_factory=lambda: float(os.getenv("MODEL_TIMEOUT", "60"))
+    )
+    deadline: float = Field(
+        default_factory=lambda: float(os.getenv("MODEL_DEADLINE", "90"))
+    )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert config to dictionary."""
+        return self.model_dump()
+
+    def cache_key(self) -> Dict[str, Any]:
+        """
+        The settings that change what the model answers.
+
+        Used for the response cache and client registry keys. The timeout
+        and deadline only bound how long a call may take, so changing them
+        neither invalidates cached responses nor builds another client.
+        """
+        return {"model_name": self.model_name, "temperature": self.temperature, "max_tokens": self.max_tokens}
+
+# nodes that only classify the input or pick a recipe concept and answer with
+# short JSON; the routing rule sends them to the fast model
+FAST_MODEL_NODES = ("parse_ingredients", "generate_recipe_idea", "generate_recipe_ideas", "analyze_ingredients")
+
+# profile defaults of each node, on top of the MODEL_NAME/TEMPERATURE/MAX_TOKENS/
+# MODEL_TIMEOUT/MODEL_DEADLINE settings; the deadline bounds a call's retries too
+NODE_PROFILE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "parse_ingredients": {"temperature": 0.0, "max_tokens": 512, "timeout": 15, "deadline": 20},
+    "generate_recipe_idea": {"max_tokens": 512, "timeout": 20, "deadline": 25},
+    "generate_recipe_ideas": {"max_tokens": 1024, "timeout": 30, "deadline": 40},
+    "analyze_ingredients": {"temperature": 0.3, "max_tokens": 1024, "timeout": 30, "deadline": 40},
+    "create_full_recipe": {},
+}
+
+# set while a degraded request re-runs every node on the fast model
+_fast_model_only: contextvars.ContextVar[bool] = contextvars.ContextVar("fast_model_only", default=False)
+
+@contextlib.contextmanager
+def fast_model_only() -> Iterator[None]:
+    """
+    Send the calls of every node made in this context to the fast model.
+
+    Used by the degradation ladder to retry a request on the smaller model
+    when the main one is failing. The setting follows the context into
+    graph nodes and tasks started from it.
+    """
+    token = _fast_model_only.set(True)
+    try:
+        yield
+    finally:
+        _fast_model_only.reset(token)
+
+def is_fast_model_only() -> bool:
+    """Tell whether the calls made in this context go to the fast model, see fast_model_only."""
+    return _fast_model_only.get()
+
+# HTTP timeout of the provider requests made in this context
+_request_timeout: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_timeout", default=None)
+
+@contextlib.contextmanager
+def request_timeout(seconds: float) -> Iterator[None]:
+    """
+    Apply a node's timeout to the provider requests made in this context.
+
+    Nodes with the same model settings share a client, so the timeout
+    travels with the call instead of being fixed on the client.
+    """
+    token = _request_timeout.set(seconds)
+    try:
+        yield
+    finally:
+        _request_timeout.reset(token)
+
+def get_request_timeout() -> Optional[float]:
+    """
+    Get the request timeout set by request_timeout.
+
+    Returns:
+        Seconds, or None outside of request_timeout
+    """
+    return _request_timeout.get()
+
+class PoolConfig(BaseModel):
+    """Connection pool limits for the shared HTTP client."""
+    
+    max_connections: int = Field(
+        default_factory=lambda: int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+    )
+    max_keepalive_connections: int = Field(
+        default_factory=lambda: int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    )
+    keepalive_expiry: float = Field(
+        default_factory=lambda: float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+    )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert config to dictionary."""
+        return self.model_dump()
+
+class RateLimitConfig(BaseModel):
+    """Account limits and retry policy for calls to the model provider."""
+    
+    requests_per_minute: int = Field(
+        default_factory=lambda: int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+    )
+    input_tokens_per_minute: int = Field(
+        default_factory=lambda: int(os.getenv("LLM_INPUT_TOKENS_PER_MINUTE", "0"))
+    )
+    output_tokens_per_minute: int = Field(
+        default_factory=lambda: int(os.getenv("LLM_OUTPUT_TOKENS_PER_MINUTE", "0"))
+    )
+    max_retries: int = Field(
+        default_factory=lambda: int(os.getenv("LLM_MAX_RETRIES", "4"))
+    )
+    retry_base_delay: float = Field(
+        default_factory=lambda: float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+    )
+    retry_max_delay: float = Field(
+        default_factory=lambda: float(os.getenv("LLM_RETRY_MAX_DELAY", "60"))
+    )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert config to dictionary."""
+        return self.model_dump()
+
+class CircuitBreakerConfig(BaseModel):
+    """Failure threshold and recovery time of the per-model circuit breakers."""
+    
+    enabled: bool = Field(
+        default_factory=lambda: os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+    )
+    failure_threshold: int = Field(
+        default_factory=lambda: int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+    )
+    recovery_time: float = Field(
+        default_factory=lambda: float(os.getenv("CIRCUIT_BREAKER_RECOVERY", "30"))
+    )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert config to dictionary."""
+        return self.model_dump()
+
+class HedgingConfig(BaseModel):
+    """Policy for duplicating slow provider calls to cut tail latency."""
+    
+    enabled: bool = Field(
+        default_factory=lambda: os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+    )
+    nodes: List[str] = Field(
+        default_factory=lambda: [
+            node.strip()
+            for node in os.getenv("HEDGE_NODES", "parse_ingredients,generate_recipe_idea,generate_recipe_ideas").split(",")
+            if node.strip()
+        ]
+    )
+    percentile: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+    )
+    min_delay: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_MIN_DELAY", "0.2"))
+    )
+    min_samples: int = Field(
+        default_factory=lambda: int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    )
+    window: int = Field(
+        default_factory=lambda: int(os.getenv("HEDGE_WINDOW", "500"))
+    )
+    budget: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_BUDGET", "0.05"))
+    )
+    max_burst: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_MAX_BURST", "5"))
+    )
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert config to dictionary."""
         return self.model_dump()
 
-def get_model_config() -> ModelConfig:
+def get_fast_model_name() -> str:
+    """
+    Get the name of the fast model that short JSON steps are routed to.
+    
+    Returns:
+        str: The FAST_MODEL_NAME setting
+    """
+    return os.getenv("FAST_MODEL_NAME", "claude-haiku-4-5")
+
+def get_model_config(node: Optional[str] = None) -> ModelConfig:
     """
     Get the model configuration from environment variables.
     
+    With a node name, returns that node's profile: the shared settings,
+    then the node defaults in NODE_PROFILE_DEFAULTS, then the fast model
+    for FAST_MODEL_NODES unless MODEL_ROUTING_ENABLED is false, and last any
+    <NODE>_MODEL_NAME, <NODE>_TEMPERATURE, <NODE>_MAX_TOKENS, <NODE>_TIMEOUT
+    or <NODE>_DEADLINE variable (e.g. PARSE_INGREDIENTS_MODEL_NAME). Inside
+    fast_model_only, every node gets the fast model.
+    
+    Args:
+        node: Optional name of the graph node making the call
+    
     Returns:
         ModelConfig: The model configuration.
     """
-    return ModelConfig()
\ No newline at end of file
+    config = ModelConfig()
+    if node is None:
+        return config
+    
+    profile = dict(NODE_PROFILE_DEFAULTS.get(node, {}))
+    if node in FAST_MODEL_NODES and os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true":
+        profile["model_name"] = get_fast_model_name()
+    for field in ModelConfig.model_fields:
+        value = os.getenv(f"{node.upper()}_{field.upper()}")
+        if value is not None:
+            profile[field] = value
+    if _fast_model_only.get():
+        profile["model_name"] = get_fast_model_name()
+    
+    return ModelConfig(**{**config.model_dump(), **profile})
+
+def get_pool_config() -> PoolConfig:
+    """
+    Get the HTTP connection pool configuration from environment variables.
+    
+    Returns:
+        PoolConfig: The connection pool configuration.
+    """
+    return PoolConfig()
+
+def get_rate_limit_config() -> RateLimitConfig:
+    """
+    Get the provider rate limit configuration from environment variables.
+    
+    Returns:
+        RateLimitConfig: The rate limit configuration.
+    """
+    return RateLimitConfig()
+
+def get_hedging_config() -> HedgingConfig:
+    """
+    Get the request hedging configuration from environment variables.
+    
+    Returns:
+        HedgingConfig: The hedging configuration.
+    """
+    return HedgingConfig()
+
+
+def get_circuit_breaker_config() -> CircuitBreakerConfig:
+    """
+    Get the provider circuit breaker configuration from environment variables.
+    
+    Returns:
+        CircuitBreakerConfig: The circuit breaker configuration.
+    """
+    return CircuitBreakerConfig()
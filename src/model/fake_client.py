@@ -0,0 +1,274 @@
+"""
+Fake chat model for offline tests and load tests of the cooking agent.
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from .config import ModelConfig
+
+DEFAULT_PARSED_INGREDIENTS = {
+    "proteins": ["chicken"],
+    "vegetables": ["onion"],
+    "grains": ["rice"],
+    "seasonings": ["olive oil"],
+    "missing_essentials": ["salt", "pepper"],
+}
+
+DEFAULT_RECIPE_IDEA = {
+    "name": "Chicken Rice Skillet",
+    "cuisine_type": "Mediterranean",
+    "difficulty": "easy",
+    "cooking_time": "30 minutes",
+    "suitable_for_restrictions": True,
+}
+
+DEFAULT_RECIPE_CONTENT = """## Ingredients
+- 2 chicken breasts
+- 1 cup rice
+- 1 onion
+
+## Instructions
+1. Brown the chicken.
+2. Add the onion and rice, then simmer until tender.
+
+## Cooking Tips
+Rest the chicken before slicing.
+"""
+
+
+def _node_of(messages: List[BaseMessage]) -> str:
+    """Tell which agent step sent the messages from its system prompt."""
+    system_prompt = str(messages[0].content) if messages else ""
+
+    if "recipe plan" in system_prompt:
+        return "plan"
+    if "distinct recipe ideas" in system_prompt:
+        return "ideas"
+    if "ParsedIngredients" in system_prompt:
+        return "parse"
+    if "RecipeIdea" in system_prompt:
+        return "idea"
+    return "recipe"
+
+DEFAULT_SCRIPT = {
+    "plan": json.dumps({
+        "parsed_ingredients": {"main_ingredients": [], **DEFAULT_PARSED_INGREDIENTS},
+        "recipe_idea": DEFAULT_RECIPE_IDEA,
+    }),
+    "parse": "```json\n" + json.dumps(DEFAULT_PARSED_INGREDIENTS) + "\n```",
+    "idea": json.dumps(DEFAULT_RECIPE_IDEA),
+    "ideas": json.dumps({"ideas": [
+        DEFAULT_RECIPE_IDEA,
+        {**DEFAULT_RECIPE_IDEA, "name": "Chicken Fried Rice", "cuisine_type": "Chinese"},
+        {**DEFAULT_RECIPE_IDEA, "name": "Chicken Rice Soup", "cuisine_type": "American"},
+    ]}),
+    "recipe": DEFAULT_RECIPE_CONTENT,
+}
+
+def scripted_responder(script: Dict[str, str]) -> Callable[[List[BaseMessage]], str]:
+    """
+    Build a responder that answers each agent step with a fixed text.
+
+    Args:
+        script: Response per step, keyed by "parse", "idea", "ideas", "plan"
+            or "recipe"; missing steps use the default script
+
+    Returns:
+        Callable usable as FakeChatModel.responder
+    """
+    responses = {**DEFAULT_SCRIPT, **script}
+    return lambda messages: responses[_node_of(messages)]
+
+def default_responder(messages: List[BaseMessage]) -> str:
+    """
+    Pick a canned response for the node that sent the messages.
+
+    Args:
+        messages: The prompt sent by an agent node
+
+    Returns:
+        str: Scripted JSON or recipe text for that node
+    """
+    return DEFAULT_SCRIPT[_node_of(messages)]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that returns scripted responses with simulated timing.
+
+    Each call waits `latency` seconds (plus or minus up to `latency_jitter`,
+    drawn from a generator seeded with `seed`) before the first token, and
+    then produces `tokens_per_second` tokens per second if set. Responses
+    carry usage metadata with word-based token counts.
+    """
+
+    model_name: str = "fake"
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    tokens_per_second: Optional[float] = None
+    seed: Optional[int] = None
+    responder: Callable[[List[BaseMessage]], str] = default_responder
+
+    _random: random.Random = PrivateAttr(default_factory=random.Random)
+
+    def model_post_init(self, context: Any) -> None:
+        super().model_post_init(context)
+        self._random.seed(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-cooking-chat-model"
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any) -> Runnable:
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _first_token_delay(self) -> float:
+        if not self.latency_jitter:
+            return self.latency
+        return max(0.0, self.latency + self._random.uniform(-self.latency_jitter, self.latency_jitter))
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> Tuple[AIMessage, int]:
+        """Build the reply, as a call to the first bound tool if there is one."""
+        content = self.responder(messages)
+        output_tokens = len(split_tokens(content))
+        usage = _usage(messages, output_tokens)
+        if not tools:
+            return AIMessage(content=content, usage_metadata=usage), output_tokens
+
+        tool_call = {"name": tools[0]["function"]["name"], "args": json.loads(content), "id": "call_fake"}
+        return AIMessage(content="", tool_calls=[tool_call], usage_metadata=usage), output_tokens
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, output_tokens = self._respond(messages, kwargs.get("tools"))
+        delay = self._first_token_delay() + output_tokens * self._token_delay()
+        if delay:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, output_tokens = self._respond(messages, kwargs.get("tools"))
+        delay = self._first_token_delay() + output_tokens * self._token_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        delay = self._first_token_delay()
+        if delay:
+            time.sleep(delay)
+        tokens = split_tokens(self.responder(messages))
+        for index, token in enumerate(tokens):
+            if index and self.tokens_per_second:
+                time.sleep(self._token_delay())
+            usage = _usage(messages, len(tokens)) if index == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        delay = self._first_token_delay()
+        if delay:
+            await asyncio.sleep(delay)
+        tokens = split_tokens(self.responder(messages))
+        for index, token in enumerate(tokens):
+            if index and self.tokens_per_second:
+                await asyncio.sleep(self._token_delay())
+            usage = _usage(messages, len(tokens)) if index == len(tokens) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def split_tokens(text: str) -> List[str]:
+    """Split text into word-sized tokens that join back to the original."""
+    return re.findall(r"\s*\S+|\s+", text)
+
+
+def _usage(messages: List[BaseMessage], output_tokens: int) -> Dict[str, int]:
+    """Build usage metadata with word-based token counts."""
+    input_tokens = sum(len(split_tokens(str(message.content))) for message in messages)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+def fake_client_factory(latency: float = 0.0, **options: Any) -> Callable[[ModelConfig], BaseChatModel]:
+    """
+    Build a client factory for set_client_factory that returns fake models.
+
+    Args:
+        latency: Seconds each call waits before responding
+        options: Other FakeChatModel fields, such as tokens_per_second,
+            latency_jitter, seed or responder
+
+    Returns:
+        Callable that builds a FakeChatModel for any model configuration
+    """
+    return lambda config: FakeChatModel(model_name=config.model_name, latency=latency, **options)
+
+
+def recording_client_factory(
+    calls: List[List[BaseMessage]], latency: float = 0.0, **options: Any
+) -> Callable[[ModelConfig], BaseChatModel]:
+    """
+    Build a fake client factory whose models record every prompt they answer.
+
+    Args:
+        calls: List the messages of each call are appended to
+        latency: Seconds each call waits before responding
+        options: Other FakeChatModel fields, as for fake_client_factory
+
+    Returns:
+        Callable that builds a recording FakeChatModel for any model configuration
+    """
+    responder = options.pop("responder", default_responder)
+
+    def respond(messages: List[BaseMessage]) -> str:
+        calls.append(messages)
+        return responder(messages)
+
+    return fake_client_factory(latency, responder=respond, **options)
@@ -0,0 +1,237 @@
+"""
+Hedged provider calls to cut the latency tail of short model calls.
+
+A call that hasn't returned once it is slower than a tracked percentile of
+its node's recent latencies gets a duplicate; whichever finishes first
+wins and the other is cancelled. Async losers are cancelled outright, sync
+losers can't be interrupted and finish in the background with their
+result discarded. Every eligible call earns a fraction of a hedge, so
+duplicates stay within `budget` of a node's calls even when the provider
+slows down across the board.
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from .config import HedgingConfig, get_hedging_config
+
+T = TypeVar("T")
+
+
+class HedgingPolicy:
+    """Per-node latency tracking, hedge budget and hedge counters."""
+
+    def __init__(self, config: Optional[HedgingConfig] = None, max_workers: int = 32):
+        self.config = config or get_hedging_config()
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._credits: Dict[str, float] = {}
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._max_workers = max_workers
+        self.fired: Dict[str, int] = {}
+        self.won: Dict[str, int] = {}
+        self.over_budget: Dict[str, int] = {}
+
+    def delay(self, node: str) -> Optional[float]:
+        """
+        Get how long a call of a node may run before it is hedged.
+
+        Args:
+            node: The node making the call
+
+        Returns:
+            Seconds, or None when the node isn't hedged or has too few samples yet
+        """
+        if node not in self.config.nodes:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(node, ()))
+        if len(samples) < self.config.min_samples:
+            return None
+        return max(self.config.min_delay, samples[int(self.config.percentile * (len(samples) - 1))])
+
+    def _earn(self, node: str) -> None:
+        with self._lock:
+            credits = self._credits.get(node, 0.0) + self.config.budget
+            self._credits[node] = min(self.config.max_burst, credits)
+
+    def _spend(self, node: str) -> bool:
+        """Take one hedge from the node's budget, if there is one left."""
+        with self._lock:
+            if self._credits.get(node, 0.0) < 1.0:
+                self.over_budget[node] = self.over_budget.get(node, 0) + 1
+                return False
+            self._credits[node] -= 1.0
+            self.fired[node] = self.fired.get(node, 0) + 1
+            return True
+
+    def _record(self, node: str, latency: float, hedge_won: bool = False) -> None:
+        with self._lock:
+            if node in self.config.nodes:
+                self._latencies.setdefault(node, deque(maxlen=self.config.window)).append(latency)
+            if hedge_won:
+                self.won[node] = self.won.get(node, 0) + 1
+
+    @staticmethod
+    def _timed(func: Callable[[], T]) -> Tuple[T, float]:
+        """Run an attempt, timing it from when it starts rather than from when it was queued."""
+        start = time.monotonic()
+        result = func()
+        return result, time.monotonic() - start
+
+    @staticmethod
+    async def _atimed(func: Callable[[], Awaitable[T]]) -> Tuple[T, float]:
+        start = time.monotonic()
+        result = await func()
+        return result, time.monotonic() - start
+
+    def _submit(self, func: Callable[[], T]) -> concurrent.futures.Future:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self._max_workers, thread_name_prefix="hedge"
+                    )
+        # keep the caller's context, so the call is traced under its node
+        return self._executor.submit(contextvars.copy_context().run, self._timed, func)
+
+    def call(self, node: str, func: Callable[[], T]) -> T:
+        """
+        Make a call, hedging it if it runs past the node's delay.
+
+        Args:
+            node: The node making the call
+            func: Makes the call; it is run twice when hedged
+
+        Returns:
+            The result of whichever attempt succeeded first
+        """
+        delay = self.delay(node)
+        self._earn(node)
+        if delay is None:
+            result, latency = self._timed(func)
+            self._record(node, latency)
+            return result
+
+        primary = self._submit(func)
+        done, _ = concurrent.futures.wait([primary], timeout=delay)
+        if done or not self._spend(node):
+            result, latency = primary.result()
+            self._record(node, latency)
+            return result
+
+        hedge = self._submit(func)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    result, latency = future.result()
+                    self._record(node, latency, hedge_won=future is hedge)
+                    return result
+        raise primary.exception()
+
+    async def acall(self, node: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async version of call, which cancels the losing attempt.
+
+        Args:
+            node: The node making the call
+            func: Returns the awaitable making the call; it is called twice when hedged
+
+        Returns:
+            The result of whichever attempt succeeded first
+        """
+        delay = self.delay(node)
+        self._earn(node)
+        if delay is None:
+            result, latency = await self._atimed(func)
+            self._record(node, latency)
+            return result
+
+        primary = asyncio.ensure_future(self._atimed(func))
+        attempts = [primary]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done or not self._spend(node):
+                result, latency = await primary
+                self._record(node, latency)
+                return result
+
+            hedge = asyncio.ensure_future(self._atimed(func))
+            attempts.append(hedge)
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        result, latency = task.result()
+                        self._record(node, latency, hedge_won=task is hedge)
+                        return result
+            raise primary.exception()
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    def render_metrics(self) -> List[str]:
+        """Render the hedging counters and current delays in the Prometheus text format."""
+        lines = []
+        for name, help_text, values in (
+            ("cooking_agent_hedge_fired_total", "Duplicate provider calls sent for slow calls.", self.fired),
+            ("cooking_agent_hedge_won_total", "Hedged calls answered first by the duplicate.", self.won),
+            ("cooking_agent_hedge_over_budget_total", "Slow calls not hedged because the budget was spent.", self.over_budget),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for node, count in sorted(values.items()):
+                lines.append(f'{name}{{node="{node}"}} {count}')
+
+        lines.append("# HELP cooking_agent_hedge_delay_seconds Time after which a call of the node is hedged.")
+        lines.append("# TYPE cooking_agent_hedge_delay_seconds gauge")
+        for node in self.config.nodes:
+            delay = self.delay(node)
+            if delay is not None:
+                lines.append(f'cooking_agent_hedge_delay_seconds{{node="{node}"}} {delay}')
+        return lines
+
+
+_hedging: Optional[HedgingPolicy] = None
+_hedging_loaded = False
+_hedging_lock = threading.Lock()
+
+def get_hedging_policy() -> Optional[HedgingPolicy]:
+    """
+    Get the process-wide hedging policy, creating it on first use.
+
+    Returns:
+        HedgingPolicy, or None when HEDGING_ENABLED is not true
+    """
+    global _hedging, _hedging_loaded
+
+    if not _hedging_loaded:
+        with _hedging_lock:
+            if not _hedging_loaded:
+                config = get_hedging_config()
+                _hedging = HedgingPolicy(config) if config.enabled else None
+                _hedging_loaded = True
+
+    return _hedging
+
+def set_hedging_policy(policy: Optional[HedgingPolicy]) -> None:
+    """
+    Replace the process-wide hedging policy.
+
+    Args:
+        policy: The policy to use, or None to disable hedging
+    """
+    global _hedging, _hedging_loaded
+
+    with _hedging_lock:
+        _hedging = policy
+        _hedging_loaded = True
@@ -0,0 +1,253 @@
+"""
+Local mock of the Anthropic Messages API for end-to-end load tests.
+
+Answers POST /v1/messages like the real API, streaming included, with the
+cooking agent's scripted responses from the fake chat model. Each call waits
+for a log-normally distributed time to first token and then produces tokens
+at a fixed rate, so latencies have the long right tail of the real service.
+Prompt caching is emulated too: a request whose prefix up to its last
+cache_control breakpoint was seen before reports that prefix as cache read
+tokens, otherwise as cache write tokens, once it reaches the minimum
+cacheable length.
+
+Point the app at it with ANTHROPIC_BASE_URL:
+
+    python src/model/mock_anthropic.py --port 8100 --ttft-median 0.6
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8100 ANTHROPIC_API_KEY=mock uvicorn ui.app:app --app-dir src
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.fake_client import default_responder, split_tokens
+
+
+class LatencyModel:
+    """Draws response timings for the mock API."""
+
+    def __init__(
+        self,
+        ttft_median: float = 0.5,
+        ttft_sigma: float = 0.4,
+        tokens_per_second: float = 80.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        speedups: Optional[Dict[str, float]] = None,
+    ):
+        self.ttft_median = ttft_median
+        self.ttft_sigma = ttft_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        # models whose name contains a key answer that many times faster
+        self.speedups = speedups or {}
+        self._random = random.Random(seed)
+
+    def _speedup(self, model: str) -> float:
+        return next((factor for name, factor in self.speedups.items() if name in model), 1.0)
+
+    def time_to_first_token(self, model: str = "") -> float:
+        if self.ttft_median <= 0:
+            return 0.0
+        return self._random.lognormvariate(math.log(self.ttft_median), self.ttft_sigma) / self._speedup(model)
+
+    def token_delay(self, model: str = "") -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return 1.0 / (self.tokens_per_second * self._speedup(model))
+
+    def fails(self) -> bool:
+        return self._random.random() < self.error_rate
+
+
+def _text_of(content: Any) -> str:
+    """Flatten a Messages API content field to plain text."""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def _to_messages(body: Dict[str, Any]) -> List[BaseMessage]:
+    """Turn a Messages API request body into chat messages for the responder."""
+    messages: List[BaseMessage] = []
+    if body.get("system"):
+        messages.append(SystemMessage(content=_text_of(body["system"])))
+    for message in body.get("messages", []):
+        messages.append(HumanMessage(content=_text_of(message.get("content", ""))))
+    return messages
+
+
+def _content_block(body: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Answer with a tool call when the request forces one, with text otherwise."""
+    tool_choice = body.get("tool_choice") or {}
+    tools = body.get("tools") or []
+    if tools and tool_choice.get("type") in ("tool", "any"):
+        name = tool_choice.get("name") or tools[0]["name"]
+        return {"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": name, "input": json.loads(text)}
+    return {"type": "text", "text": text}
+
+
+def _cache_prefix(body: Dict[str, Any]) -> Optional[List[Any]]:
+    """Get the blocks up to the last cache breakpoint, in the order the API caches them."""
+    blocks: List[Any] = list(body.get("tools") or [])
+    for content in [body.get("system")] + [message.get("content") for message in body.get("messages", [])]:
+        if isinstance(content, str):
+            blocks.append({"type": "text", "text": content})
+        elif content:
+            blocks.extend(content)
+
+    marked = [index for index, block in enumerate(blocks) if isinstance(block, dict) and block.get("cache_control")]
+    return blocks[:marked[-1] + 1] if marked else None
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def create_mock_app(latency: Optional[LatencyModel] = None, min_cache_tokens: int = 1024) -> FastAPI:
+    """
+    Build the mock Messages API app.
+
+    Args:
+        latency: Timing model for the responses, instant responses if None
+        min_cache_tokens: Shortest prefix, in tokens, that is cached
+
+    Returns:
+        FastAPI: The mock app
+    """
+    latency = latency or LatencyModel(ttft_median=0.0, tokens_per_second=0.0)
+    app = FastAPI(title="Mock Anthropic API")
+    # cached prompt prefixes, which never expire in the mock
+    prompt_cache = set()
+
+    @app.post("/v1/messages")
+    async def create_message(request: Request):
+        body = await request.json()
+
+        if latency.fails():
+            await asyncio.sleep(latency.time_to_first_token())
+            return JSONResponse(
+                status_code=529,
+                content={"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}},
+            )
+
+        messages = _to_messages(body)
+        text = default_responder(messages)
+        tokens = split_tokens(text)
+        input_tokens = sum(len(split_tokens(str(message.content))) for message in messages)
+
+        cache_read = cache_write = 0
+        prefix = _cache_prefix(body)
+        if prefix is not None:
+            prefix_tokens = len(split_tokens(_text_of(prefix)))
+            key = json.dumps([body.get("model"), prefix], sort_keys=True)
+            if prefix_tokens >= min_cache_tokens and key in prompt_cache:
+                cache_read = prefix_tokens
+            elif prefix_tokens >= min_cache_tokens:
+                cache_write = prefix_tokens
+                prompt_cache.add(key)
+
+        block = _content_block(body, text)
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": [block],
+            "stop_reason": "tool_use" if block["type"] == "tool_use" else "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                # like the real API, input_tokens only counts the uncached part
+                "input_tokens": max(0, input_tokens - cache_read - cache_write),
+                "output_tokens": len(tokens),
+                "cache_read_input_tokens": cache_read,
+                "cache_creation_input_tokens": cache_write,
+            },
+        }
+
+        if not body.get("stream"):
+            model = message["model"]
+            await asyncio.sleep(latency.time_to_first_token(model) + len(tokens) * latency.token_delay(model))
+            return message
+
+        return StreamingResponse(_stream_message(message, tokens, latency), media_type="text/event-stream")
+
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy"}
+
+    return app
+
+
+async def _stream_message(message: Dict[str, Any], tokens: List[str], latency: LatencyModel) -> AsyncIterator[str]:
+    """Emit a message as the Messages API stream of server-sent events."""
+    block = message["content"][0]
+    start = {**message, "content": [], "stop_reason": None, "usage": {**message["usage"], "output_tokens": 0}}
+
+    await asyncio.sleep(latency.time_to_first_token(message["model"]))
+    yield _sse("message_start", {"type": "message_start", "message": start})
+
+    if block["type"] == "tool_use":
+        yield _sse("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {**block, "input": {}},
+        })
+        delta_type, field = "input_json_delta", "partial_json"
+        tokens = split_tokens(json.dumps(block["input"]))
+    else:
+        yield _sse("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+        })
+        delta_type, field = "text_delta", "text"
+
+    for index, token in enumerate(tokens):
+        if index:
+            await asyncio.sleep(latency.token_delay(message["model"]))
+        yield _sse("content_block_delta", {
+            "type": "content_block_delta", "index": 0, "delta": {"type": delta_type, field: token},
+        })
+
+    yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+    yield _sse("message_delta", {
+        "type": "message_delta",
+        "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+        "usage": {"output_tokens": message["usage"]["output_tokens"]},
+    })
+    yield _sse("message_stop", {"type": "message_stop"})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8100, help="Port to listen on")
+    parser.add_argument("--ttft-median", type=float, default=0.5, help="Median seconds to the first token")
+    parser.add_argument("--ttft-sigma", type=float, default=0.4, help="Log-normal spread of the time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Generation speed after the first token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with 529 Overloaded")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible timings")
+    parser.add_argument("--speedup", action="append", default=[], metavar="NAME=FACTOR",
+                        help="Make models whose name contains NAME answer FACTOR times faster, e.g. haiku=3")
+    parser.add_argument("--min-cache-tokens", type=int, default=1024, help="Shortest prompt prefix that is cached")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    speedups = {name: float(factor) for name, factor in (option.split("=", 1) for option in args.speedup)}
+    latency = LatencyModel(args.ttft_median, args.ttft_sigma, args.tokens_per_second, args.error_rate, args.seed, speedups)
+    uvicorn.run(create_mock_app(latency, args.min_cache_tokens), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
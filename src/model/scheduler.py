@@ -0,0 +1,446 @@
+"""
+Client-side rate limiting and retries for calls to the model provider.
+
+Every call reserves capacity from token buckets for requests per minute and
+input and output tokens per minute before it is sent. Reservations are made
+in arrival order under one lock and may drive a bucket into debt, so callers
+queue first come, first served and each one sleeps exactly until its turn.
+Token counts are estimated up front and corrected with the real usage once
+the call returns.
+
+Calls failing with a rate limit, overload or connection error are retried
+with jittered exponential backoff. A retry-after header from the provider
+pauses every caller, not only the one that got it.
+
+Each model has a circuit breaker: once its calls keep failing, further
+calls fail at once with CircuitOpenError until a probe gets through. A call
+and its retries must also finish within the node's deadline; waits and
+backoffs that would overrun it raise DeadlineExceeded instead of sleeping.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import anthropic
+from langchain_core.messages import BaseMessage
+
+from .circuit_breaker import STATE_VALUES, CircuitBreaker, CircuitOpenError, DeadlineExceeded, ProviderUnavailable
+from .config import CircuitBreakerConfig, RateLimitConfig, get_circuit_breaker_config, get_model_config, get_rate_limit_config, request_timeout
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors and overload
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# rough characters per token of English prompts, used before the real count is known
+CHARS_PER_TOKEN = 4
+
+# weight of the newest observation in the per-node output token estimate
+OUTPUT_ESTIMATE_WEIGHT = 0.2
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to one minute's allowance."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take amount from the bucket and return how long to wait until it is covered."""
+        self._refill(now)
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float, now: float) -> None:
+        """Take (or give back, if negative) amount after the real usage is known."""
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """
+    Estimate the input tokens of a prompt from its length.
+
+    Args:
+        messages: The prompt messages
+
+    Returns:
+        int: Approximate number of input tokens
+    """
+    return sum(len(message.text) // CHARS_PER_TOKEN + 4 for message in messages)
+
+
+def _usage_of(result: Any) -> Optional[Dict[str, int]]:
+    """Read the usage metadata from a model result, raw structured output included."""
+    if isinstance(result, dict):
+        result = result.get("raw")
+    return getattr(result, "usage_metadata", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read the retry-after delay, in seconds, from a provider error."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        # retry-after given as an HTTP date, fall back to our own backoff
+        return None
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Tell whether a failed provider call is worth retrying.
+
+    Args:
+        error: The exception raised by the call
+
+    Returns:
+        bool: True for rate limits, overload, server and connection errors
+    """
+    if isinstance(error, anthropic.APIConnectionError):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUSES
+
+
+def is_provider_outage(error: BaseException) -> bool:
+    """
+    Tell whether a failed call means the provider is down or too slow to answer.
+
+    Args:
+        error: The exception raised by the call or the graph run
+
+    Returns:
+        bool: True for open circuits, missed deadlines, timeouts and retryable
+        provider errors that outlasted their retries
+    """
+    return isinstance(error, (ProviderUnavailable, TimeoutError)) or (isinstance(error, Exception) and is_retryable(error))
+
+
+class ProviderScheduler:
+    """
+    Shared gate for provider calls that keeps them under the account limits.
+
+    Limits of 0 are treated as unlimited; retries apply either way.
+    """
+
+    def __init__(self, config: Optional[RateLimitConfig] = None, breaker_config: Optional[CircuitBreakerConfig] = None):
+        self.config = config or get_rate_limit_config()
+        self.breaker_config = breaker_config or get_circuit_breaker_config()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._requests = TokenBucket(self.config.requests_per_minute) if self.config.requests_per_minute else None
+        self._input_tokens = TokenBucket(self.config.input_tokens_per_minute) if self.config.input_tokens_per_minute else None
+        self._output_tokens = TokenBucket(self.config.output_tokens_per_minute) if self.config.output_tokens_per_minute else None
+        self._paused_until = 0.0
+        self._output_estimates: Dict[str, float] = {}
+        self.calls = 0
+        self.retries = 0
+        self.node_retries: Dict[str, int] = {}
+        self.wait_seconds = 0.0
+
+    def _output_estimate(self, name: str) -> float:
+        return self._output_estimates.get(name, float(get_model_config(name).max_tokens))
+
+    def _reserve(self, name: str, messages: List[BaseMessage]) -> Tuple[float, int, float]:
+        """Reserve capacity for one call, returning the wait and the reserved token counts."""
+        input_tokens = estimate_tokens(messages)
+        with self._lock:
+            now = time.monotonic()
+            output_tokens = self._output_estimate(name)
+            wait = max(0.0, self._paused_until - now)
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._input_tokens is not None:
+                wait = max(wait, self._input_tokens.reserve(input_tokens, now))
+            if self._output_tokens is not None:
+                wait = max(wait, self._output_tokens.reserve(output_tokens, now))
+            self.calls += 1
+            self.wait_seconds += wait
+        return wait, input_tokens, output_tokens
+
+    def _settle(self, name: str, result: Any, input_tokens: int, output_tokens: float) -> None:
+        """Correct the reservations with the real usage and update the output estimate."""
+        usage = _usage_of(result)
+        if not usage:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._input_tokens is not None:
+                self._input_tokens.adjust(usage.get("input_tokens", input_tokens) - input_tokens, now)
+            actual_output = usage.get("output_tokens", output_tokens)
+            if self._output_tokens is not None:
+                self._output_tokens.adjust(actual_output - output_tokens, now)
+            previous = self._output_estimates.get(name, actual_output)
+            self._output_estimates[name] = previous + OUTPUT_ESTIMATE_WEIGHT * (actual_output - previous)
+
+    def _release(self, input_tokens: int, output_tokens: float, wait: Optional[float] = None) -> None:
+        """
+        Give back the token reservations of a call the provider rejected.
+
+        Given the wait of a call that gave up before it was sent, its request
+        is given back too and it no longer counts as an admitted call.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._input_tokens is not None:
+                self._input_tokens.adjust(-input_tokens, now)
+            if self._output_tokens is not None:
+                self._output_tokens.adjust(-output_tokens, now)
+            if wait is not None:
+                if self._requests is not None:
+                    self._requests.adjust(-1, now)
+                self.calls -= 1
+                self.wait_seconds -= wait
+
+    def _abandon(self, breaker: Optional[CircuitBreaker], wait: float, input_tokens: int, output_tokens: float) -> None:
+        """Undo the reservation of a call given up before it was sent, and hand back its half-open probe."""
+        self._release(input_tokens, output_tokens, wait)
+        if breaker is not None:
+            breaker.record_cancelled()
+
+    def _backoff(self, name: str, attempt: int, error: Exception) -> float:
+        """Pick the delay before the next attempt, pausing everyone if the provider asked to."""
+        retry_after = _retry_after(error)
+        for listener in _retry_listeners:
+            listener(name)
+        with self._lock:
+            self.retries += 1
+            self.node_retries[name] = self.node_retries.get(name, 0) + 1
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                return retry_after + self._random.uniform(0, self.config.retry_base_delay)
+            # full jitter keeps retries from many callers from arriving in waves
+            ceiling = min(self.config.retry_max_delay, self.config.retry_base_delay * 2 ** attempt)
+            return self._random.uniform(0, ceiling)
+
+    def _breaker(self, model_name: str) -> Optional[CircuitBreaker]:
+        """Get the circuit breaker of a model, or None if breakers are disabled."""
+        if not self.breaker_config.enabled:
+            return None
+        with self._lock:
+            breaker = self._breakers.get(model_name)
+            if breaker is None:
+                breaker = self._breakers[model_name] = CircuitBreaker(
+                    self.breaker_config.failure_threshold, self.breaker_config.recovery_time
+                )
+        return breaker
+
+    def circuit_open(self, model_name: str) -> bool:
+        """
+        Tell whether calls to a model are currently refused by its circuit breaker.
+
+        Args:
+            model_name: The provider model name
+
+        Returns:
+            bool: True while the model's circuit is open
+        """
+        breaker = self._breakers.get(model_name)
+        return breaker is not None and breaker.is_open()
+
+    def _record(self, breaker: Optional[CircuitBreaker], error: Optional[Exception]) -> None:
+        """Report the outcome of an attempt to the model's circuit breaker."""
+        if breaker is None:
+            return
+        # a call the provider answered, even with a client error, shows it is up
+        if error is not None and (is_retryable(error) or isinstance(error, TimeoutError)):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def call(self, name: str, messages: List[BaseMessage], func: Callable[[], T]) -> T:
+        """
+        Make a provider call once there is capacity for it, retrying on transient errors.
+
+        Args:
+            name: Which step makes the call, for the output token estimate and the deadline
+            messages: The prompt, for the input token estimate
+            func: Makes the call
+
+        Returns:
+            The result of func
+
+        Raises:
+            CircuitOpenError: If the model's circuit is open
+            DeadlineExceeded: If waiting for capacity or a retry would overrun the deadline
+        """
+        model_config = get_model_config(name)
+        breaker = self._breaker(model_config.model_name)
+        deadline = time.monotonic() + model_config.deadline
+        for attempt in range(self.config.max_retries + 1):
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {model_config.model_name}")
+            wait, input_tokens, output_tokens = self._reserve(name, messages)
+            if time.monotonic() + wait > deadline:
+                self._abandon(breaker, wait, input_tokens, output_tokens)
+                raise DeadlineExceeded(f"{name} would wait {wait:.1f}s for capacity, past its deadline")
+            if wait:
+                time.sleep(wait)
+            try:
+                with request_timeout(model_config.timeout):
+                    result = func()
+            except Exception as e:
+                self._release(input_tokens, output_tokens)
+                self._record(breaker, e)
+                if attempt == self.config.max_retries or not is_retryable(e):
+                    raise
+                delay = self._backoff(name, attempt, e)
+                if time.monotonic() + delay > deadline:
+                    raise DeadlineExceeded(f"{name} gave up retrying at its deadline") from e
+                time.sleep(delay)
+                continue
+            self._record(breaker, None)
+            self._settle(name, result, input_tokens, output_tokens)
+            return result
+
+    async def acall(self, name: str, messages: List[BaseMessage], func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async version of call, which also cancels an attempt still running at the deadline.
+
+        Args:
+            name: Which step makes the call, for the output token estimate and the deadline
+            messages: The prompt, for the input token estimate
+            func: Returns the awaitable making the call
+
+        Returns:
+            The result of func
+        """
+        model_config = get_model_config(name)
+        breaker = self._breaker(model_config.model_name)
+        deadline = time.monotonic() + model_config.deadline
+        for attempt in range(self.config.max_retries + 1):
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(f"Circuit open for {model_config.model_name}")
+            wait, input_tokens, output_tokens = self._reserve(name, messages)
+            if time.monotonic() + wait > deadline:
+                self._abandon(breaker, wait, input_tokens, output_tokens)
+                raise DeadlineExceeded(f"{name} would wait {wait:.1f}s for capacity, past its deadline")
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._abandon(breaker, wait, input_tokens, output_tokens)
+                raise
+            try:
+                with request_timeout(model_config.timeout):
+                    result = await asyncio.wait_for(func(), deadline - time.monotonic())
+            except asyncio.CancelledError:
+                # the caller gave up, which says nothing about the provider
+                self._release(input_tokens, output_tokens)
+                if breaker is not None:
+                    breaker.record_cancelled()
+                raise
+            except asyncio.TimeoutError as e:
+                self._release(input_tokens, output_tokens)
+                self._record(breaker, e)
+                raise DeadlineExceeded(f"{name} did not finish by its deadline") from e
+            except Exception as e:
+                self._release(input_tokens, output_tokens)
+                self._record(breaker, e)
+                if attempt == self.config.max_retries or not is_retryable(e):
+                    raise
+                delay = self._backoff(name, attempt, e)
+                if time.monotonic() + delay > deadline:
+                    raise DeadlineExceeded(f"{name} gave up retrying at its deadline") from e
+                await asyncio.sleep(delay)
+                continue
+            self._record(breaker, None)
+            self._settle(name, result, input_tokens, output_tokens)
+            return result
+
+    def render_metrics(self) -> List[str]:
+        """Render the scheduler counters and circuit states in the Prometheus text format."""
+        with self._lock:
+            node_retries = sorted(self.node_retries.items())
+            breakers = sorted(self._breakers.items())
+        lines = [
+            "# HELP cooking_agent_provider_calls_total Provider call attempts admitted by the scheduler.",
+            "# TYPE cooking_agent_provider_calls_total counter",
+            f"cooking_agent_provider_calls_total {self.calls}",
+            "# HELP cooking_agent_provider_retries_total Provider calls retried after a transient error.",
+            "# TYPE cooking_agent_provider_retries_total counter",
+            f"cooking_agent_provider_retries_total {self.retries}",
+            "# HELP cooking_agent_provider_node_retries_total Provider calls retried after a transient error, per node.",
+            "# TYPE cooking_agent_provider_node_retries_total counter",
+            *(f'cooking_agent_provider_node_retries_total{{node="{name}"}} {count}' for name, count in node_retries),
+            "# HELP cooking_agent_provider_wait_seconds_total Time calls waited for rate limit capacity.",
+            "# TYPE cooking_agent_provider_wait_seconds_total counter",
+            f"cooking_agent_provider_wait_seconds_total {self.wait_seconds}",
+        ]
+        for name, kind, help_text, value in (
+            ("cooking_agent_circuit_state", "gauge", "Circuit state per model (0 closed, 1 half open, 2 open).",
+             lambda breaker: STATE_VALUES[breaker.state]),
+            ("cooking_agent_circuit_opened_total", "counter", "Times a model's circuit opened.",
+             lambda breaker: breaker.opened),
+            ("cooking_agent_circuit_rejected_total", "counter", "Calls refused because the model's circuit was open.",
+             lambda breaker: breaker.rejected),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for model_name, breaker in breakers:
+                lines.append(f'{name}{{model="{model_name}"}} {value(breaker)}')
+        return lines
+
+
+# called with the step name of every retried call, see register_retry_listener
+_retry_listeners: List[Callable[[str], None]] = []
+
+def register_retry_listener(listener: Callable[[str], None]) -> None:
+    """
+    Add a function called with the step name each time a call is retried.
+
+    Args:
+        listener: Callable taking the name passed to call or acall
+    """
+    if listener not in _retry_listeners:
+        _retry_listeners.append(listener)
+
+_scheduler: Optional[ProviderScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> ProviderScheduler:
+    """
+    Get the process-wide provider scheduler, creating it on first use.
+
+    Returns:
+        ProviderScheduler: The shared scheduler
+    """
+    global _scheduler
+
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = ProviderScheduler()
+
+    return _scheduler
+
+def set_scheduler(scheduler: Optional[ProviderScheduler] = None) -> None:
+    """
+    Replace the process-wide provider scheduler.
+
+    Args:
+        scheduler: The scheduler to use, or None to rebuild it from the environment on next use
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        _scheduler = scheduler
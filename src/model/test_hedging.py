@@ -0,0 +1,135 @@
+"""
+Tests for hedged provider calls.
+
+These run offline without calling the API.
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.config import HedgingConfig
+from model.hedging import HedgingPolicy
+
+
+def _policy(**options) -> HedgingPolicy:
+    values = {
+        "enabled": True,
+        "nodes": ["parse_ingredients"],
+        "percentile": 0.9,
+        "min_delay": 0.05,
+        "min_samples": 5,
+        "window": 50,
+        "budget": 0.2,
+        "max_burst": 1,
+    }
+    return HedgingPolicy(HedgingConfig(**{**values, **options}))
+
+
+def test_slow_async_calls_are_hedged_within_budget():
+    """A call slower than the node's percentile is duplicated, the first answer wins and the loser is cancelled."""
+    
+    async def scenario():
+        policy = _policy()
+        cancelled = []
+        
+        async def fast():
+            await asyncio.sleep(0.001)
+            return "fast"
+        
+        # the first attempt of each call hangs, the second is fast
+        def flaky():
+            attempts = []
+            
+            async def attempt():
+                attempts.append(None)
+                if len(attempts) == 1:
+                    try:
+                        await asyncio.sleep(0.6)
+                    except asyncio.CancelledError:
+                        cancelled.append(True)
+                        raise
+                    return "slow"
+                return await fast()
+            
+            return attempt
+        
+        assert policy.delay("parse_ingredients") is None
+        for _ in range(5):
+            await policy.acall("parse_ingredients", fast)
+        assert policy.delay("parse_ingredients") == 0.05
+        
+        start = time.perf_counter()
+        hedged = await policy.acall("parse_ingredients", flaky())
+        hedged_time = time.perf_counter() - start
+        
+        # the budget earned by one more call isn't enough for another hedge
+        start = time.perf_counter()
+        unhedged = await policy.acall("parse_ingredients", flaky())
+        unhedged_time = time.perf_counter() - start
+        
+        # other nodes are never hedged
+        assert await policy.acall("create_full_recipe", fast) == "fast"
+        return policy, cancelled, hedged, hedged_time, unhedged, unhedged_time
+    
+    policy, cancelled, hedged, hedged_time, unhedged, unhedged_time = asyncio.run(scenario())
+    
+    assert (hedged, unhedged) == ("fast", "slow")
+    assert hedged_time < 0.3 < unhedged_time
+    assert cancelled == [True]
+    assert policy.fired == {"parse_ingredients": 1}
+    assert policy.won == {"parse_ingredients": 1}
+    assert policy.over_budget == {"parse_ingredients": 1}
+    assert 'cooking_agent_hedge_won_total{node="parse_ingredients"} 1' in policy.render_metrics()
+
+
+def test_sync_calls_are_hedged_and_errors_fall_back_to_the_other_attempt():
+    """Sync calls are hedged on worker threads, and a failed attempt doesn't fail the call."""
+    
+    policy = _policy(budget=1.0, max_burst=2)
+    for _ in range(5):
+        policy.call("parse_ingredients", lambda: "fast")
+    
+    attempts = []
+    
+    def slow_then_fast():
+        attempts.append(None)
+        if len(attempts) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+    
+    start = time.perf_counter()
+    assert policy.call("parse_ingredients", slow_then_fast) == "fast"
+    assert time.perf_counter() - start < 0.4
+    
+    failures = []
+    
+    def fail_then_slow():
+        failures.append(None)
+        if len(failures) == 1:
+            time.sleep(0.1)
+            raise ConnectionError("reset")
+        time.sleep(0.2)
+        return "recovered"
+    
+    assert policy.call("parse_ingredients", fail_then_slow) == "recovered"
+    assert policy.fired == {"parse_ingredients": 2}
+    assert policy.won == {"parse_ingredients": 2}
+
+
+def test_latency_is_measured_from_when_the_attempt_starts():
+    """Time spent queued for a worker thread isn't counted as the node's latency."""
+
+    policy = HedgingPolicy(_policy().config, max_workers=1)
+    for _ in range(5):
+        policy.call("parse_ingredients", lambda: "fast")
+
+    # keep the only worker busy, so the next attempts wait in the queue
+    policy._submit(lambda: time.sleep(0.3))
+    assert policy.call("parse_ingredients", lambda: "queued") == "queued"
+    assert max(policy._latencies["parse_ingredients"]) < 0.1
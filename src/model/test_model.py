@@ -10,7 +10,9 @@ import os
 # Add the project root to the path so we can import our modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from model.claude_client import generate_response
+from model.claude_client import generate_response, get_claude_client, reset_client_registry
+from model.config import ModelConfig, get_model_config
+from model.mock_anthropic import create_mock_app
 
 def test_claude_integration():
     """Test the Claude API integration with a simple query."""
@@ -41,5 +43,133 @@ def test_claude_integration():
         print("\nMake sure your ANTHROPIC_API_KEY is correctly set in the .env file.")
         return False
 
+def test_client_registry_reuses_clients(monkeypatch):
+    """Clients are shared per model configuration until the registry is reset."""
+    
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    reset_client_registry()
+    
+    config = ModelConfig(model_name="claude-3-5-sonnet", temperature=0.7, max_tokens=1024)
+    client = get_claude_client(config)
+    
+    assert get_claude_client(config.model_copy()) is client
+    assert get_claude_client(config.model_copy(update={"temperature": 0.0})) is not client
+    assert get_claude_client(config.model_copy(update={"timeout": 5, "deadline": 10})) is client
+    
+    reset_client_registry()
+    assert get_claude_client(config) is not client
+    reset_client_registry()
+
+def test_node_timeouts_are_sent_with_each_request(monkeypatch):
+    """The timeout of the calling node is added to requests of a shared client."""
+    
+    from langchain_anthropic import ChatAnthropic
+    
+    from model.config import request_timeout
+    
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    payloads = []
+    monkeypatch.setattr(ChatAnthropic, "_create", lambda self, payload: payloads.append(payload))
+    reset_client_registry()
+    try:
+        client = get_claude_client(ModelConfig(model_name="claude-3-5-sonnet", temperature=0.7, max_tokens=1024))
+        client._create({"model": "claude-3-5-sonnet"})
+        with request_timeout(5):
+            client._create({"model": "claude-3-5-sonnet"})
+    finally:
+        reset_client_registry()
+    
+    assert "timeout" not in payloads[0]
+    assert payloads[1]["timeout"] == 5
+
+def test_node_profiles_route_json_steps_to_the_fast_model(monkeypatch):
+    """JSON steps get the fast model and their own limits, env overrides win over both."""
+    
+    monkeypatch.setenv("MODEL_NAME", "claude-sonnet-4-5")
+    monkeypatch.setenv("FAST_MODEL_NAME", "claude-haiku-4-5")
+    monkeypatch.delenv("MODEL_ROUTING_ENABLED", raising=False)
+    monkeypatch.setenv("GENERATE_RECIPE_IDEA_MAX_TOKENS", "300")
+    
+    parse = get_model_config("parse_ingredients")
+    assert (parse.model_name, parse.temperature, parse.timeout) == ("claude-haiku-4-5", 0.0, 15)
+    assert get_model_config("generate_recipe_idea").max_tokens == 300
+    assert get_model_config("create_full_recipe").model_name == "claude-sonnet-4-5"
+    
+    monkeypatch.setenv("MODEL_ROUTING_ENABLED", "false")
+    assert get_model_config("parse_ingredients").model_name == "claude-sonnet-4-5"
+
+def test_system_prompts_are_cached_by_the_provider(monkeypatch):
+    """Static system prompts carry a cache breakpoint and cache reads and writes are counted per node."""
+    
+    from fastapi.testclient import TestClient
+    
+    from agent import nodes
+    from agent.cache import get_response_cache, set_response_cache
+    from agent.cooking_agent import run_agent
+    from agent.metrics import get_metrics
+    from agent.schema import AgentInput, AgentState
+    from model import claude_client
+    
+    state = AgentState(input=AgentInput(ingredients=["jackfruit"]))
+    system = nodes._parse_ingredients_messages(state)[0]
+    assert system.content[0]["cache_control"] == {"type": "ephemeral"}
+    
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+    monkeypatch.setenv("ANTHROPIC_BASE_URL", "http://testserver")
+    monkeypatch.setenv("MODEL_NAME", "mock-model")
+    monkeypatch.setenv("FAST_MODEL_NAME", "mock-fast-model")
+    previous_cache = get_response_cache()
+    set_response_cache(None)
+    reset_client_registry()
+    # send the real client's requests to the mock API in-process; the prompts
+    # are shorter than the provider's cache minimum, so the mock caches any length
+    monkeypatch.setattr(
+        claude_client, "_http_client", TestClient(create_mock_app(min_cache_tokens=0), base_url="http://testserver")
+    )
+    metrics = get_metrics()
+    metrics.reset()
+    try:
+        run_agent(ingredients=["jackfruit", "rice"])
+        writes = dict(metrics.cache_write_tokens)
+        run_agent(ingredients=["durian", "rice"])
+    finally:
+        reset_client_registry()
+        set_response_cache(previous_cache)
+    
+    for node in ("parse_ingredients", "generate_recipe_idea", "create_full_recipe"):
+        # the first run writes each node's system prompt, the second reads it
+        assert writes[node] > 0
+        assert metrics.cache_write_tokens[node] == writes[node]
+        assert metrics.cache_read_tokens[node] == writes[node]
+        assert metrics.input_tokens[node] > metrics.cache_read_tokens[node] + metrics.cache_write_tokens[node]
+    assert 'cooking_agent_llm_cache_read_tokens_total{node="create_full_recipe"}' in metrics.render()
+    metrics.reset()
+
+def test_mock_anthropic_speaks_the_messages_api():
+    """The mock server answers plain, tool and streaming calls in the Messages API format."""
+    
+    from fastapi.testclient import TestClient
+    
+    client = TestClient(create_mock_app())
+    request = {"model": "mock", "max_tokens": 100, "messages": [{"role": "user", "content": "Chicken and rice"}]}
+    
+    message = client.post("/v1/messages", json=request).json()
+    assert message["content"][0]["type"] == "text"
+    assert message["usage"]["output_tokens"] > 0
+    
+    tools = [{"name": "RecipeIdea", "input_schema": {"type": "object"}}]
+    message = client.post(
+        "/v1/messages",
+        json={**request, "system": "Reply as RecipeIdea", "tools": tools, "tool_choice": {"type": "tool", "name": "RecipeIdea"}},
+    ).json()
+    assert message["stop_reason"] == "tool_use"
+    assert message["content"][0]["input"]["name"]
+    
+    response = client.post("/v1/messages", json={**request, "stream": True})
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events[:2] == ["message_start", "content_block_start"]
+    assert events[-3:] == ["content_block_stop", "message_delta", "message_stop"]
+    assert set(events[2:-3]) == {"content_block_delta"}
+
 if __name__ == "__main__":
     test_claude_integration()
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""
+Tests for the provider rate limiter and retry scheduler.
+
+These run offline without calling the API.
+"""
+
+import sys
+import os
+import asyncio
+import time
+
+import anthropic
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.circuit_breaker import CircuitOpenError, DeadlineExceeded
+from model.config import CircuitBreakerConfig, RateLimitConfig
+from model.scheduler import ProviderScheduler, TokenBucket, is_provider_outage
+
+
+def _config(**limits) -> RateLimitConfig:
+    values = {
+        "requests_per_minute": 0,
+        "input_tokens_per_minute": 0,
+        "output_tokens_per_minute": 0,
+        "max_retries": 3,
+        "retry_base_delay": 0.01,
+        "retry_max_delay": 0.1,
+    }
+    return RateLimitConfig(**{**values, **limits})
+
+
+def _rate_limit_error(retry_after_ms: str) -> anthropic.RateLimitError:
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(429, headers={"retry-after-ms": retry_after_ms}, request=request)
+    return anthropic.RateLimitError("rate limited", response=response, body=None)
+
+
+def _async_value(value):
+    async def call():
+        return value
+    return call
+
+
+def test_token_bucket_queues_reservations_in_order():
+    """Once the burst allowance is used up, each reservation waits behind the previous one."""
+
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+
+    assert bucket.reserve(60, now) == 0
+    assert abs(bucket.reserve(1, now) - 1.0) < 1e-6
+    assert abs(bucket.reserve(1, now) - 2.0) < 1e-6
+    # an unused reservation given back shortens the wait of later callers
+    bucket.adjust(-1, now)
+    assert abs(bucket.reserve(1, now) - 2.0) < 1e-6
+
+
+def test_requests_per_minute_limit_paces_calls():
+    """Calls beyond the per-minute allowance are spread out at the refill rate."""
+
+    scheduler = ProviderScheduler(_config(requests_per_minute=600))
+    # use up the burst allowance so the next calls are paced at 10 per second
+    scheduler._requests.tokens = 0
+
+    async def run_three():
+        return await asyncio.gather(*(scheduler.acall("node", [], _async_value("ok")) for _ in range(3)))
+
+    start = time.perf_counter()
+    assert asyncio.run(run_three()) == ["ok", "ok", "ok"]
+    assert time.perf_counter() - start >= 0.29
+
+
+def test_rate_limited_calls_are_retried_after_the_requested_delay():
+    """429s are retried after retry-after, other errors are raised right away."""
+
+    scheduler = ProviderScheduler(_config())
+    attempts = []
+
+    def flaky():
+        attempts.append(time.perf_counter())
+        if len(attempts) < 3:
+            raise _rate_limit_error("50")
+        return "ok"
+
+    assert scheduler.call("node", [], flaky) == "ok"
+    assert scheduler.retries == 2
+    assert scheduler.node_retries == {"node": 2}
+    assert 'cooking_agent_provider_node_retries_total{node="node"} 2' in scheduler.render_metrics()
+    assert attempts[1] - attempts[0] >= 0.05
+
+    def broken():
+        attempts.append(time.perf_counter())
+        raise ValueError("bad prompt")
+
+    attempts.clear()
+    try:
+        scheduler.call("node", [], broken)
+        assert False, "expected the error to be raised"
+    except ValueError:
+        pass
+    assert len(attempts) == 1
+
+
+def test_reservations_are_corrected_with_real_usage():
+    """The output token estimate follows the usage the provider reports."""
+
+    scheduler = ProviderScheduler(_config(input_tokens_per_minute=10000, output_tokens_per_minute=10000))
+    message = AIMessage(content="done", usage_metadata={"input_tokens": 20, "output_tokens": 100, "total_tokens": 120})
+
+    scheduler.call("parse_ingredients", [HumanMessage(content="chicken, rice")], lambda: message)
+
+    assert scheduler._output_estimates["parse_ingredients"] == 100
+    # only the real usage is left taken from the buckets
+    assert 9890 < scheduler._output_tokens.tokens < 9910
+    assert 9970 < scheduler._input_tokens.tokens < 9990
+
+
+def test_circuit_opens_after_repeated_failures_and_recovers():
+    """Calls fail fast once a model keeps failing, until a probe call gets through."""
+
+    breaker_config = CircuitBreakerConfig(enabled=True, failure_threshold=2, recovery_time=0.05)
+    scheduler = ProviderScheduler(_config(max_retries=0), breaker_config)
+    attempts = []
+
+    def down():
+        attempts.append(time.perf_counter())
+        raise _rate_limit_error("0")
+
+    for _ in range(2):
+        try:
+            scheduler.call("node", [], down)
+            assert False, "expected the error to be raised"
+        except anthropic.RateLimitError:
+            pass
+
+    try:
+        scheduler.call("node", [], down)
+        assert False, "expected the circuit to be open"
+    except CircuitOpenError as e:
+        assert is_provider_outage(e)
+    assert len(attempts) == 2
+    assert 'cooking_agent_circuit_rejected_total{model=' in "\n".join(scheduler.render_metrics())
+
+    time.sleep(0.06)
+    assert scheduler.call("node", [], lambda: "ok") == "ok"
+    assert scheduler.call("node", [], lambda: "ok") == "ok"
+
+
+def test_calls_give_up_at_the_node_deadline():
+    """Slow attempts and retries that would overrun the deadline raise DeadlineExceeded."""
+
+    os.environ["SLOW_NODE_DEADLINE"] = "0.1"
+    try:
+        scheduler = ProviderScheduler(_config(), CircuitBreakerConfig(enabled=False))
+
+        async def hang():
+            await asyncio.sleep(1)
+
+        start = time.perf_counter()
+        try:
+            asyncio.run(scheduler.acall("slow_node", [], hang))
+            assert False, "expected the deadline to be exceeded"
+        except DeadlineExceeded:
+            pass
+        assert time.perf_counter() - start < 0.5
+
+        def rate_limited():
+            raise _rate_limit_error("500")
+
+        start = time.perf_counter()
+        try:
+            scheduler.call("slow_node", [], rate_limited)
+            assert False, "expected the deadline to be exceeded"
+        except DeadlineExceeded:
+            pass
+        assert time.perf_counter() - start < 0.2
+    finally:
+        del os.environ["SLOW_NODE_DEADLINE"]
+
+
+def test_cancelled_calls_give_back_their_reservation_and_probe():
+    """A cancelled async call returns its tokens and lets the next call probe an open circuit."""
+
+    breaker_config = CircuitBreakerConfig(enabled=True, failure_threshold=1, recovery_time=0.05)
+    scheduler = ProviderScheduler(_config(max_retries=0, input_tokens_per_minute=10000), breaker_config)
+    messages = [HumanMessage(content="chicken, rice")]
+
+    def down():
+        raise _rate_limit_error("0")
+
+    try:
+        scheduler.call("node", messages, down)
+        assert False, "expected the error to be raised"
+    except anthropic.RateLimitError:
+        pass
+    time.sleep(0.06)
+
+    async def cancelled_probe():
+        async def hang():
+            await asyncio.sleep(1)
+
+        task = asyncio.ensure_future(scheduler.acall("node", messages, hang))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+            assert False, "expected the call to be cancelled"
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cancelled_probe())
+
+    assert scheduler._input_tokens.tokens > 9990
+    assert scheduler.call("node", messages, lambda: "ok") == "ok"
+
+
+def test_calls_given_up_before_sending_return_their_request(monkeypatch):
+    """Calls rejected at the capacity deadline or cancelled while waiting give back their request and probe."""
+
+    monkeypatch.setenv("NODE_DEADLINE", "1")
+    breaker_config = CircuitBreakerConfig(enabled=True, failure_threshold=1, recovery_time=0.05)
+    scheduler = ProviderScheduler(_config(max_retries=0, requests_per_minute=1), breaker_config)
+
+    def down():
+        raise _rate_limit_error("0")
+
+    try:
+        scheduler.call("node", [], down)
+        assert False, "expected the error to be raised"
+    except anthropic.RateLimitError:
+        pass
+    time.sleep(0.06)
+
+    # the probe would wait a minute for the next request, past the deadline;
+    # each one hands the probe back, so the next is not refused by the circuit
+    for _ in range(3):
+        try:
+            scheduler.call("node", [], lambda: "ok")
+            assert False, "expected the deadline to be exceeded"
+        except DeadlineExceeded:
+            pass
+    assert scheduler._requests.tokens > -0.5
+    assert scheduler.calls == 1
+
+    monkeypatch.setenv("NODE_DEADLINE", "90")
+
+    async def cancelled_while_waiting():
+        task = asyncio.ensure_future(scheduler.acall("node", [], _async_value("ok")))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+            assert False, "expected the call to be cancelled"
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cancelled_while_waiting())
+
+    assert scheduler._requests.tokens > -0.5
+    assert scheduler.calls == 1
+    assert abs(scheduler.wait_seconds) < 1e-6
@@ -0,0 +1,56 @@
+"""
+Tests for the bulk runner.
+
+These run offline against a fake chat model.
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import Checkpoint, run_bulk
+from model.claude_client import set_client_factory
+from model.fake_client import fake_client_factory
+
+
+def test_checkpoint_watermark_stays_compact():
+    """Finished lines collapse into the watermark once there are no gaps."""
+
+    checkpoint = Checkpoint("unused")
+    for line_number in (2, 3, 5):
+        checkpoint.mark_done(line_number)
+    assert (checkpoint.watermark, checkpoint.completed) == (0, {2, 3, 5})
+
+    checkpoint.mark_done(1)
+    assert (checkpoint.watermark, checkpoint.completed) == (3, {5})
+
+
+def test_run_bulk_resumes_from_checkpoint(tmp_path):
+    """A resumed run only processes the lines that have no result yet."""
+
+    input_path = tmp_path / "requests.jsonl"
+    output_path = tmp_path / "recipes.jsonl"
+    lines = [json.dumps({"ingredients": ["chicken", f"item {i}"]}) for i in range(5)]
+    input_path.write_text("\n".join(lines + ["not json"]) + "\n")
+
+    # lines 1, 2 and 4 finished before the interruption
+    Checkpoint(str(output_path) + ".checkpoint", watermark=2, completed={4}).save()
+    output_path.write_text("")
+
+    set_client_factory(fake_client_factory())
+    try:
+        stats = asyncio.run(run_bulk(str(input_path), str(output_path), workers=2))
+    finally:
+        set_client_factory(None)
+
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert sorted(record["line"] for record in records) == [3, 5, 6]
+    assert stats == {"processed": 3, "failed": 1}
+    assert next(record for record in records if record["line"] == 6)["error"]
+
+    checkpoint = Checkpoint.load(str(output_path) + ".checkpoint")
+    assert (checkpoint.watermark, checkpoint.completed) == (6, set())
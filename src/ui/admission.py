@@ -0,0 +1,291 @@
+"""
+Admission control and load shedding for the recipe endpoints.
+
+At most `max_concurrency` recipe graphs run at once. A batch request takes
+one slot per graph it runs concurrently, every other request one slot.
+Requests beyond that wait in a bounded queue with one lane per client (API
+key, or client IP when there is none), and free slots are handed to the
+lanes round-robin so one busy client can't starve the others. A request that finds the queue
+full, or waits longer than `queue_timeout`, is turned away right away with
+503 (429 when its client alone fills its lane) and a Retry-After header,
+instead of piling up until the load balancer times out.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from agent.metrics import LATENCY_BUCKETS, Histogram
+
+# paths that go through admission control; health checks and metrics never do
+ADMITTED_PATH_PREFIX = "/api/recipe"
+
+# runs several graphs per request, so it is charged by the size of its body
+BATCH_PATH = "/api/recipe/batch"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, per-client fair wait queue."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        max_queue: int = 64,
+        max_queue_per_client: int = 16,
+        queue_timeout: float = 20.0,
+        retry_after: int = 2,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        # waiting requests and the slots they need, per client in round-robin order
+        self._lanes: "OrderedDict[str, Deque[Tuple[asyncio.Future, int]]]" = OrderedDict()
+        self.wait_time = Histogram(LATENCY_BUCKETS)
+        self.rejected: Dict[str, int] = {}
+
+    def _reject(self, status_code: int, reason: str) -> AdmissionRejected:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return AdmissionRejected(status_code, reason, self.retry_after)
+
+    async def acquire(self, client: str, slots: int = 1) -> None:
+        """
+        Wait for the slots to run a request.
+
+        Args:
+            client: Key of the client the request came from
+            slots: Graphs the request runs at once, capped at max_concurrency
+
+        Raises:
+            AdmissionRejected: When the request is shed
+        """
+        slots = max(1, min(slots, self.max_concurrency))
+        if self.in_flight + slots <= self.max_concurrency and self.queued == 0:
+            self.in_flight += slots
+            self.wait_time.observe(0.0)
+            return
+
+        if self.queued >= self.max_queue:
+            raise self._reject(503, "queue_full")
+        lane = self._lanes.get(client)
+        if lane is not None and len(lane) >= self.max_queue_per_client:
+            raise self._reject(429, "client_queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._lanes.setdefault(client, deque()).append((waiter, slots))
+        self.queued += 1
+        start = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # the slots were handed over just as the wait ended, give them back
+                self.release(slots)
+            else:
+                waiter.cancel()
+                self._remove(client, waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(503, "queue_timeout")
+        finally:
+            self.wait_time.observe(time.perf_counter() - start)
+
+    def _remove(self, client: str, waiter: asyncio.Future) -> None:
+        lane = self._lanes.get(client)
+        entry = next((entry for entry in lane if entry[0] is waiter), None) if lane is not None else None
+        if entry is not None:
+            lane.remove(entry)
+            self.queued -= 1
+            if not lane:
+                del self._lanes[client]
+
+    def release(self, slots: int = 1) -> None:
+        """
+        Free the slots of a request and hand them to the next clients in turn.
+
+        A waiting request that needs more slots than are free holds up the
+        ones behind it, so batches are not starved by single requests.
+
+        Args:
+            slots: The slots the request was admitted with
+        """
+        self.in_flight -= max(1, min(slots, self.max_concurrency))
+        while self._lanes:
+            client, lane = next(iter(self._lanes.items()))
+            waiter, needed = lane[0]
+            if not waiter.done() and self.in_flight + needed > self.max_concurrency:
+                break
+            lane.popleft()
+            self.queued -= 1
+            if lane:
+                self._lanes.move_to_end(client)
+            else:
+                del self._lanes[client]
+            if not waiter.done():
+                self.in_flight += needed
+                waiter.set_result(None)
+
+    def render_metrics(self) -> List[str]:
+        """Render the admission gauges and counters in the Prometheus text format."""
+        lines = [
+            "# HELP cooking_agent_admission_in_flight Recipe graph slots in use.",
+            "# TYPE cooking_agent_admission_in_flight gauge",
+            f"cooking_agent_admission_in_flight {self.in_flight}",
+            "# HELP cooking_agent_admission_queue_depth Recipe requests waiting for a slot.",
+            "# TYPE cooking_agent_admission_queue_depth gauge",
+            f"cooking_agent_admission_queue_depth {self.queued}",
+            "# HELP cooking_agent_admission_wait_seconds Time recipe requests waited for a slot.",
+            "# TYPE cooking_agent_admission_wait_seconds histogram",
+        ]
+        lines.extend(self.wait_time.render("cooking_agent_admission_wait_seconds", 'endpoint="recipe"'))
+        lines.append("# HELP cooking_agent_admission_rejected_total Recipe requests shed by admission control.")
+        lines.append("# TYPE cooking_agent_admission_rejected_total counter")
+        for reason, count in sorted(self.rejected.items()):
+            lines.append(f'cooking_agent_admission_rejected_total{{reason="{reason}"}} {count}')
+        return lines
+
+
+def client_key(scope: Dict[str, Any]) -> str:
+    """
+    Identify the client of a request for fair queuing.
+
+    Uses the API key when one is sent, otherwise the last address in
+    X-Forwarded-For, which the load balancer appends and the client can't
+    forge, otherwise the peer address.
+
+    Args:
+        scope: ASGI connection scope
+
+    Returns:
+        str: The client key
+    """
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope.get("headers", [])}
+    if headers.get("x-api-key"):
+        return "key:" + headers["x-api-key"]
+    if headers.get("x-forwarded-for"):
+        return "ip:" + headers["x-forwarded-for"].split(",")[-1].strip()
+    client: Optional[Tuple[str, int]] = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that runs recipe requests through an AdmissionController.
+
+    The slots are held until the response is fully sent, so streamed recipes
+    count against the limit for as long as they stream.
+    """
+
+    def __init__(self, app: Callable, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(ADMITTED_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        slots = 1
+        if scope["path"] == BATCH_PATH:
+            # read the body up front to size the batch, then replay it to the app
+            messages = []
+            while True:
+                message = await receive()
+                messages.append(message)
+                if message["type"] != "http.request" or not message.get("more_body", False):
+                    break
+            slots = batch_slots(b"".join(message.get("body", b"") for message in messages))
+            receive = _replay(messages, receive)
+
+        try:
+            await self.controller.acquire(client_key(scope), slots)
+        except AdmissionRejected as e:
+            await _send_rejection(send, e)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(slots)
+
+
+def batch_slots(body: bytes) -> int:
+    """
+    Count the graphs a batch request runs at once.
+
+    Args:
+        body: JSON body of a batch recipe request
+
+    Returns:
+        int: The number of items, capped by the batch's concurrency; 1 if the body is not a valid batch
+    """
+    try:
+        batch = json.loads(body)
+        items = len(batch["items"])
+        concurrency = int(batch.get("max_concurrency") or os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return 1
+    return max(1, min(items, concurrency))
+
+
+def _replay(messages: List[Dict[str, Any]], receive: Callable) -> Callable:
+    """Build a receive callable that gives back the buffered messages before reading on."""
+    pending = deque(messages)
+
+    async def replay() -> Dict[str, Any]:
+        if pending:
+            return pending.popleft()
+        return await receive()
+
+    return replay
+
+
+async def _send_rejection(send: Callable, rejection: AdmissionRejected) -> None:
+    body = json.dumps({"detail": f"Service overloaded ({rejection.reason}), retry later"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": rejection.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejection.retry_after).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_admission_controller() -> Optional[AdmissionController]:
+    """
+    Build the admission controller from environment variables.
+
+    Returns:
+        AdmissionController, or None when ADMISSION_MAX_CONCURRENCY is 0
+    """
+    max_concurrency = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32"))
+    if max_concurrency <= 0:
+        return None
+
+    return AdmissionController(
+        max_concurrency=max_concurrency,
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+        max_queue_per_client=int(os.getenv("ADMISSION_MAX_QUEUE_PER_CLIENT", "16")),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "20")),
+        retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "2")),
+    )
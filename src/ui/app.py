@@ -1,27 +1,104 @@
 """
 FastAPI application for the cooking assistant API.
+
+Importing this module stays light: the agent, which pulls in LangGraph,
+LangChain and the Anthropic SDK, is imported and built by a warm-up task
+once the server is up. /health answers right away, /ready only once the
+warm-up has finished.
 """
 
 import os
 import sys
-from typing import List, Dict, Optional, Any
+import json
+import time
+import asyncio
+import contextlib
+import importlib
+from typing import AsyncIterator, List, Dict, Literal, Optional, Any
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 # Add the project root to the path so we can import our modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agent.cooking_agent import run_agent
+from agent.metrics import get_metrics, monitor_event_loop_lag, register_collector
+from agent.schema import MAX_ALTERNATIVES, AgentInput
+from ui.admission import AdmissionMiddleware, create_admission_controller
+
+# startup state reported by /ready: "starting", "ready" or "failed"
+_startup: Dict[str, Any] = {"status": "starting", "error": None, "seconds": {}}
+
+def _agent():
+    """Get the agent module, importing it on first use."""
+    return importlib.import_module("agent.cooking_agent")
+
+def _warm_up() -> Dict[str, float]:
+    """Import the agent and build what the first request needs, timing each phase."""
+    start = time.perf_counter()
+    agent = _agent()
+    return {"imports": time.perf_counter() - start, **agent.warm_up()}
+
+async def _run_warm_up() -> None:
+    """Warm up in a worker thread, so /health keeps answering meanwhile, and mark the app ready."""
+    try:
+        _startup["seconds"] = await asyncio.get_running_loop().run_in_executor(None, _warm_up)
+    except Exception as e:
+        _startup.update(status="failed", error=f"{type(e).__name__}: {e}")
+        return
+    _startup["status"] = "ready"
+
+def _render_startup_metrics() -> List[str]:
+    lines = [
+        "# HELP cooking_agent_ready Whether the startup warm-up has finished.",
+        "# TYPE cooking_agent_ready gauge",
+        f"cooking_agent_ready {int(_startup['status'] == 'ready')}",
+        "# HELP cooking_agent_startup_seconds Time spent in each startup warm-up phase.",
+        "# TYPE cooking_agent_startup_seconds gauge",
+    ]
+    for phase, seconds in _startup["seconds"].items():
+        lines.append(f'cooking_agent_startup_seconds{{phase="{phase}"}} {seconds}')
+    return lines
+
+register_collector(_render_startup_metrics)
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up the agent and run the event loop lag monitor for as long as the app is up."""
+    interval = float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL", "0.1"))
+    monitor = asyncio.create_task(monitor_event_loop_lag(interval)) if interval > 0 else None
+    # without the warm-up, the agent is imported by the first request instead
+    warm_up = None
+    if os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true":
+        _startup.update(status="starting", error=None, seconds={})
+        warm_up = asyncio.create_task(_run_warm_up())
+    else:
+        _startup["status"] = "ready"
+    try:
+        yield
+    finally:
+        for task in (monitor, warm_up):
+            if task is not None:
+                task.cancel()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="Cooking Assistant API",
     description="Generate recipe suggestions based on available ingredients",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
+# Shed recipe requests beyond the concurrency limit and its wait queue.
+# Added before CORS so rejections still carry the CORS headers.
+admission = create_admission_controller()
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
+    register_collector(admission.render_metrics)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -54,6 +131,15 @@ class CookingAssistantInput(BaseModel):
         default=None,
         description="Additional instructions or requirements for the recipe"
     )
+    pipeline_mode: Literal["standard", "fused"] = Field(
+        default="standard",
+        description="'fused' categorizes the ingredients and picks the recipe idea in a single model call"
+    )
+    session_id: Optional[str] = Field(
+        default=None,
+        max_length=128,
+        description="Conversation session; follow-ups may leave ingredients empty to reuse the previous ones"
+    )
 
 
 class CookingAssistantOutput(BaseModel):
@@ -68,6 +154,87 @@ class CookingAssistantOutput(BaseModel):
         default_factory=list,
         description="Any ingredients that would be nice to have but weren't in the input"
     )
+    served_by: str = Field(
+        default="model",
+        description="What produced the answer: model, cache, corpus, fast_model or template"
+    )
+
+
+class CookingAssistantAlternativesInput(BaseModel):
+    """Input model for the alternative recipes API."""
+    
+    ingredients: List[str] = Field(
+        description="List of available ingredients",
+        examples=[["chicken", "rice", "onion", "olive oil"]]
+    )
+    dietary_restrictions: Optional[List[str]] = Field(
+        default_factory=list,
+        description="Optional list of dietary restrictions",
+        examples=[["vegetarian", "gluten-free"]]
+    )
+    preferences: Optional[Dict[str, Any]] = Field(
+        default_factory=dict,
+        description="Optional dictionary of preferences",
+        examples=[{"cuisine": "Italian", "difficulty": "easy"}]
+    )
+    query: Optional[str] = Field(
+        default=None,
+        description="Additional instructions or requirements for the recipes"
+    )
+    count: int = Field(
+        default=3,
+        ge=1,
+        le=MAX_ALTERNATIVES,
+        description="Number of distinct recipes to choose from"
+    )
+
+
+class CookingAssistantAlternativesOutput(BaseModel):
+    """Output model for the alternative recipes API."""
+    
+    recipes: List[CookingAssistantOutput] = Field(
+        description="The alternative recipes, fewer than requested if the ideas repeated"
+    )
+
+
+class CookingAssistantBatchInput(BaseModel):
+    """Input model for the batch recipe API."""
+    
+    items: List[AgentInput] = Field(
+        description="The recipe requests to run",
+        max_length=int(os.getenv("BATCH_MAX_ITEMS", "100"))
+    )
+    pipeline_mode: Literal["standard", "fused"] = Field(
+        default="standard",
+        description="Pipeline mode used for every item in the batch"
+    )
+    max_concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=int(os.getenv("BATCH_MAX_CONCURRENCY_LIMIT", "16")),
+        description="Maximum number of recipes generated at the same time"
+    )
+
+
+class CookingAssistantBatchResult(BaseModel):
+    """Result of one item in a batch recipe request."""
+    
+    output: Optional[CookingAssistantOutput] = Field(
+        default=None,
+        description="The generated recipe, if it succeeded"
+    )
+    error: Optional[str] = Field(
+        default=None,
+        description="Why this item failed, if it did"
+    )
+
+
+class CookingAssistantBatchOutput(BaseModel):
+    """Output model for the batch recipe API."""
+    
+    results: List[CookingAssistantBatchResult] = Field(
+        description="One result per input item, in the same order"
+    )
 
 
 @app.post("/api/recipe", response_model=CookingAssistantOutput)
@@ -82,12 +249,14 @@ async def generate_recipe(input_data: CookingAssistantInput):
         The generated recipe and related information
     """
     try:
-        # Call the agent
-        result = run_agent(
+        # Call the agent without blocking the event loop
+        result = await _agent().arun_agent(
             ingredients=input_data.ingredients,
             dietary_restrictions=input_data.dietary_restrictions,
             preferences=input_data.preferences,
-            query=input_data.query
+            query=input_data.query,
+            mode=input_data.pipeline_mode,
+            session_id=input_data.session_id
         )
         
         # Process the result
@@ -99,6 +268,8 @@ async def generate_recipe(input_data: CookingAssistantInput):
             cooking_time = result.get('cooking_time', 'Not specified')
             difficulty = result.get('difficulty', 'Not specified')
             missing_ingredients = result.get('missing_ingredients', [])
+            ingredients_used = result.get('ingredients_used', input_data.ingredients)
+            served_by = result.get('served_by', 'model')
         else:
             # Attribute access
             recipe_name = getattr(result, 'recipe_name', 'Custom Recipe')
@@ -106,15 +277,18 @@ async def generate_recipe(input_data: CookingAssistantInput):
             cooking_time = getattr(result, 'cooking_time', 'Not specified')
             difficulty = getattr(result, 'difficulty', 'Not specified')
             missing_ingredients = getattr(result, 'missing_ingredients', [])
+            ingredients_used = getattr(result, 'ingredients_used', input_data.ingredients)
+            served_by = getattr(result, 'served_by', 'model')
         
         # Create the output
         output = CookingAssistantOutput(
             recipe_name=recipe_name,
-            ingredients_used=input_data.ingredients,
+            ingredients_used=ingredients_used,
             recipe_content=recipe_content,
             cooking_time=cooking_time,
             difficulty=difficulty,
-            missing_ingredients=missing_ingredients
+            missing_ingredients=missing_ingredients,
+            served_by=served_by
         )
         
         return output
@@ -123,13 +297,165 @@ async def generate_recipe(input_data: CookingAssistantInput):
         raise HTTPException(status_code=500, detail=f"Error generating recipe: {str(e)}")
 
 
+@app.post("/api/recipe/alternatives", response_model=CookingAssistantAlternativesOutput)
+async def generate_recipe_alternatives(input_data: CookingAssistantAlternativesInput):
+    """
+    Generate several distinct recipes to choose from.
+    
+    The ingredients are parsed once and the recipes are written in
+    parallel, so this takes about as long as /api/recipe.
+    
+    Args:
+        input_data: The ingredients, preferences and number of recipes
+        
+    Returns:
+        The alternative recipes, in the order they were proposed
+    """
+    try:
+        outputs = await _agent().arun_agent_alternatives(
+            ingredients=input_data.ingredients,
+            dietary_restrictions=input_data.dietary_restrictions,
+            preferences=input_data.preferences,
+            query=input_data.query,
+            count=input_data.count
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating recipes: {str(e)}")
+    
+    return CookingAssistantAlternativesOutput(recipes=[output.model_dump() for output in outputs])
+
+
+@app.post("/api/recipe/batch", response_model=CookingAssistantBatchOutput)
+async def generate_recipe_batch(input_data: CookingAssistantBatchInput):
+    """
+    Generate recipes for many inputs at once.
+    
+    Identical requests are generated only once, and a failing item is
+    reported in its result instead of failing the whole batch.
+    
+    Args:
+        input_data: The batch of recipe requests
+        
+    Returns:
+        One result per item, in the order the items were given
+    """
+    results = await _agent().arun_agent_batch(
+        input_data.items,
+        max_concurrency=input_data.max_concurrency,
+        mode=input_data.pipeline_mode
+    )
+    
+    return CookingAssistantBatchOutput(
+        results=[
+            CookingAssistantBatchResult(
+                output=result.output.model_dump() if result.output else None,
+                error=result.error
+            )
+            for result in results
+        ]
+    )
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _recipe_event_stream(input_data: CookingAssistantInput) -> AsyncIterator[str]:
+    """Translate the agent's streamed progress into server-sent events."""
+    try:
+        async for event, payload in _agent().astream_recipe(
+            ingredients=input_data.ingredients,
+            dietary_restrictions=input_data.dietary_restrictions,
+            preferences=input_data.preferences,
+            query=input_data.query,
+            mode=input_data.pipeline_mode
+        ):
+            if event == "token":
+                yield _sse_event(event, {"text": payload})
+            else:
+                yield _sse_event(event, payload.model_dump())
+    except Exception as e:
+        # headers are already sent, so report the failure in-band
+        yield _sse_event("error", {"detail": f"Error generating recipe: {str(e)}"})
+
+
+@app.post("/api/recipe/stream")
+async def stream_recipe(input_data: CookingAssistantInput):
+    """
+    Generate a recipe and stream it back as server-sent events.
+    
+    Sends `recipe_idea_partial` events with the fields of the recipe
+    concept decoded so far while it is being written, a `recipe_idea` event
+    as soon as the concept is complete, `token` events while the full
+    recipe is being written, and a final `output` event with the same
+    fields as /api/recipe. Sessions are not supported here, so a request
+    with a session_id is refused instead of silently run without one.
+    
+    Args:
+        input_data: The input data containing ingredients and preferences
+        
+    Returns:
+        A text/event-stream response
+    """
+    if input_data.session_id is not None:
+        raise HTTPException(status_code=400, detail="session_id is not supported by the streaming endpoint")
+    
+    return StreamingResponse(
+        _recipe_event_stream(input_data),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Conversation history endpoint
+@app.get("/api/sessions/{session_id}")
+async def get_session(session_id: str):
+    """
+    Get the stored turns of a conversation session.
+    
+    Args:
+        session_id: The session to read
+        
+    Returns:
+        The session's requests and answers, oldest first
+    """
+    from memory.session_store import get_session_store
+    
+    store = get_session_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Sessions are disabled")
+    
+    # the store's SQLite calls run on a worker thread, off the event loop
+    turns = await asyncio.to_thread(store.history, session_id)
+    if not turns:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    
+    return {"session_id": session_id, "turns": turns}
+
+
 # Add a basic health check endpoint
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Health check endpoint, answering as soon as the server is up."""
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint, answering 503 until the startup warm-up has finished."""
+    if _startup["status"] != "ready":
+        return JSONResponse(status_code=503, content={"status": _startup["status"], "error": _startup["error"]})
+    return {"status": "ready", "startup_seconds": _startup["seconds"]}
+
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-node latency, token and cache metrics in the Prometheus text format."""
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4")
+
+
 # Root endpoint with API information
 @app.get("/")
 async def root():
@@ -140,7 +466,13 @@ async def root():
         "description": app.description,
         "endpoints": {
             "/api/recipe": "Generate recipe suggestions",
+            "/api/recipe/stream": "Generate recipe suggestions as server-sent events",
+            "/api/recipe/alternatives": "Generate several alternative recipes to choose from",
+            "/api/recipe/batch": "Generate recipe suggestions for many inputs",
+            "/api/sessions/{session_id}": "Get the stored turns of a conversation session",
             "/health": "Health check endpoint",
+            "/ready": "Readiness endpoint, 503 until the agent is warmed up",
+            "/metrics": "Prometheus metrics",
             "/docs": "API documentation (Swagger UI)",
             "/redoc": "API documentation (ReDoc)"
         }
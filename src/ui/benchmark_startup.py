@@ -0,0 +1,154 @@
+"""
+Startup benchmark for the API container.
+
+Starts fresh interpreters that import the API module with `-X importtime`
+and then run the agent warm-up the way the app does at startup, and
+reports how long a new task takes until it can answer /health and until
+/ready, along with the import time of each package and of the project's
+own modules. No API calls are made.
+
+Run this inside the API container (e.g. `copilot svc exec`) to get real
+numbers for the Fargate task, or locally for a before/after comparison:
+
+    python src/ui/benchmark_startup.py --runs 5 --top 15
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# top-level packages of this project, reported module by module
+PROJECT_PACKAGES = ("agent", "model", "memory", "ui")
+
+# run in each fresh interpreter: import the app, then warm up as its lifespan does
+CHILD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import ui.app
+app_import = time.perf_counter() - start
+start = time.perf_counter()
+from agent.cooking_agent import warm_up
+seconds = {"imports": time.perf_counter() - start, **warm_up()}
+print(json.dumps({"app_import": app_import, "warm_up": seconds}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse the output of `python -X importtime`.
+
+    Args:
+        stderr: The interpreter's standard error
+
+    Returns:
+        Dictionary mapping each imported module to its self and cumulative seconds
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return modules
+
+
+def _run_once(env: Dict[str, str]) -> Dict[str, Any]:
+    """Start one interpreter and collect its startup timings."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True,
+    )
+    total = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup failed:\n{result.stderr[-2000:]}")
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {**timings, "process": total, "modules": parse_importtime(result.stderr)}
+
+
+def _median(values: List[float]) -> float:
+    return statistics.median(values) if values else 0.0
+
+
+def run_benchmark(runs: int = 3, top: int = 15) -> Dict[str, Any]:
+    """
+    Measure the startup of the API in fresh interpreters.
+
+    Args:
+        runs: Number of interpreters to start; medians are reported
+        top: Number of packages and project modules to report
+
+    Returns:
+        Dictionary with median seconds until /health and /ready, per
+        warm-up phase, per package (self time of all its modules) and per
+        project module (cumulative time, including what it imports)
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ)
+        # building clients needs a key but makes no calls; keep the session database out of the tree
+        env.setdefault("ANTHROPIC_API_KEY", "benchmark")
+        env.setdefault("SESSION_STORE_PATH", os.path.join(directory, "sessions.db"))
+        samples = [_run_once(env) for _ in range(runs)]
+
+    packages: Dict[str, List[float]] = {}
+    project: Dict[str, List[float]] = {}
+    for sample in samples:
+        totals: Dict[str, float] = {}
+        for name, (self_seconds, cumulative) in sample["modules"].items():
+            package = name.split(".")[0]
+            totals[package] = totals.get(package, 0.0) + self_seconds
+            if package in PROJECT_PACKAGES:
+                project.setdefault(name, []).append(cumulative)
+        for package, seconds in totals.items():
+            packages.setdefault(package, []).append(seconds)
+
+    phases = samples[0]["warm_up"].keys()
+    by_package = sorted(((name, _median(values)) for name, values in packages.items()), key=lambda item: -item[1])
+    by_module = sorted(((name, _median(values)) for name, values in project.items()), key=lambda item: -item[1])
+
+    return {
+        "runs": runs,
+        "process_seconds": _median([sample["process"] for sample in samples]),
+        "health_seconds": _median([sample["app_import"] for sample in samples]),
+        "ready_seconds": _median([sample["app_import"] + sum(sample["warm_up"].values()) for sample in samples]),
+        "warm_up_seconds": {phase: _median([sample["warm_up"][phase] for sample in samples]) for phase in phases},
+        "packages": by_package[:top],
+        "project_modules": by_module[:top],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to start")
+    parser.add_argument("--top", type=int, default=15, help="Packages and project modules to list")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.runs, args.top)
+
+    print(f"Runs:                           {results['runs']}")
+    print(f"Import ui.app (serves /health): {results['health_seconds']:.3f} s")
+    print(f"Warmed up (serves /ready):      {results['ready_seconds']:.3f} s")
+    for phase, seconds in results["warm_up_seconds"].items():
+        print(f"  {phase:<29} {seconds:.3f} s")
+    print(f"Interpreter start to exit:      {results['process_seconds']:.3f} s")
+
+    print("\nImport time by package (self time of its modules):")
+    for name, seconds in results["packages"]:
+        print(f"  {name:<29} {seconds:.3f} s")
+
+    print("\nProject modules (cumulative, including what they import):")
+    for name, seconds in results["project_modules"]:
+        print(f"  {name:<29} {seconds:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
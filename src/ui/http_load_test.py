@@ -0,0 +1,447 @@
+"""
+End-to-end HTTP load test for the cooking assistant API.
+
+Starts the mock Anthropic server and the FastAPI app under uvicorn as
+separate processes, the same way the app runs in its container, then
+replays a JSONL workload of AgentInput records against the app at a target
+request rate. Requests are sent open-loop: they start on schedule whether
+or not earlier ones finished, so an overloaded app shows up as growing
+latency and errors instead of a slower sender.
+
+    python src/ui/http_load_test.py --workload inputs.jsonl --rate 5 --duration 60
+
+Reports the latency histogram, error rate, event loop lag and the app's CPU
+use per request, which is what the `cpu` and `count` settings in
+copilot/cooking-api/manifest.yml should be sized from. Pass --app-url to
+test an app that is already running, e.g. a container with CPU limits.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.benchmark_agent import percentile
+from agent.metrics import LAG_BUCKETS, LATENCY_BUCKETS, bucket_quantile
+from agent.schema import AgentInput
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# used when no workload file is given
+DEFAULT_WORKLOAD = [
+    {"ingredients": ["chicken", "rice", "onion", "olive oil"]},
+    {"ingredients": ["pasta", "tomato", "basil", "parmesan"], "preferences": {"cuisine": "Italian"}},
+    {"ingredients": ["tofu", "broccoli", "soy sauce", "ginger"], "dietary_restrictions": ["vegan"]},
+    {"ingredients": ["eggs", "bread", "spinach", "cheese"], "query": "Something quick for breakfast"},
+]
+
+# share of a task's CPU the service should use at the target rate, leaving headroom for bursts
+TARGET_CPU_UTILIZATION = 0.7
+
+# CPU units of one vCPU on Fargate
+CPU_UNITS_PER_VCPU = 1024
+
+_METRIC_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*(?:\{[^}]*\})?) (\S+)$")
+
+
+def load_workload(path: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Read the request bodies to replay.
+
+    Args:
+        path: JSONL file of AgentInput records, the built-in workload if None
+
+    Returns:
+        List of request bodies for /api/recipe
+    """
+    if path is None:
+        return DEFAULT_WORKLOAD
+
+    workload = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                workload.append(AgentInput.model_validate_json(line).model_dump())
+    return workload
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """Parse Prometheus text output into a dict keyed by metric name and labels."""
+    samples = {}
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            samples[match.group(1)] = float(match.group(2))
+    return samples
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_healthy(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become healthy within {timeout:.0f} s")
+
+
+@contextlib.contextmanager
+def run_servers(mock_options: List[str], app_env: Dict[str, str]) -> Iterator[str]:
+    """
+    Start the mock Anthropic server and the app, and stop them on exit.
+
+    Args:
+        mock_options: Command line options for mock_anthropic.py
+        app_env: Extra environment variables for the app
+
+    Yields:
+        Base URL of the app
+    """
+    mock_port, app_port = _free_port(), _free_port()
+    mock_url, app_url = f"http://127.0.0.1:{mock_port}", f"http://127.0.0.1:{app_port}"
+    processes = []
+
+    try:
+        mock = subprocess.Popen(
+            [sys.executable, os.path.join(SRC_DIR, "model", "mock_anthropic.py"), "--port", str(mock_port), *mock_options]
+        )
+        processes.append(mock)
+        _wait_until_healthy(mock_url, mock)
+
+        env = {**os.environ, "ANTHROPIC_BASE_URL": mock_url, "ANTHROPIC_API_KEY": "mock", **app_env}
+        app = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "ui.app:app", "--app-dir", SRC_DIR,
+                "--host", "127.0.0.1", "--port", str(app_port), "--log-level", "warning",
+            ],
+            env=env,
+        )
+        processes.append(app)
+        _wait_until_healthy(app_url, app)
+
+        yield app_url
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def _send_request(client: httpx.AsyncClient, body: Dict[str, Any], stream: bool) -> Dict[str, Any]:
+    """Send one recipe request and time it."""
+    start = time.perf_counter()
+    first_token = None
+    try:
+        if not stream:
+            response = await client.post("/api/recipe", json=body)
+            status = response.status_code
+        else:
+            async with client.stream("POST", "/api/recipe/stream", json=body) as response:
+                status = response.status_code
+                async for line in response.aiter_lines():
+                    if line == "event: token" and first_token is None:
+                        first_token = time.perf_counter() - start
+                    elif line == "event: error":
+                        # the stream failed after the 200 status was sent
+                        status = 500
+        error = None if status == 200 else f"HTTP {status}"
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+
+    return {"latency": time.perf_counter() - start, "time_to_first_token": first_token, "error": error}
+
+
+async def replay(
+    app_url: str,
+    workload: List[Dict[str, Any]],
+    rate: float,
+    duration: float,
+    stream: bool = False,
+    mode: str = "standard",
+    poisson: bool = False,
+    timeout: float = 120.0,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Replay the workload against the app at a fixed request rate.
+
+    Args:
+        app_url: Base URL of the app
+        workload: Request bodies, cycled through in order
+        rate: Requests started per second
+        duration: Seconds to keep sending requests
+        stream: Use /api/recipe/stream instead of /api/recipe
+        mode: Pipeline mode sent with every request
+        poisson: Space requests randomly with the given mean rate instead of evenly
+        timeout: Seconds before a request counts as failed
+        seed: Seed for the Poisson arrivals
+
+    Returns:
+        Dictionary with per-request results and the app metrics before and after
+    """
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+
+    async with httpx.AsyncClient(base_url=app_url, timeout=timeout, limits=limits) as client:
+        metrics_before = parse_metrics((await client.get("/metrics")).text)
+
+        tasks = []
+        start = time.perf_counter()
+        next_start = 0.0
+        index = 0
+        while next_start < duration:
+            delay = start + next_start - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            body = {**workload[index % len(workload)], "pipeline_mode": mode}
+            tasks.append(asyncio.create_task(_send_request(client, body, stream)))
+            index += 1
+            next_start += rng.expovariate(rate) if poisson else 1.0 / rate
+
+        results = await asyncio.gather(*tasks)
+        wall_time = time.perf_counter() - start
+
+        metrics_after = parse_metrics((await client.get("/metrics")).text)
+
+    return {"results": results, "wall_time": wall_time, "metrics_before": metrics_before, "metrics_after": metrics_after}
+
+
+_PROFILE_SAMPLE = re.compile(
+    r'^cooking_agent_llm_profile_duration_seconds_(bucket|count)\{node="([^"]*)",model="([^"]*)"(?:,le="([^"]*)")?\}$'
+)
+
+
+def profile_latencies(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, Dict[str, float]]:
+    """
+    Estimate LLM call latency per model profile from two scrapes of /metrics.
+
+    Args:
+        before: Metrics scraped before the replay
+        after: Metrics scraped after the replay
+
+    Returns:
+        Calls and estimated p50/p95 seconds, keyed by "node (model)"
+    """
+    counts: Dict[str, float] = {}
+    buckets: Dict[str, Dict[float, float]] = {}
+    for name, value in after.items():
+        match = _PROFILE_SAMPLE.match(name)
+        if not match:
+            continue
+        kind, node, model, bound = match.groups()
+        profile = f"{node} ({model})"
+        delta = value - before.get(name, 0.0)
+        if kind == "count":
+            counts[profile] = delta
+        elif bound != "+Inf":
+            buckets.setdefault(profile, {})[float(bound)] = delta
+
+    report = {}
+    for profile, count in sorted(counts.items()):
+        if not count:
+            continue
+        bounds = sorted(buckets.get(profile, {}))
+        cumulative = [buckets[profile][bound] for bound in bounds]
+        report[profile] = {
+            "calls": count,
+            "p50_s": bucket_quantile(bounds, cumulative, count, 0.50),
+            "p95_s": bucket_quantile(bounds, cumulative, count, 0.95),
+        }
+    return report
+
+
+def summarize(run: Dict[str, Any], rate: float, target_rps: Optional[float] = None, task_cpu: int = 256) -> Dict[str, Any]:
+    """
+    Turn the raw results of a replay into the load test report.
+
+    Args:
+        run: Output of replay()
+        rate: Request rate the replay was sent at
+        target_rps: Production request rate to size the service for
+        task_cpu: CPU units per task to size the task count for
+
+    Returns:
+        Dictionary with latency, error, event loop and CPU figures
+    """
+    results = run["results"]
+    latencies = [result["latency"] for result in results if result["error"] is None]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result["error"] is not None:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+    histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+    for latency in latencies:
+        histogram[next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))] += 1
+
+    summary: Dict[str, Any] = {
+        "requests": len(results),
+        "rate": rate,
+        "throughput_rps": len(latencies) / run["wall_time"],
+        "error_rate": (len(results) - len(latencies)) / len(results) if results else 0.0,
+        "errors": errors,
+        "latency_histogram": dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], histogram)),
+    }
+    if latencies:
+        summary.update({
+            "p50_s": percentile(latencies, 0.50),
+            "p95_s": percentile(latencies, 0.95),
+            "p99_s": percentile(latencies, 0.99),
+            "max_s": max(latencies),
+        })
+    first_tokens = [result["time_to_first_token"] for result in results if result["time_to_first_token"] is not None]
+    if first_tokens:
+        summary["time_to_first_token_p50_s"] = percentile(first_tokens, 0.50)
+        summary["time_to_first_token_p95_s"] = percentile(first_tokens, 0.95)
+
+    before, after = run["metrics_before"], run["metrics_after"]
+
+    def delta(name: str) -> float:
+        return after.get(name, 0.0) - before.get(name, 0.0)
+
+    lag_count = delta('cooking_agent_event_loop_lag_seconds_count{loop="main"}')
+    if lag_count:
+        summary["event_loop_lag_mean_s"] = delta('cooking_agent_event_loop_lag_seconds_sum{loop="main"}') / lag_count
+        summary["event_loop_lag_max_s"] = after.get("cooking_agent_event_loop_lag_max_seconds", 0.0)
+        # the smallest bucket holding 99% of the samples
+        for bound in LAG_BUCKETS:
+            if delta(f'cooking_agent_event_loop_lag_seconds_bucket{{loop="main",le="{bound}"}}') >= 0.99 * lag_count:
+                summary["event_loop_lag_p99_le_s"] = bound
+                break
+
+    profiles = profile_latencies(before, after)
+    if profiles:
+        summary["profiles"] = profiles
+
+    cpu_seconds = delta("process_cpu_seconds_total")
+    if cpu_seconds and results:
+        cpu_per_request = cpu_seconds / len(results)
+        summary["app_vcpu_used"] = cpu_seconds / run["wall_time"]
+        summary["cpu_seconds_per_request"] = cpu_per_request
+        if target_rps:
+            needed_units = target_rps * cpu_per_request * CPU_UNITS_PER_VCPU / TARGET_CPU_UTILIZATION
+            summary["target_rps"] = target_rps
+            summary["cpu_units_needed"] = needed_units
+            summary["task_count_needed"] = max(1, math.ceil(needed_units / task_cpu))
+
+    return summary
+
+
+def print_report(summary: Dict[str, Any], task_cpu: int) -> None:
+    """Print a load test summary for people."""
+    print(f"Requests:      {summary['requests']} at {summary['rate']:g} req/s")
+    print(f"Throughput:    {summary['throughput_rps']:.2f} successful req/s")
+    print(f"Error rate:    {summary['error_rate']:.1%} {summary['errors'] or ''}")
+    if "p50_s" in summary:
+        print(f"Latency:       p50 {summary['p50_s']:.2f} s, p95 {summary['p95_s']:.2f} s, "
+              f"p99 {summary['p99_s']:.2f} s, max {summary['max_s']:.2f} s")
+    if "time_to_first_token_p50_s" in summary:
+        print(f"First token:   p50 {summary['time_to_first_token_p50_s']:.2f} s, "
+              f"p95 {summary['time_to_first_token_p95_s']:.2f} s")
+
+    print("Latency histogram:")
+    largest = max(summary["latency_histogram"].values()) or 1
+    for bound, count in summary["latency_histogram"].items():
+        print(f"  <= {bound:>5} s {count:6d} {'#' * round(40 * count / largest)}")
+
+    if "event_loop_lag_mean_s" in summary:
+        print(f"Loop lag:      mean {summary['event_loop_lag_mean_s'] * 1000:.1f} ms, "
+              f"p99 <= {summary.get('event_loop_lag_p99_le_s', float('inf')) * 1000:.0f} ms, "
+              f"max {summary['event_loop_lag_max_s'] * 1000:.1f} ms")
+    if "profiles" in summary:
+        print("LLM latency per model profile:")
+        for profile, figures in summary["profiles"].items():
+            print(f"  {profile:<48} {figures['calls']:6.0f} calls, "
+                  f"p50 {figures['p50_s']:.2f} s, p95 {figures['p95_s']:.2f} s")
+    if "cpu_seconds_per_request" in summary:
+        print(f"App CPU:       {summary['app_vcpu_used']:.2f} vCPU, "
+              f"{summary['cpu_seconds_per_request'] * 1000:.1f} ms per request")
+    if "task_count_needed" in summary:
+        print(f"Sizing:        {summary['cpu_units_needed']:.0f} CPU units for {summary['target_rps']:g} req/s, "
+              f"{summary['task_count_needed']} task(s) of cpu: {task_cpu}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", help="JSONL file of AgentInput records (default: built-in sample)")
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests started per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep sending requests")
+    parser.add_argument("--poisson", action="store_true", help="Random arrivals instead of evenly spaced ones")
+    parser.add_argument("--stream", action="store_true", help="Use /api/recipe/stream")
+    parser.add_argument("--mode", choices=("standard", "fused"), default="standard", help="Pipeline mode")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds before a request counts as failed")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for arrivals and mock timings")
+    parser.add_argument("--app-url", help="Test an already running app instead of starting one")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the app's response cache")
+    parser.add_argument("--ttft-median", type=float, default=0.5, help="Mock median seconds to the first token")
+    parser.add_argument("--ttft-sigma", type=float, default=0.4, help="Mock log-normal spread of the first token time")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Mock generation speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock calls answered with 529")
+    parser.add_argument("--speedup", action="append", default=[], metavar="NAME=FACTOR",
+                        help="Make mock models whose name contains NAME answer FACTOR times faster, e.g. haiku=3")
+    parser.add_argument("--target-rps", type=float, help="Production request rate to size the service for")
+    parser.add_argument("--task-cpu", type=int, default=256, help="CPU units per task, as in the manifest")
+    parser.add_argument("--output", help="Write the summary to this JSON file")
+    args = parser.parse_args()
+
+    workload = load_workload(args.workload)
+
+    async def run(app_url: str) -> Dict[str, Any]:
+        return await replay(
+            app_url, workload, args.rate, args.duration, args.stream, args.mode, args.poisson, args.timeout, args.seed
+        )
+
+    if args.app_url:
+        raw = asyncio.run(run(args.app_url))
+    else:
+        mock_options = [
+            "--ttft-median", str(args.ttft_median),
+            "--ttft-sigma", str(args.ttft_sigma),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--error-rate", str(args.error_rate),
+            "--seed", str(args.seed),
+        ]
+        for option in args.speedup:
+            mock_options += ["--speedup", option]
+        app_env = {"RESPONSE_CACHE_ENABLED": "false"} if args.no_cache else {}
+        with run_servers(mock_options, app_env) as app_url:
+            raw = asyncio.run(run(app_url))
+
+    summary = summarize(raw, args.rate, args.target_rps, args.task_cpu)
+    print_report(summary, args.task_cpu)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    return 0 if summary["error_rate"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
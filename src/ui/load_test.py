@@ -0,0 +1,91 @@
+"""
+Concurrency load test for the /api/recipe endpoint.
+
+Runs the FastAPI app in-process against a fake chat model with a fixed
+per-call latency and fires concurrent requests at it. If the endpoint does
+not block the event loop, the requests overlap and the total wall time stays
+close to a single request instead of growing with the request count.
+
+    python src/ui/load_test.py --requests 20 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model.claude_client import set_client_factory
+from model.fake_client import fake_client_factory
+from ui.app import app
+
+# number of LLM calls the agent graph makes per recipe
+LLM_CALLS_PER_REQUEST = 3
+
+
+async def run_load_test(requests: int = 20, latency: float = 0.5) -> dict:
+    """
+    Fire concurrent recipe requests at the app and time them.
+
+    Args:
+        requests: Number of concurrent requests to send
+        latency: Seconds each fake LLM call takes
+
+    Returns:
+        Dictionary with the wall time and per-request latencies
+    """
+    set_client_factory(fake_client_factory(latency))
+
+    payload = {"ingredients": ["chicken", "rice", "onion", "olive oil"]}
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+
+        async def one_request(index: int) -> float:
+            start = time.perf_counter()
+            # distinct queries, so that identical requests are not coalesced into one run
+            response = await client.post("/api/recipe", json={**payload, "query": f"load test {index}"})
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one_request(index) for index in range(requests)))
+        wall_time = time.perf_counter() - start
+
+    set_client_factory(None)
+
+    single_request = LLM_CALLS_PER_REQUEST * latency
+    return {
+        "requests": requests,
+        "wall_time": wall_time,
+        "single_request_time": single_request,
+        "serial_time": single_request * requests,
+        "max_latency": max(latencies),
+        # 1.0 means all requests ran fully in parallel, 1/requests means serially
+        "overlap": single_request * requests / wall_time / requests,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="Number of concurrent requests")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load_test(args.requests, args.latency))
+
+    print(f"Concurrent requests:    {results['requests']}")
+    print(f"Single request time:    {results['single_request_time']:.2f} s")
+    print(f"Serial time (expected): {results['serial_time']:.2f} s")
+    print(f"Actual wall time:       {results['wall_time']:.2f} s")
+    print(f"Slowest request:        {results['max_latency']:.2f} s")
+    print(f"Overlap:                {results['overlap']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Tests for admission control of the recipe endpoints.
+
+These run offline without calling the API.
+"""
+
+import sys
+import os
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui.admission import AdmissionController, AdmissionMiddleware, AdmissionRejected, batch_slots, client_key
+
+
+def test_free_slots_go_to_clients_in_turn():
+    """A client with a long backlog doesn't hold up a client that arrives later."""
+
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, max_queue_per_client=10)
+        order = []
+
+        async def request(client, name):
+            await controller.acquire(client)
+            order.append(name)
+            await asyncio.sleep(0.01)
+            controller.release()
+
+        tasks = [asyncio.create_task(request("busy", f"busy-{i}")) for i in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("quiet", "quiet-0")))
+        await asyncio.gather(*tasks)
+        return controller, order
+
+    controller, order = asyncio.run(scenario())
+
+    assert order[:3] == ["busy-0", "busy-1", "quiet-0"]
+    assert (controller.in_flight, controller.queued) == (0, 0)
+    assert controller.wait_time.count == 5
+
+
+def test_full_queues_and_timeouts_are_rejected():
+    """Overflowing the queue gives 503, overflowing a client's lane 429, and a long wait 503."""
+
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, max_queue_per_client=1, queue_timeout=0.05)
+        await controller.acquire("a")
+        waiting = asyncio.create_task(controller.acquire("a"))
+        await asyncio.sleep(0)
+
+        results = await asyncio.gather(
+            controller.acquire("a"), controller.acquire("b"), controller.acquire("c"), waiting,
+            return_exceptions=True,
+        )
+        return controller, [(e.status_code, e.reason) for e in results]
+
+    controller, statuses = asyncio.run(scenario())
+
+    assert statuses == [
+        (429, "client_queue_full"),
+        (503, "queue_timeout"),
+        (503, "queue_full"),
+        (503, "queue_timeout"),
+    ]
+    assert controller.queued == 0
+    assert controller.in_flight == 1
+
+
+def test_middleware_sheds_only_recipe_requests():
+    """Rejected recipe requests get Retry-After, other endpoints bypass the limit."""
+
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.post("/api/recipe")
+    async def recipe():
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    controller = AdmissionController(max_concurrency=1, max_queue=0, retry_after=3)
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/api/recipe"))
+            await asyncio.sleep(0.01)
+            shed = await client.post("/api/recipe", headers={"X-API-Key": "other"})
+            health = await client.get("/health")
+            release.set()
+            return await first, shed, health
+
+    first, shed, health = asyncio.run(scenario())
+
+    assert first.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["retry-after"] == "3"
+    assert health.status_code == 200
+    assert controller.in_flight == 0
+    assert 'cooking_agent_admission_rejected_total{reason="queue_full"} 1' in controller.render_metrics()
+
+
+def test_clients_are_keyed_on_the_address_the_load_balancer_saw():
+    """A client can't pick its lane by sending its own X-Forwarded-For."""
+
+    def scope(*headers):
+        return {"headers": [(name.encode(), value.encode()) for name, value in headers], "client": ("10.0.0.7", 4321)}
+
+    assert client_key(scope(("x-forwarded-for", "1.2.3.4, 203.0.113.9"))) == "ip:203.0.113.9"
+    assert client_key(scope()) == "ip:10.0.0.7"
+    assert client_key(scope(("x-api-key", "secret"), ("x-forwarded-for", "1.2.3.4"))) == "key:secret"
+
+
+def test_batches_take_a_slot_per_concurrent_item():
+    """A batch is charged for the graphs it runs at once and waits until that many slots are free."""
+
+    assert batch_slots(b'{"items": [{}, {}, {}], "max_concurrency": 2}') == 2
+    assert batch_slots(b'{"items": [{}, {}, {}]}') == 3
+    assert batch_slots(b'not json') == 1
+
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.post("/api/recipe")
+    async def recipe():
+        await release.wait()
+        return {"ok": True}
+
+    @app.post("/api/recipe/batch")
+    async def batch(body: dict):
+        return {"items": len(body["items"])}
+
+    controller = AdmissionController(max_concurrency=4, max_queue=10)
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            single = asyncio.create_task(client.post("/api/recipe"))
+            await asyncio.sleep(0.01)
+            batch = asyncio.create_task(client.post("/api/recipe/batch", json={"items": [{}] * 6}))
+            await asyncio.sleep(0.01)
+            waiting = (controller.in_flight, controller.queued)
+            release.set()
+            return waiting, await single, await batch
+
+    waiting, single, batch = asyncio.run(scenario())
+
+    assert waiting == (1, 1)
+    assert single.status_code == 200
+    assert batch.json() == {"items": 6}
+    assert controller.in_flight == 0
+
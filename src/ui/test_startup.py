@@ -0,0 +1,78 @@
+"""
+Tests for the API's lazy startup, readiness endpoint and startup benchmark.
+
+These run offline without calling the API.
+"""
+
+import sys
+import os
+import json
+import subprocess
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+# Add the project root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ui.app as app_module
+from memory.session_store import set_session_store
+from ui.benchmark_startup import parse_importtime
+
+
+def test_app_import_defers_the_agent():
+    """Importing the API module loads neither LangGraph, LangChain nor the model SDKs."""
+
+    modules = "('langgraph', 'langchain_core', 'langchain_anthropic', 'anthropic')"
+    script = f"import json, sys, ui.app; print(json.dumps([m for m in {modules} if m in sys.modules]))"
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True, text=True, check=True,
+    )
+
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_ready_waits_for_the_warm_up(monkeypatch):
+    """/health answers during the warm-up, /ready only once it has finished."""
+
+    release = threading.Event()
+    warm_up = app_module._warm_up
+
+    def slow_warm_up():
+        release.wait(10)
+        return warm_up()
+
+    monkeypatch.setattr(app_module, "_warm_up", slow_warm_up)
+    set_session_store(None)
+    try:
+        with TestClient(app_module.app) as client:
+            assert client.get("/health").status_code == 200
+            response = client.get("/ready")
+            assert (response.status_code, response.json()["status"]) == (503, "starting")
+
+            release.set()
+            deadline = time.monotonic() + 10
+            while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+                time.sleep(0.05)
+
+            ready = client.get("/ready").json()
+            assert ready["status"] == "ready"
+            assert {"imports", "graphs", "clients"} <= set(ready["startup_seconds"])
+            assert "cooking_agent_ready 1" in client.get("/metrics").text
+    finally:
+        set_session_store(None)
+
+
+def test_importtime_output_is_parsed_per_module():
+    """Self and cumulative import times are read in seconds, the header is skipped."""
+
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     agent.schema\n"
+        "import time:      2500 |       2620 | agent\n"
+    )
+
+    assert parse_importtime(stderr) == {"agent.schema": (0.00012, 0.00012), "agent": (0.0025, 0.00262)}